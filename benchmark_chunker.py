@@ -0,0 +1,182 @@
+"""
+Chunker Benchmark
+1. Benchmark: the streaming chunker (iter_markdown_chunks) vs the previous regex
+   chunker over a large synthetic handbook (time + peak memory; chunks must match).
+   The streaming chunker is slower per MB (it walks the file line by line in
+   Python instead of re.split); what it buys is peak memory bounded by one
+   section instead of the whole file, char offsets and heading paths
+2. Benchmark: streaming JSON chunking vs json.load of a large synthetic JSON array
+Equivalence on data_md/ is checked by tests/test_chunker.py, which also holds
+the regex chunker used here as the reference
+
+Usage:
+    python benchmark_chunker.py                 # benchmark (~20 MB handbook)
+    python benchmark_chunker.py --size-mb 100
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+import logging
+from pathlib import Path
+
+# Add src (and tests, for the reference chunker) to path
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+sys.path.insert(0, str(Path(__file__).parent / "tests"))
+
+from chunker import chunk_markdown_file, iter_markdown_chunks, iter_json_chunks
+from reference_chunker import chunk_markdown_file_regex, same_chunks
+
+logging.basicConfig(level=logging.WARNING, format='%(message)s')
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+WORDS = ("hostel fee semester admission transport bus route library canteen placement "
+         "scholarship department laboratory block faculty students campus academic "
+         "examination counselling eligibility application deadline").split()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the Markdown and JSON chunkers")
+    parser.add_argument("--size-mb", type=float, default=20.0, help="Size of the synthetic handbook")
+    parser.add_argument("--json-size-mb", type=float, default=20.0, help="Size of the synthetic JSON array")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    return parser.parse_args()
+
+
+def write_handbook(filepath: str, size_mb: float):
+    """Synthetic handbook: nested headings, long paragraph sections, lists and short stubs"""
+    rng = random.Random(0)
+    target = int(size_mb * 1024 * 1024)
+    written = 0
+
+    def sentence(n):
+        return ' '.join(rng.choice(WORDS) for _ in range(n)).capitalize() + '.'
+
+    with open(filepath, 'w', encoding='utf-8') as f:
+        f.write("# KARE Student Handbook\n\n")
+        section = 0
+        while written < target:
+            section += 1
+            parts = [f"## Chapter {section} {rng.choice(WORDS).title()}\n\n", sentence(12) + "\n\n"]
+            for sub in range(rng.randint(1, 5)):
+                parts.append(f"### Topic {section}.{sub} {rng.choice(WORDS).title()}\n\n")
+                for _ in range(rng.randint(1, 12)):
+                    if rng.random() < 0.3:
+                        parts.append(''.join(f"- **{rng.choice(WORDS).title()}:** {rng.randint(1, 99999)}\n"
+                                             for _ in range(rng.randint(2, 8))) + "\n")
+                    else:
+                        parts.append(' '.join(sentence(rng.randint(6, 20)) for _ in range(rng.randint(1, 6))) + "\n\n")
+                if rng.random() < 0.3:
+                    parts.append(f"#### Facilities\n- Classrooms\n- Labs\n- Faculty rooms\n\n")
+            if rng.random() < 0.1:
+                parts.append("## Notes\n\n")
+            block = ''.join(parts)
+            f.write(block)
+            written += len(block)
+
+
+def write_json_items(filepath: str, size_mb: float):
+    """Synthetic JSON array of department / facility records, written item by item"""
+    rng = random.Random(0)
+    target = int(size_mb * 1024 * 1024)
+    written = 0
+    with open(filepath, 'w', encoding='utf-8') as f:
+        f.write('[\n')
+        index = 0
+        while written < target:
+            item = {
+                'name': f"{rng.choice(WORDS).title()} {index}",
+                'block': rng.randint(1, 12),
+                'description': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(10, 200))),
+                'contacts': [{'role': rng.choice(WORDS), 'phone': rng.randint(10 ** 9, 10 ** 10)}
+                             for _ in range(rng.randint(0, 3))],
+            }
+            data = (',\n' if index else '') + json.dumps(item)
+            f.write(data)
+            written += len(data)
+            index += 1
+        f.write('\n]\n')
+
+
+def load_json(filepath: str, chunk_size: int):
+    """Reference: the whole document tree in memory, as json.load-based chunking had it"""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def stream_json(filepath: str, chunk_size: int):
+    with open(filepath, 'r', encoding='utf-8') as f:
+        return [None] * sum(1 for _ in iter_json_chunks(f, 'items.json', chunk_size))
+
+
+def measure(chunker, filepath: str, chunk_size: int):
+    """Wall time of a plain run, then peak traced memory of a second run (tracemalloc slows it down)"""
+    start = time.perf_counter()
+    chunks = chunker(filepath, chunk_size)
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    chunker(filepath, chunk_size)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return chunks, seconds, peak
+
+
+def count_streamed(filepath: str, chunk_size: int):
+    """Consume the generator without keeping chunks (how a streaming build would use it)"""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        return [None] * sum(1 for _ in iter_markdown_chunks(f, 'handbook', chunk_size))
+
+
+def main():
+    args = parse_args()
+
+    logger.info("=" * 80)
+    logger.info(f"BENCHMARK: synthetic handbook ({args.size_mb:.0f} MB)")
+    logger.info("=" * 80)
+    with tempfile.TemporaryDirectory() as tmp:
+        handbook = os.path.join(tmp, "handbook.md")
+        write_handbook(handbook, args.size_mb)
+        size = os.path.getsize(handbook)
+
+        results, timings = {}, {}
+        for name, chunker in (("regex", chunk_markdown_file_regex), ("streaming", chunk_markdown_file),
+                              ("generator", count_streamed)):
+            chunks, seconds, peak = measure(chunker, handbook, args.chunk_size)
+            results[name] = chunks
+            timings[name] = (seconds, peak)
+            logger.info(f"⏱️ {name:>9}: {len(chunks)} chunks in {seconds:.2f}s "
+                        f"({size / 1e6 / seconds:.1f} MB/s), peak memory {peak / 1e6:.1f} MB")
+
+        same = same_chunks(results["regex"], results["streaming"])
+        logger.info(f"{'✅' if same else '❌'} Handbook chunks {'identical' if same else 'differ'}")
+        (regex_seconds, regex_peak), (stream_seconds, _), (_, generator_peak) = (
+            timings["regex"], timings["streaming"], timings["generator"])
+        logger.info(f"⚖️  Trade-off: the streaming chunker takes {stream_seconds / regex_seconds:.2f}x the "
+                    f"regex chunker's time; consumed as a generator its peak memory is "
+                    f"{generator_peak / 1e6:.1f} MB vs {regex_peak / 1e6:.1f} MB")
+
+    logger.info("\n" + "=" * 80)
+    logger.info(f"BENCHMARK: synthetic JSON array ({args.json_size_mb:.0f} MB)")
+    logger.info("=" * 80)
+    with tempfile.TemporaryDirectory() as tmp:
+        items_file = os.path.join(tmp, "items.json")
+        write_json_items(items_file, args.json_size_mb)
+        size = os.path.getsize(items_file)
+        for name, reader, unit in (("json.load", load_json, "items"), ("streaming", stream_json, "chunks")):
+            values, seconds, peak = measure(reader, items_file, args.chunk_size)
+            logger.info(f"⏱️ {name:>9}: {len(values)} {unit} in {seconds:.2f}s "
+                        f"({size / 1e6 / seconds:.1f} MB/s), peak memory {peak / 1e6:.1f} MB")
+
+    if not same:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+Concurrent Search Benchmark
+Runs VectorStoreManager.search from 1..N request threads against the built index
+(as uvicorn's threadpool does) and reports throughput and latency per level:
+1. Throughput: queries/second, speedup over one thread, p50 / p95 latency
+2. Consistency: every concurrent result must equal the single-threaded result
+   for the same query (searches share the store, caches and FAISS indexes)
+3. Hot-swap: with --swap-every, the served version is reloaded while the load
+   runs; searches must keep answering through the swaps
+4. Live updates: with --write-every, a writer adds (and then removes) probe chunks
+   while the load runs, compacting every --compact-every updates; each probe must
+   be found right after its add, and other results must not change. The store is
+   copied to a temporary directory first, so the served index is never written
+
+The thread policy (concurrency.apply_thread_policy) is applied for each level,
+so FAISS / torch threads per request shrink as request threads grow
+
+Usage:
+    python benchmark_concurrency.py                       # 1, 2, 4, ... 2x cores threads
+    python benchmark_concurrency.py --threads 1,4,16 --duration 10
+    python benchmark_concurrency.py --swap-every 0.5 --backend onnx
+    python benchmark_concurrency.py --write-every 0.05 --compact-every 20
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+import threading
+import logging
+from pathlib import Path
+
+import numpy as np
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from vector_store import VectorStoreManager
+from concurrency import apply_thread_policy
+
+logging.basicConfig(level=logging.WARNING, format='%(message)s')
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+QUERIES = (
+    "What is the hostel fee?",
+    "hostel fee for first year students",
+    "bus routes and transport timings",
+    "admission process and eligibility",
+    "documents required for admission",
+    "placement statistics and companies",
+    "highest package in placements",
+    "scholarship for merit students",
+    "what is the mess menu",
+    "library timings",
+    "btech programs offered",
+    "contact phone number of the admission office",
+    "sports facilities and gym",
+    "fee structure for mba",
+    "womens hostel rules",
+    "research centres at kare",
+)
+
+
+def default_thread_levels() -> str:
+    cores = os.cpu_count() or 1
+    levels, n = [], 1
+    while n <= 2 * cores:
+        levels.append(n)
+        n *= 2
+    return ','.join(map(str, levels))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent vector store searches")
+    parser.add_argument("--data-dir", default="data_md")
+    parser.add_argument("--vector-store-path", default="faiss_index")
+    parser.add_argument("--threads", default=default_thread_levels(), help="Request thread counts, e.g. 1,2,4,8")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds of load per thread count")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--backend", default=None, help="Embedding backend (default: EMBEDDING_BACKEND)")
+    parser.add_argument("--threads-per-request", type=int, default=None,
+                        help="Fixed FAISS / torch threads instead of the thread policy")
+    parser.add_argument("--query-cache", action="store_true",
+                        help="Keep the query embedding cache on (repeats then skip encoding)")
+    parser.add_argument("--swap-every", type=float, default=0.0,
+                        help="Reload the served index version every N seconds during the load")
+    parser.add_argument("--write-every", type=float, default=0.0,
+                        help="Add / remove a probe chunk every N seconds during the load (on a copy of the store)")
+    parser.add_argument("--compact-every", type=int, default=50,
+                        help="Live updates between compactions during the write stress")
+    return parser.parse_args()
+
+
+PROBE_SOURCE = 'benchmark_probe'
+
+
+def result_key(results):
+    return [(r.get('source_file'), r['text'][:80]) for r in results]
+
+
+def matches_expected(key, expected, live_writes: bool) -> bool:
+    """
+    Results equal the single-threaded reference. Under live writes each probe shifts the
+    BM25 statistics (near-ties may swap), so there the non-probe results only have to come
+    from the reference's top 2k; a search reading a half-updated store would not
+    """
+    if not live_writes:
+        return key == expected
+    return all(entry in expected for entry in key if entry[0] != PROBE_SOURCE)
+
+
+def live_writer(store: VectorStoreManager, write_every: float, stop: threading.Event, counts: dict, errors: list):
+    """Add a probe chunk, check it is searchable, remove it again; until stop is set"""
+    n = 0
+    while not stop.wait(write_every):
+        text = f"Benchmark probe chunk {n} zq{n}x"
+        try:
+            ids = store.add_chunks([{'text': text, 'source_file': PROBE_SOURCE, 'metadata': {}}])
+            counts['writes'] += 1
+            found = store.search(text, top_k=1)
+            if not found or found[0]['text'] != text:
+                errors.append(f"probe {n} not found right after add_chunks")
+            store.remove_chunks(ids)
+            counts['writes'] += 1
+        except Exception as e:
+            errors.append(repr(e))
+        n += 1
+
+
+def run_level(store: VectorStoreManager, threads: int, duration: float, top_k: int,
+              expected: dict, swap_every: float, write_every: float = 0.0):
+    """Search from threads threads for duration seconds; returns the level's measurements"""
+    latencies = [[] for _ in range(threads)]
+    mismatches = [0] * threads
+    errors = []
+    swaps = 0
+    counts = {'writes': 0}
+    start_barrier = threading.Barrier(threads + 1)
+    stop = threading.Event()
+
+    def worker(slot: int):
+        start_barrier.wait()
+        i = slot
+        while not stop.is_set():
+            query = QUERIES[i % len(QUERIES)]
+            i += threads
+            try:
+                begin = time.perf_counter()
+                results = store.search(query, top_k=top_k)
+                latencies[slot].append(time.perf_counter() - begin)
+                if not matches_expected(result_key(results), expected[query], write_every > 0):
+                    mismatches[slot] += 1
+            except Exception as e:
+                errors.append(repr(e))
+
+    workers = [threading.Thread(target=worker, args=(slot,), daemon=True) for slot in range(threads)]
+    if write_every > 0:
+        workers.append(threading.Thread(target=live_writer, args=(store, write_every, stop, counts, errors),
+                                        daemon=True))
+    for thread in workers:
+        thread.start()
+    start_barrier.wait()
+    begin = time.perf_counter()
+    while time.perf_counter() - begin < duration:
+        if swap_every > 0:
+            time.sleep(swap_every)
+            if store.reload():
+                swaps += 1
+        else:
+            time.sleep(min(0.1, duration))
+    stop.set()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - begin
+
+    all_latencies = np.concatenate([np.array(lat) for lat in latencies]) if any(latencies) else np.zeros(1)
+    return {
+        'threads': threads,
+        'queries': int(sum(len(lat) for lat in latencies)),
+        'qps': sum(len(lat) for lat in latencies) / elapsed,
+        'p50_ms': float(np.percentile(all_latencies, 50) * 1000),
+        'p95_ms': float(np.percentile(all_latencies, 95) * 1000),
+        'mismatches': sum(mismatches),
+        'errors': errors,
+        'swaps': swaps,
+        'writes': counts['writes'],
+    }
+
+
+def main():
+    args = parse_args()
+    levels = [int(n) for n in args.threads.split(',') if n.strip()]
+
+    apply_thread_policy(threads=args.threads_per_request, request_threads=max(levels))
+    store_path = args.vector_store_path
+    if args.write_every > 0:
+        store_path = os.path.join(tempfile.mkdtemp(prefix="benchmark_concurrency_"), "faiss_index")
+        shutil.copytree(args.vector_store_path, store_path)
+        logger.info(f"📁 Write stress runs on a copy of the store: {store_path}")
+    store = VectorStoreManager(
+        data_dir=args.data_dir,
+        vector_store_path=store_path,
+        embedding_backend=args.backend,
+        query_cache_size=1024 if args.query_cache else 0,
+        compact_every=args.compact_every,
+    )
+    if not store.load_vector_store():
+        logger.error("❌ No index found. Run: python build_faiss_index.py")
+        sys.exit(1)
+    if not store._ensure_embedding_model():
+        sys.exit(1)
+
+    # Single-threaded reference results (and warm caches / FAISS buffers)
+    reference_k = args.top_k * 2 if args.write_every > 0 else args.top_k
+    expected = {query: result_key(store.search(query, top_k=reference_k)) for query in QUERIES}
+
+    logger.info("=" * 80)
+    logger.info(f"CONCURRENT SEARCH: {len(store.chunks)} chunks, {store.index_info.get('type')} index, "
+                f"{store.embedding_backend} encoder, {os.cpu_count()} cores")
+    logger.info("=" * 80)
+    logger.info(f"{'threads':>7} {'per-req':>7} {'qps':>9} {'speedup':>8} {'p50 ms':>8} {'p95 ms':>8} "
+                f"{'swaps':>6} {'writes':>6} {'mismatch':>8} {'errors':>6}")
+
+    baseline = None
+    ok = True
+    for threads in levels:
+        policy = apply_thread_policy(threads=args.threads_per_request, request_threads=threads)
+        level = run_level(store, threads, args.duration, args.top_k, expected, args.swap_every, args.write_every)
+        baseline = baseline or level['qps']
+        logger.info(f"{threads:>7} {policy['threads']:>7} {level['qps']:>9.1f} {level['qps'] / baseline:>7.2f}x "
+                    f"{level['p50_ms']:>8.2f} {level['p95_ms']:>8.2f} {level['swaps']:>6} "
+                    f"{level['writes']:>6} {level['mismatches']:>8} {len(level['errors']):>6}")
+        for error in level['errors'][:3]:
+            logger.error(f"❌ {error}")
+        ok = ok and not level['errors'] and not level['mismatches']
+
+    logger.info(f"{'✅' if ok else '❌'} Concurrent results {'match' if ok else 'differ from'} "
+                f"single-threaded search")
+    logger.info(f"📊 Candidate pool: {store.pool_stats()}")
+    if store_path != args.vector_store_path:
+        shutil.rmtree(os.path.dirname(store_path), ignore_errors=True)
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,7 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent / "src"))
 
 from vector_store import VectorStoreManager
+import argparse
 import logging
 
 # Setup logging
@@ -19,7 +20,24 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build the FAISS vector store from data_md/")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only re-chunk and re-embed files that changed since the last build")
+    parser.add_argument("--index-type", default="auto",
+                        choices=["auto", "flat", "hnsw", "ivf_flat", "ivf_pq"],
+                        help="FAISS index type (auto picks one from the chunk count)")
+    parser.add_argument("--quantization", choices=["sq8", "fp16"],
+                        help="Store vectors scalar-quantized (8-bit or fp16) to cut index memory")
+    parser.add_argument("--no-shards", action="store_true",
+                        help="One index over all sources instead of one shard per source file")
+    parser.add_argument("--json", action="append", default=[], metavar="FILE",
+                        help="Extra JSON file to index alongside data_md/ (repeatable, e.g. combined_data.json)")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
+    
     logger.info("\n" + "="*80)
     logger.info("BUILDING FAISS VECTOR STORE FROM MARKDOWN FILES")
     logger.info("="*80 + "\n")
@@ -27,17 +45,21 @@ def main():
     # Initialize vector store manager
     manager = VectorStoreManager(
         data_dir="data_md",
-        vector_store_path="faiss_index"
+        vector_store_path="faiss_index",
+        index_type=args.index_type,
+        quantization=args.quantization,
+        json_sources=args.json,
+        shard_by_source=not args.no_shards
     )
     
-    # Build vector store (force rebuild)
-    success = manager.build_vector_store(force_rebuild=True)
+    # Build vector store (force rebuild, or only changed files with --incremental)
+    success = manager.build_vector_store(force_rebuild=True, incremental=args.incremental)
     
     if success:
         logger.info("\n" + "="*80)
         logger.info("✅ SUCCESS - FAISS Vector Store Ready!")
         logger.info(f"📊 Total chunks: {len(manager.chunks)}")
-        logger.info(f"📁 Stored in: faiss_index/")
+        logger.info(f"📁 Stored in: faiss_index/{manager.index_version}/ (CURRENT)")
         logger.info("="*80 + "\n")
     else:
         logger.error("\n" + "="*80)
@@ -0,0 +1,99 @@
+"""
+Export all-MiniLM-L6-v2 to an int8-quantized ONNX model for the onnx embedding backend
+and check it against the PyTorch SentenceTransformer backend
+
+Usage:
+    python export_onnx_model.py                 # export + agreement check
+    python export_onnx_model.py --check-only    # re-run the check on an existing export
+Serve with it by setting EMBEDDING_BACKEND=onnx (optionally EMBEDDING_THREADS=n) in .env
+"""
+
+import sys
+import time
+import argparse
+import logging
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from embedding_backend import (
+    DEFAULT_ONNX_MODEL_DIR, SentenceTransformerBackend, OnnxEmbeddingBackend,
+    export_onnx_model, compare_backends
+)
+from vector_store import VectorStoreManager
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(message)s'
+)
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_QUERIES = [
+    "What is the hostel fee?",
+    "bus routes and transport",
+    "admission process and eligibility",
+    "placement statistics and companies",
+    "canteen timings",
+    "scholarships for first year students",
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Export and verify the int8 ONNX embedding model")
+    parser.add_argument("--output-dir", default=str(DEFAULT_ONNX_MODEL_DIR))
+    parser.add_argument("--check-only", action="store_true", help="Skip the export, only run the agreement check")
+    parser.add_argument("--threads", type=int, help="ONNX Runtime / torch intra-op threads")
+    parser.add_argument("--max-chunks", type=int, default=500, help="Chunk texts used for the agreement check")
+    parser.add_argument("--min-cosine", type=float, default=0.98,
+                        help="Fail if any text's cosine between backends falls below this")
+    return parser.parse_args()
+
+
+def sample_texts(max_chunks: int):
+    """Warm-up style queries plus chunk texts from the current vector store"""
+    manager = VectorStoreManager(data_dir="data_md", vector_store_path="faiss_index")
+    texts = list(SAMPLE_QUERIES)
+    if manager.load_vector_store():
+        texts += [manager.chunks[i]['text'] for i in range(min(max_chunks, len(manager.chunks)))]
+    return texts
+
+
+def timed_encode(backend, texts):
+    backend.encode(texts[:8])  # Warm up
+    start = time.perf_counter()
+    backend.encode(texts)
+    return time.perf_counter() - start
+
+
+def main():
+    args = parse_args()
+
+    if not args.check_only:
+        export_onnx_model(args.output_dir)
+
+    texts = sample_texts(args.max_chunks)
+    reference = SentenceTransformerBackend(threads=args.threads)
+    candidate = OnnxEmbeddingBackend(args.output_dir, threads=args.threads)
+
+    report = compare_backends(reference, candidate, texts)
+    torch_s = timed_encode(reference, texts)
+    onnx_s = timed_encode(candidate, texts)
+
+    logger.info("\n" + "="*80)
+    logger.info(f"📊 Cosine agreement on {report['num_texts']} texts: "
+                f"mean {report['mean_cosine']:.4f}, min {report['min_cosine']:.4f}, p1 {report['p01_cosine']:.4f}")
+    logger.info(f"⏱️ Encode time: PyTorch {torch_s:.2f}s, ONNX int8 {onnx_s:.2f}s "
+                f"({torch_s / max(onnx_s, 1e-9):.1f}x)")
+    logger.info("="*80 + "\n")
+
+    if report['min_cosine'] < args.min_cosine:
+        logger.error(f"❌ Worst text below {args.min_cosine}: {report['worst_text'][:120]!r}")
+        sys.exit(1)
+    logger.info("✅ ONNX backend agrees with PyTorch - set EMBEDDING_BACKEND=onnx to use it")
+
+
+if __name__ == "__main__":
+    main()
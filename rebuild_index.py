@@ -3,11 +3,14 @@
 Rebuild FAISS index to ensure all data is properly indexed
 """
 
+import os
 import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent / "src"))
 
 from vector_store import VectorStoreManager
+from index_versions import current_version, previous_version, set_current
+import argparse
 import logging
 
 logging.basicConfig(
@@ -16,7 +19,37 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Rebuild the FAISS index")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only re-chunk and re-embed files that changed since the last build")
+    parser.add_argument("--index-type", default="auto",
+                        choices=["auto", "flat", "hnsw", "ivf_flat", "ivf_pq"],
+                        help="FAISS index type (auto picks one from the chunk count)")
+    parser.add_argument("--quantization", choices=["sq8", "fp16"],
+                        help="Store vectors scalar-quantized (8-bit or fp16) to cut index memory")
+    parser.add_argument("--no-shards", action="store_true",
+                        help="One index over all sources instead of one shard per source file")
+    parser.add_argument("--json", action="append", default=[], metavar="FILE",
+                        help="Extra JSON file to index alongside data_md/ (repeatable, e.g. combined_data.json)")
+    parser.add_argument("--rollback", action="store_true",
+                        help="Point faiss_index/CURRENT back at the previous version instead of building")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
+    
+    if args.rollback:
+        # Servers with INDEX_RELOAD_INTERVAL set swap back on their next check
+        current = current_version("faiss_index")
+        previous = previous_version("faiss_index", current)
+        if current is None or (previous is None and not os.path.exists(os.path.join("faiss_index", "faiss_index.bin"))):
+            logger.error("❌ No older index version to roll back to")
+            return False
+        set_current("faiss_index", previous)
+        logger.info(f"⏪ faiss_index/CURRENT: {current} -> {previous or 'legacy layout'}")
+        return True
+    
     logger.info("=" * 80)
     logger.info("REBUILDING FAISS INDEX")
     logger.info("=" * 80)
@@ -24,16 +57,22 @@ def main():
     # Create vector store manager
     vs_manager = VectorStoreManager(
         data_dir="data_md",
-        vector_store_path="faiss_index"
+        vector_store_path="faiss_index",
+        index_type=args.index_type,
+        quantization=args.quantization,
+        json_sources=args.json,
+        shard_by_source=not args.no_shards
     )
     
-    # Force rebuild
-    success = vs_manager.build_vector_store(force_rebuild=True)
+    # Force rebuild (pass --incremental to re-embed only changed files)
+    success = vs_manager.build_vector_store(force_rebuild=True, incremental=args.incremental)
     
     if success:
         logger.info("\n✅ FAISS index rebuilt successfully!")
         logger.info(f"   Total chunks: {len(vs_manager.chunks)}")
         logger.info(f"   FAISS vectors: {vs_manager.index.ntotal}")
+        logger.info(f"   Version: faiss_index/{vs_manager.index_version}/ (servers with "
+                    f"INDEX_RELOAD_INTERVAL set pick it up without a restart)")
     else:
         logger.error("\n❌ Failed to rebuild FAISS index")
         return False
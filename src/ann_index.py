@@ -0,0 +1,489 @@
+"""
+ANN Index Factory
+Builds the FAISS index for the vector store: exact flat search, HNSW, IVF-Flat
+or IVF-PQ, chosen automatically from the corpus size unless configured, and
+measures recall / latency of the chosen index against exact search
+
+Flat, HNSW and IVF-Flat vectors can be stored scalar-quantized (8-bit or fp16);
+IVF-PQ always stores product-quantized codes. Distances from either are
+approximate (approximate_distances); rescore_exact() recomputes exact distances
+for candidates from the float matrix
+
+StreamingIndexBuilder fills the index batch by batch during a build, keeping the
+float matrix on disk rather than in memory
+
+With ids, the index is wrapped in an IndexIDMap2 so vectors keep a stable chunk
+id across live additions and removals (see VectorStoreManager.add_chunks)
+
+set_search_params, vector_bytes and recall_report also accept a ShardedIndex
+(sharded_index.py): anything with a 'shards' dict of FAISS indexes
+"""
+
+import os
+import math
+import time
+import logging
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ('flat', 'hnsw', 'ivf_flat', 'ivf_pq')
+QUANTIZATIONS = ('sq8', 'fp16')
+
+# Corpus sizes (number of vectors) at which the automatic choice switches index type
+AUTO_HNSW_MIN = 20_000
+AUTO_IVF_FLAT_MIN = 200_000
+AUTO_IVF_PQ_MIN = 2_000_000
+
+# Smallest recall@k accepted when picking nprobe / efSearch from the sweep
+TARGET_RECALL = 0.95
+
+NPROBE_SWEEP = (1, 2, 4, 8, 16, 32, 64, 128)
+EF_SEARCH_SWEEP = (16, 32, 64, 128, 256, 512)
+
+# Rows per index.add() call and largest random sample used to train IVF / SQ indexes
+ADD_BATCH_SIZE = 65_536
+TRAIN_SAMPLE_MAX = 262_144
+
+
+def _import_faiss():
+    try:
+        import faiss
+    except Exception:
+        import faiss_cpu as faiss
+    return faiss
+
+
+def choose_index_type(num_vectors: int) -> str:
+    """Default index type for a corpus size"""
+    if num_vectors >= AUTO_IVF_PQ_MIN:
+        return 'ivf_pq'
+    if num_vectors >= AUTO_IVF_FLAT_MIN:
+        return 'ivf_flat'
+    if num_vectors >= AUTO_HNSW_MIN:
+        return 'hnsw'
+    return 'flat'
+
+
+def _nlist_for(num_vectors: int) -> int:
+    """IVF list count: ~4*sqrt(n), keeping >= 39 training points per list as FAISS recommends"""
+    return max(1, min(int(4 * math.sqrt(num_vectors)), num_vectors // 39))
+
+
+def _pq_subquantizers(dimension: int) -> int:
+    """Largest sub-quantizer count <= dimension / 8 that divides the dimension"""
+    for m in range(max(1, dimension // 8), 0, -1):
+        if dimension % m == 0:
+            return m
+    return 1
+
+
+def _scalar_quantizer_type(faiss, quantization: str):
+    return {
+        'sq8': faiss.ScalarQuantizer.QT_8bit,
+        'fp16': faiss.ScalarQuantizer.QT_fp16,
+    }[quantization]
+
+
+def index_description(index_type: str, dimension: int, num_vectors: int,
+                      params: Optional[Dict[str, Any]] = None,
+                      quantization: Optional[str] = None) -> Dict[str, Any]:
+    """Resolve build parameters (nlist, M, ...) for an index type and corpus size"""
+    if quantization is not None and quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unknown quantization '{quantization}' (expected one of {', '.join(QUANTIZATIONS)})")
+    if index_type == 'ivf_pq' and quantization:
+        logger.warning("⚠️ IVF-PQ is already compressed; ignoring scalar quantization")
+        quantization = None
+
+    params = dict(params or {})
+    if index_type == 'hnsw':
+        params.setdefault('M', 32)
+        params.setdefault('ef_construction', 80)
+    elif index_type in ('ivf_flat', 'ivf_pq'):
+        params.setdefault('nlist', _nlist_for(num_vectors))
+        if index_type == 'ivf_pq':
+            params.setdefault('pq_m', _pq_subquantizers(dimension))
+            # 8-bit codes need 256 centroids per sub-quantizer, i.e. enough training points
+            params.setdefault('pq_nbits', 8 if num_vectors >= 39 * 256 else 4)
+    return {'type': index_type, 'dimension': dimension, 'params': params, 'quantization': quantization}
+
+
+def create_index(dimension: int, num_vectors: int, index_type: str = 'auto',
+                 params: Optional[Dict[str, Any]] = None, quantization: Optional[str] = None,
+                 with_ids: bool = False):
+    """
+    Create an empty (untrained) index sized for num_vectors
+    with_ids wraps it in an IndexIDMap2 (vectors are then added with add_with_ids)
+    Returns (index, description)
+    """
+    faiss = _import_faiss()
+
+    if index_type == 'auto':
+        index_type = choose_index_type(num_vectors)
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{index_type}' (expected one of {', '.join(INDEX_TYPES)})")
+
+    description = index_description(index_type, dimension, num_vectors, params, quantization)
+    p = description['params']
+    qtype = _scalar_quantizer_type(faiss, description['quantization']) if description['quantization'] else None
+
+    if index_type == 'flat':
+        if qtype is None:
+            index = faiss.IndexFlatL2(dimension)
+        else:
+            index = faiss.IndexScalarQuantizer(dimension, qtype, faiss.METRIC_L2)
+    elif index_type == 'hnsw':
+        if qtype is None:
+            index = faiss.IndexHNSWFlat(dimension, p['M'])
+        else:
+            index = faiss.IndexHNSWSQ(dimension, qtype, p['M'])
+        index.hnsw.efConstruction = p['ef_construction']
+    elif index_type == 'ivf_flat':
+        if qtype is None:
+            index = faiss.IndexIVFFlat(faiss.IndexFlatL2(dimension), dimension, p['nlist'])
+        else:
+            index = faiss.IndexIVFScalarQuantizer(faiss.IndexFlatL2(dimension), dimension, p['nlist'], qtype)
+    else:
+        index = faiss.IndexIVFPQ(faiss.IndexFlatL2(dimension), dimension, p['nlist'], p['pq_m'], p['pq_nbits'])
+    if with_ids:
+        index = faiss.IndexIDMap2(index)
+    return index, description
+
+
+def base_index(index):
+    """The index inside an IndexIDMap2 wrapper (the index itself otherwise)"""
+    faiss = _import_faiss()
+    if hasattr(index, 'id_map'):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+def supports_removal(index) -> bool:
+    """Whether remove_ids works on the index (HNSW graphs cannot drop vectors)"""
+    faiss = _import_faiss()
+    return not isinstance(base_index(index), faiss.IndexHNSW)
+
+
+def add_id_map(index, vectors: np.ndarray, batch_size: int = ADD_BATCH_SIZE):
+    """
+    IndexIDMap2 copy of an index built without ids (id = row), keeping its training
+    vectors must be the rows the index was filled with, in order
+    """
+    faiss = _import_faiss()
+    empty = faiss.clone_index(index)
+    empty.reset()
+    mapped = faiss.IndexIDMap2(empty)
+    for start in range(0, len(vectors), batch_size):
+        batch = np.ascontiguousarray(vectors[start:start + batch_size], dtype='float32')
+        mapped.add_with_ids(batch, np.arange(start, start + len(batch), dtype=np.int64))
+    return mapped
+
+
+def build_index(vectors: np.ndarray, index_type: str = 'auto', params: Optional[Dict[str, Any]] = None,
+                quantization: Optional[str] = None, batch_size: int = ADD_BATCH_SIZE,
+                ids: Optional[np.ndarray] = None):
+    """
+    Create, train and fill an index over L2-comparable float32 vectors
+    quantization ('sq8' / 'fp16') stores vectors scalar-quantized instead of float32
+    vectors may be memory-mapped: training uses a random sample of at most
+    TRAIN_SAMPLE_MAX rows and vectors are added batch_size rows at a time
+    With ids (one int64 per row) the index is an IndexIDMap2 returning those ids
+    Returns (index, description)
+    """
+    num_vectors, dimension = vectors.shape
+    index, description = create_index(dimension, num_vectors, index_type, params, quantization,
+                                      with_ids=ids is not None)
+
+    if not index.is_trained:
+        if num_vectors > TRAIN_SAMPLE_MAX:
+            rows = np.sort(np.random.default_rng(0).choice(num_vectors, TRAIN_SAMPLE_MAX, replace=False))
+            sample = vectors[rows]
+        else:
+            sample = vectors
+        logger.info(f"🔧 Training {description['type']} index on {len(sample)} vectors")
+        index.train(np.ascontiguousarray(sample, dtype='float32'))
+    for start in range(0, num_vectors, batch_size):
+        batch = np.ascontiguousarray(vectors[start:start + batch_size], dtype='float32')
+        if ids is None:
+            index.add(batch)
+        else:
+            index.add_with_ids(batch, np.ascontiguousarray(ids[start:start + batch_size], dtype=np.int64))
+    return index, description
+
+
+class StreamingIndexBuilder:
+    """
+    Builds the index from embedding batches as they are produced
+    Every batch is appended to a raw float32 spill file on disk; indexes that need no
+    training (flat, HNSW, fp16) also get each batch added immediately. finish()
+    turns the spill file into the .npy float matrix and, when the final index type
+    differs from the streamed one ('auto' past AUTO_HNSW_MIN, IVF) or needs
+    training, builds it from the memory-mapped matrix instead
+    With with_ids, vectors get ids 0..n-1 in add order inside an IndexIDMap2
+    With index_type None only the float matrix is written (the caller builds its
+    own index from it, e.g. per-source shards)
+    """
+
+    def __init__(self, dimension: int, spill_path: str, index_type: str = 'auto',
+                 params: Optional[Dict[str, Any]] = None, quantization: Optional[str] = None,
+                 with_ids: bool = False):
+        self.dimension = dimension
+        self.with_ids = with_ids
+        self.index_type = index_type
+        self.params = params
+        self.quantization = quantization
+        self.spill_path = spill_path
+        self.count = 0
+        self.add_seconds = 0.0
+
+        # 'auto' streams into the small-corpus choice until the corpus outgrows it
+        stream_type = 'flat' if index_type == 'auto' else index_type
+        self.index, self.description = None, {'type': stream_type}
+        if stream_type in ('flat', 'hnsw'):
+            self.index, self.description = create_index(dimension, 0, stream_type, params, quantization,
+                                                        with_ids=with_ids)
+            if not self.index.is_trained:
+                self.index = None
+        self._spill = open(spill_path, 'wb')
+
+    def add(self, vectors: np.ndarray):
+        """Append a batch (in chunk order) to the spill file and, if streaming, the index"""
+        vectors = np.ascontiguousarray(vectors, dtype='float32')
+        self._spill.write(vectors.tobytes())
+        self.count += len(vectors)
+        if self.index is not None:
+            if self.index_type == 'auto' and choose_index_type(self.count) != 'flat':
+                self.index = None  # Will be rebuilt as the larger index type in finish()
+                return
+            start = time.perf_counter()
+            if self.with_ids:
+                self.index.add_with_ids(vectors, np.arange(self.count - len(vectors), self.count, dtype=np.int64))
+            else:
+                self.index.add(vectors)
+            self.add_seconds += time.perf_counter() - start
+
+    def discard(self):
+        """Drop the spill file of an unfinished build"""
+        self._spill.close()
+        if os.path.exists(self.spill_path):
+            os.remove(self.spill_path)
+
+    def finish(self, matrix_path: str, batch_size: int = ADD_BATCH_SIZE):
+        """
+        Write the float matrix to matrix_path (.npy) and complete the index
+        Returns (index, description, memory-mapped float matrix)
+        """
+        self._spill.close()
+        raw = np.memmap(self.spill_path, dtype='float32', mode='r', shape=(self.count, self.dimension)) \
+            if self.count else np.zeros((0, self.dimension), dtype='float32')
+        matrix = np.lib.format.open_memmap(matrix_path, mode='w+', dtype='float32',
+                                           shape=(self.count, self.dimension))
+        for start in range(0, self.count, batch_size):
+            matrix[start:start + batch_size] = raw[start:start + batch_size]
+        matrix.flush()
+        del raw, matrix
+        os.remove(self.spill_path)
+        vectors = np.load(matrix_path, mmap_mode='r')
+        if self.index_type is None:
+            return None, None, vectors
+
+        final_type = choose_index_type(self.count) if self.index_type == 'auto' else self.index_type
+        if self.index is None or final_type != self.description['type']:
+            start = time.perf_counter()
+            self.index, self.description = build_index(
+                vectors, final_type, self.params, self.quantization, batch_size=batch_size,
+                ids=np.arange(self.count, dtype=np.int64) if self.with_ids else None
+            )
+            self.add_seconds += time.perf_counter() - start
+        else:
+            # Streamed index: resolve parameters for the real corpus size in the description
+            self.description = index_description(final_type, self.dimension, self.count,
+                                                 self.params, self.quantization)
+        return self.index, self.description, vectors
+
+
+def set_search_params(index, search_params: Optional[Dict[str, Any]]):
+    """Apply nprobe / efSearch to an index (ignored by index types that do not have them)"""
+    if not search_params:
+        return
+    if hasattr(index, 'shards'):
+        for shard in index.shards.values():
+            set_search_params(shard, search_params)
+        return
+    faiss = _import_faiss()
+    space = faiss.ParameterSpace()
+    for name, value in search_params.items():
+        try:
+            space.set_index_parameter(index, name, value)
+        except Exception:
+            logger.debug(f"Index does not support search parameter {name}")
+
+
+def selector_parameters(index, selector, selectivity: float = 1.0):
+    """
+    Search parameters restricting a search to the ids an IDSelector accepts, keeping
+    the index's nprobe / efSearch (IVF and HNSW need their own parameter classes)
+    HNSW walks past rejected nodes, so efSearch grows as the selected fraction shrinks
+    """
+    faiss = _import_faiss()
+    base = base_index(index)
+    if isinstance(base, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=base.nprobe)
+    if isinstance(base, faiss.IndexHNSW):
+        ef = base.hnsw.efSearch
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=int(min(max(ef, ef / max(selectivity, 1e-6)), 1024)))
+    return faiss.SearchParameters(sel=selector)
+
+
+def vector_bytes(index) -> int:
+    """Approximate bytes used by the stored vectors (codes) of an index"""
+    if hasattr(index, 'shards'):
+        return sum(vector_bytes(shard) for shard in index.shards.values())
+    faiss = _import_faiss()
+    try:
+        base = faiss.extract_index_ivf(index)
+    except Exception:
+        base = base_index(index)
+        base = getattr(base, 'storage', None) or base
+        base = faiss.downcast_index(base)
+    code_size = getattr(base, 'code_size', None)
+    if code_size is None:
+        return index.ntotal * index.d * 4
+    return int(index.ntotal * code_size)
+
+
+def approximate_distances(description: Dict[str, Any]) -> bool:
+    """True when the index's distances come from compressed codes (scalar quantization or PQ, in any shard)"""
+    if description.get('quantization') or description.get('type') == 'ivf_pq':
+        return True
+    return any(shard.get('type') == 'ivf_pq' for shard in description.get('shards', {}).values())
+
+
+def rescore_exact(float_vectors: np.ndarray, queries: np.ndarray,
+                  distances: np.ndarray, indices: np.ndarray) -> np.ndarray:
+    """
+    Exact squared L2 distances of the candidates in indices, read from the
+    (typically memory-mapped) float matrix; padding slots (-1) keep their distance
+    """
+    valid = indices >= 0
+    rows = float_vectors[np.where(valid, indices, 0).ravel()].reshape(indices.shape + (-1,))
+    exact = ((rows - queries[:, None, :]) ** 2).sum(axis=-1, dtype=np.float32)
+    return np.where(valid, exact, distances).astype(np.float32)
+
+
+def _recall(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(f[f >= 0]) & set(t[t >= 0])) for f, t in zip(found, truth))
+    return hits / max(1, int((truth >= 0).sum()))
+
+
+def exact_search(vectors: np.ndarray, queries: np.ndarray, k: int, batch_size: int = ADD_BATCH_SIZE) -> np.ndarray:
+    """
+    Exact top-k row ids by L2 distance, scanning vectors (typically memory-mapped)
+    batch_size rows at a time, so only one batch is in memory
+    """
+    faiss = _import_faiss()
+    best_distances = np.full((len(queries), 0), np.inf, dtype=np.float32)
+    best_ids = np.zeros((len(queries), 0), dtype=np.int64)
+    for start in range(0, len(vectors), batch_size):
+        block = np.ascontiguousarray(vectors[start:start + batch_size], dtype='float32')
+        distances, ids = faiss.knn(queries, block, min(k, len(block)))
+        distances = np.concatenate((best_distances, distances), axis=1)
+        ids = np.concatenate((best_ids, ids + start), axis=1)
+        order = np.argsort(distances, axis=1, kind='stable')[:, :k]
+        best_distances = np.take_along_axis(distances, order, axis=1)
+        best_ids = np.take_along_axis(ids, order, axis=1)
+    return best_ids
+
+
+def perturbed_queries(vectors: np.ndarray, count: int, cosine: float = 0.7, seed: int = 0) -> np.ndarray:
+    """
+    Query vectors that are not in the index: sampled rows with Gaussian noise added
+    so each query keeps about `cosine` similarity to its source row (a typical
+    question-to-best-chunk similarity); an exact row copy would trivially find itself
+    """
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(len(vectors), size=min(count, len(vectors)), replace=False))
+    queries = np.asarray(vectors[rows], dtype='float32')
+    norms = np.linalg.norm(queries, axis=1, keepdims=True)
+    scale = norms * math.sqrt((1.0 / cosine ** 2 - 1.0) / queries.shape[1])
+    return (queries + rng.standard_normal(queries.shape).astype('float32') * scale).astype('float32')
+
+
+def _timed_search(index, queries: np.ndarray, k: int):
+    start = time.perf_counter()
+    distances, ids = index.search(queries, k)
+    return ids, (time.perf_counter() - start) * 1000 / len(queries), distances
+
+
+def recall_report(index, description: Dict[str, Any], vectors: np.ndarray,
+                  queries: np.ndarray, k: int = 10, target_recall: float = TARGET_RECALL,
+                  rescore_k: int = 5) -> Dict[str, Any]:
+    """
+    Compare an index against exact search on held-out queries (e.g. perturbed_queries)
+    Sweeps nprobe (IVF) or efSearch (HNSW), picks the cheapest setting that
+    reaches target_recall and applies it to the index. For quantized indexes the
+    report also gives recall of the top rescore_k results with and without
+    exact float rescoring, plus the vector memory saved
+    The ground truth is a batched scan of vectors (exact_search), so a memory-mapped
+    float matrix is never loaded whole
+    """
+    queries = np.ascontiguousarray(queries, dtype='float32')
+    k = min(k, len(vectors))
+
+    start = time.perf_counter()
+    truth = exact_search(vectors, queries, k)
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    index_type = description['type']
+    if index_type in ('ivf_flat', 'ivf_pq'):
+        param_name = 'nprobe'
+        nlist = description['params']['nlist']
+        sweep = [v for v in NPROBE_SWEEP if v < nlist] + [nlist]
+    elif index_type == 'hnsw':
+        param_name = 'efSearch'
+        sweep = [v for v in EF_SEARCH_SWEEP if v >= k]
+    else:
+        param_name = None
+        sweep = []
+
+    rows: List[Dict[str, Any]] = []
+    if param_name:
+        for value in sweep:
+            set_search_params(index, {param_name: value})
+            found, ms, _ = _timed_search(index, queries, k)
+            rows.append({param_name: value, 'recall': _recall(found, truth), 'latency_ms': ms})
+    else:
+        found, ms, _ = _timed_search(index, queries, k)
+        rows.append({'recall': _recall(found, truth), 'latency_ms': ms})
+
+    # Cheapest setting meeting the target, else the most accurate one measured
+    chosen = next((row for row in rows if row['recall'] >= target_recall), max(rows, key=lambda r: r['recall']))
+    search_params = {param_name: chosen[param_name]} if param_name else {}
+    set_search_params(index, search_params)
+
+    report = {
+        'index': description,
+        'k': k,
+        'num_queries': len(queries),
+        'target_recall': target_recall,
+        'exact_latency_ms': exact_ms,
+        'sweep': rows,
+        'search_params': search_params,
+        'recall': chosen['recall'],
+        'latency_ms': chosen['latency_ms'],
+        'vector_bytes': vector_bytes(index),
+        'float32_bytes': int(len(vectors) * vectors.shape[1] * 4),
+    }
+
+    # Compressed codes: how much the ranking of the top results suffers, with and without exact rescoring
+    if approximate_distances(description):
+        top = min(rescore_k, k)
+        found, _, distances = _timed_search(index, queries, k)
+        rescored = rescore_exact(vectors, queries, distances, found)
+        reordered = np.take_along_axis(found, np.argsort(rescored, axis=1, kind='stable'), axis=1)
+        report['top_k'] = top
+        report['quantized_recall_at_top_k'] = _recall(found[:, :top], truth[:, :top])
+        report['rescored_recall_at_top_k'] = _recall(reordered[:, :top], truth[:, :top])
+    return report
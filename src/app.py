@@ -6,12 +6,14 @@ Includes: MySQL-backed auth (signup/signin) and chat history storage
 """
 
 from fastapi import FastAPI, HTTPException, Header, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 import logging
 import io
+import os
 import re
 from pathlib import Path
 import uvicorn
@@ -27,8 +29,10 @@ except Exception:
 # Import RAG engine
 try:
     from src.rag_engine import RAGResponseGenerator
+    from src.concurrency import apply_thread_policy
 except ImportError:
     from rag_engine import RAGResponseGenerator
+    from concurrency import apply_thread_policy
 
 # Import database module
 try:
@@ -52,6 +56,8 @@ logger = logging.getLogger(__name__)
 BASE_DIR = Path(__file__).resolve().parent.parent
 FRONTEND_FILE = BASE_DIR / "public" / "index.html"
 LOGIN_FILE = BASE_DIR / "public" / "login.html"
+# Longest a query waits for the startup embedding warmup before answering 503
+WARMUP_WAIT_SECONDS = 120
 
 # Initialize FastAPI
 app = FastAPI(title="KARE AI Chatbot")
@@ -190,6 +196,8 @@ async def startup():
         logger.error("❌ MySQL database initialization failed!")
 
     try:
+        # Requests run in the threadpool: cap FAISS / torch threads so they do not oversubscribe the cores
+        apply_thread_policy()
         logger.info("Initializing FAISS RAG Engine...")
         rag_engine = RAGResponseGenerator(
             vector_store_path=str(BASE_DIR / "faiss_index"),
@@ -199,6 +207,16 @@ async def startup():
 
         if rag_engine.vector_store and rag_engine.vector_store.index:
             logger.info(f"Loaded {len(rag_engine.vector_store.chunks)} chunks from FAISS")
+            # Load the embedding model + warm queries off the event loop so the first user isn't waiting on it
+            rag_engine.vector_store.start_warmup()
+            # Optionally re-index data_md files live as they are edited (no rebuild / restart)
+            # With several worker processes one of them watches; the others serve its changes once they
+            # are compacted into a new version, so set INDEX_RELOAD_INTERVAL too
+            if os.getenv("WATCH_DATA_DIR", "").lower() in ("1", "true", "yes"):
+                rag_engine.vector_store.start_watcher()
+            # Hot-swap to index versions published by rebuild_index.py (seconds between checks)
+            if os.getenv("INDEX_RELOAD_INTERVAL"):
+                rag_engine.vector_store.start_version_watcher(float(os.getenv("INDEX_RELOAD_INTERVAL")))
             logger.info("Ready at http://localhost:8000")
         else:
             logger.error("FAISS index not loaded!")
@@ -236,6 +254,8 @@ async def health():
         "rag_initialized": rag_engine is not None,
         "faiss_loaded": rag_engine and rag_engine.vector_store and rag_engine.vector_store.index is not None,
         "chunks": len(rag_engine.vector_store.chunks) if rag_engine and rag_engine.vector_store else 0,
+        "index_version": rag_engine.vector_store.index_version if rag_engine and rag_engine.vector_store else None,
+        "embedding_ready": bool(rag_engine and rag_engine.vector_store and rag_engine.vector_store.is_ready),
     }
 
 
@@ -324,6 +344,11 @@ async def query(q: Query, request: Request) -> Response:
     if not rag_engine.vector_store or not rag_engine.vector_store.index:
         raise HTTPException(status_code=503, detail="FAISS index not loaded")
 
+    # Requests arriving during startup warmup wait for it instead of loading the model again
+    if not rag_engine.vector_store.is_ready:
+        if not await run_in_threadpool(rag_engine.vector_store.wait_until_ready, WARMUP_WAIT_SECONDS):
+            raise HTTPException(status_code=503, detail="Embedding model still loading, please retry")
+
     # Get current user (if authenticated)
     auth = request.headers.get("Authorization", "")
     user = _get_current_user(auth)
@@ -334,7 +359,9 @@ async def query(q: Query, request: Request) -> Response:
         logger.info(f"Detected language: {detected_lang}")
 
         # Route through RAG engine — handles greetings, relevance filtering, formatting
-        response_text = rag_engine.generate_response(
+        # (in the threadpool, so concurrent queries do not block the event loop)
+        response_text = await run_in_threadpool(
+            rag_engine.generate_response,
             query=user_query,
             language=detected_lang,
             top_k=5,
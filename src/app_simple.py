@@ -4,6 +4,7 @@ Uses: FAISS (search) + Google Gemini (LLM generation)
 """
 
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse
 from fastapi.staticfiles import StaticFiles
@@ -21,9 +22,11 @@ load_dotenv()
 try:
     from src.vector_store import VectorStoreManager
     from src.multilingual_service import MultilingualService
+    from src.concurrency import apply_thread_policy
 except ImportError:
     from vector_store import VectorStoreManager
     from multilingual_service import MultilingualService
+    from concurrency import apply_thread_policy
 
 # Initialize multilingual service
 multilingual_service = MultilingualService()
@@ -35,6 +38,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Longest startup waits for an INDEX_MISMATCH rebuild before serving without an index
+REBUILD_WAIT_SECONDS = 120
+
 
 def detect_query_intent(query: str) -> str:
     """Detect the intent/category of the user's query"""
@@ -95,6 +101,27 @@ def detect_query_intent(query: str) -> str:
     return 'general'
 
 
+# Source files each intent is answered from; the search is filtered to them first
+INTENT_SOURCES = {
+    'hostel_fresher': ['hostels'],
+    'hostel_fee': ['hostels', 'fees'],
+    'hostel_booking': ['hostels'],
+    'hostel_general': ['hostels'],
+    'fee_structure': ['fees'],
+    'fee_scholarship': ['fees', 'scholarships'],
+    'admission_process': ['admissions'],
+    'admission_documents': ['admissions'],
+    'admission_general': ['admissions'],
+    'placement': ['placements'],
+    'programs': ['programs', 'departments'],
+    'contact': ['contact'],
+    'website': ['websites'],
+    'facilities': ['facilities', 'academic_blocks'],
+    'transport': ['transport'],
+    'food_menu': ['mess', 'hostels'],
+}
+
+
 def format_response_by_intent(intent: str, query: str, chunks: list) -> str:
     """Format response based on detected intent"""
     
@@ -398,6 +425,9 @@ async def startup():
     logger.info("KARE AI CHATBOT STARTING...")
     logger.info("="*70)
     
+    # Requests run in the threadpool: cap FAISS / torch threads so they do not oversubscribe the cores
+    apply_thread_policy()
+    
     # Load FAISS vector store
     logger.info("Loading FAISS vector store...")
     vector_store = VectorStoreManager(
@@ -405,11 +435,25 @@ async def startup():
         vector_store_path="faiss_index"
     )
     
-    if not vector_store.load_vector_store():
-        logger.error("Failed to load FAISS index!")
-        raise RuntimeError("FAISS index not found. Run: python build_faiss_index.py")
+    # INDEX_MISMATCH=rebuild: an index built for another embedding model is rebuilt before serving
+    # (the wait runs in the threadpool and is bounded; a rebuild still running keeps going and
+    # is served once it finishes, queries find nothing until then)
+    if not vector_store.load_vector_store() and not await run_in_threadpool(vector_store.wait_for_rebuild,
+                                                                            REBUILD_WAIT_SECONDS):
+        logger.error("Failed to load FAISS index! Not found, built with another embedding model, "
+                     f"or still rebuilding after {REBUILD_WAIT_SECONDS}s. Run: python build_faiss_index.py")
+        return
     
     logger.info(f"[OK] Loaded {len(vector_store.chunks)} chunks from FAISS")
+    vector_store.start_warmup()
+    # Optionally re-index data_md files live as they are edited (no rebuild / restart)
+    # With several worker processes one of them watches; the others serve its changes once they
+    # are compacted into a new version, so set INDEX_RELOAD_INTERVAL too
+    if os.getenv("WATCH_DATA_DIR", "").lower() in ("1", "true", "yes"):
+        vector_store.start_watcher()
+    # Hot-swap to index versions published by rebuild_index.py (seconds between checks)
+    if os.getenv("INDEX_RELOAD_INTERVAL"):
+        vector_store.start_version_watcher(float(os.getenv("INDEX_RELOAD_INTERVAL")))
     logger.info("[OK] Using pure FAISS search with multilingual translation")
     
     logger.info("="*70)
@@ -482,9 +526,20 @@ async def query(q: Query) -> Response:
                     logger.warning(f"Greeting translation failed: {e}")
             return Response(response=greeting_response)
         
-        # Search FAISS for relevant information using the translated English query
+        # Detect query intent for specialized formatting
+        query_intent = detect_query_intent(search_query)
+        logger.info(f"Detected intent: {query_intent}")
+        
+        # Search FAISS for relevant information using the translated English query,
+        # first only in the intent's sources, then everywhere if nothing relevant is there
         top_k = 10
-        results = vector_store.search(search_query, top_k=top_k)
+        results = []
+        intent_sources = INTENT_SOURCES.get(query_intent)
+        if intent_sources:
+            results = await run_in_threadpool(vector_store.search, search_query, top_k=top_k,
+                                              filters={'source_file': intent_sources})
+        if not any(result.get('similarity_score', 0) > 0.35 for result in results):
+            results = await run_in_threadpool(vector_store.search, search_query, top_k=top_k)
         
         if not results:
             no_results_msg = "I couldn't find specific information about that. Please ask about:\n- Admissions\n- Hostel facilities and fees\n- Placements\n- Campus facilities\n- Scholarships\n- Programs offered\n- Contact information"
@@ -498,10 +553,6 @@ async def query(q: Query) -> Response:
             
             return Response(response=no_results_msg)
         
-        # Detect query intent for specialized formatting
-        query_intent = detect_query_intent(search_query)
-        logger.info(f"Detected intent: {query_intent}")
-        
         # Collect relevant results with metadata
         relevant_chunks = []
         sources = set()
@@ -765,6 +816,8 @@ async def health():
         "status": "healthy",
         "vector_store": "loaded" if vector_store and vector_store.index else "not loaded",
         "chunks": len(vector_store.chunks) if vector_store else 0,
+        "index_version": vector_store.index_version if vector_store else None,
+        "candidate_pool": vector_store.pool_stats() if vector_store else None,
         "multilingual": "available"
     }
 
@@ -0,0 +1,126 @@
+"""
+Chunk Filters
+Search filters restrict retrieval to chunks of some sources, sections or metadata
+values. ChunkFilterIndex resolves a filter to the matching chunk rows; the vector
+store then only scores those rows (an IDSelector inside FAISS, or an exact scan of
+their float vectors when few rows match) instead of over-fetching and dropping the rest afterwards
+
+Filter keys (a value, or a list of alternatives):
+    source_file - source name ('hostels', 'fees.md', 'data.json'); a chunk also
+                  matches when a duplicate from that source was folded into it
+    header      - case-insensitive substring of the header or sub-header
+    metadata    - {key: value}: chunk['metadata'][key] equals the value
+    any other   - treated as a metadata key; chunk fields without a column
+                  (e.g. 'key' / 'item_index' of JSON chunks) match too
+Keys are combined with AND, alternatives of one key with OR
+"""
+
+import logging
+from typing import Dict, Any, List, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_NO_ROWS = np.zeros(0, dtype=np.int64)
+
+# Chunk fields with their own filter (or none): not indexed as metadata values
+_NON_METADATA_FIELDS = frozenset({'text', 'metadata', 'sources', 'source_file', 'header', 'sub_header',
+                                  'section_index', 'chunk_index'})
+
+
+def _alternatives(value) -> List[Any]:
+    return list(value) if isinstance(value, (list, tuple, set, frozenset)) else [value]
+
+
+def _source_key(source: str) -> str:
+    """Lowercased source name as chunks carry it ('hostels.md' -> 'hostels')"""
+    source = str(source).lower()
+    return source[:-3] if source.endswith('.md') else source
+
+
+def _chunk_extra(chunks: Sequence, i: int) -> tuple:
+    """(source_file, non-column fields) of chunk i; ChunkStore rows are not fully decoded"""
+    if hasattr(chunks, 'extra') and hasattr(chunks, 'source_file'):
+        return chunks.source_file(i), chunks.extra(i)
+    chunk = chunks[i]
+    return chunk.get('source_file', ''), chunk
+
+
+class ChunkFilterIndex:
+    """
+    Inverted index from metadata values and folded-in sources to chunk rows
+    Built once per loaded store on its first filtered search; extend() covers
+    rows appended by live updates and returns a new index (self is unchanged)
+    """
+
+    def __init__(self, chunks: Sequence):
+        self.size = 0
+        self._source_refs: Dict[str, np.ndarray] = {}  # Source -> rows other sources' chunks folded it into
+        self._values: Dict[tuple, np.ndarray] = {}  # (key, value) -> rows
+        self._add(chunks, 0)
+
+    def extend(self, chunks: Sequence) -> "ChunkFilterIndex":
+        extended = ChunkFilterIndex.__new__(ChunkFilterIndex)
+        extended.size = self.size
+        extended._source_refs = dict(self._source_refs)
+        extended._values = dict(self._values)
+        extended._add(chunks, self.size)
+        return extended
+
+    def _add(self, chunks: Sequence, start: int):
+        source_refs: Dict[str, List[int]] = {}
+        values: Dict[tuple, List[int]] = {}
+        for i in range(start, len(chunks)):
+            source_file, extra = _chunk_extra(chunks, i)
+            own = _source_key(source_file)
+            for ref in extra.get('sources') or ():
+                source = _source_key(ref.get('source_file', ''))
+                if source != own:
+                    source_refs.setdefault(source, []).append(i)
+            fields = dict(extra.get('metadata') or {})
+            for key, value in extra.items():
+                if key not in _NON_METADATA_FIELDS:
+                    fields.setdefault(key, value)
+            for key, value in fields.items():
+                if isinstance(value, (str, int, float, bool)) or value is None:
+                    values.setdefault((key, value), []).append(i)
+
+        for index, added in ((self._source_refs, source_refs), (self._values, values)):
+            for key, rows in added.items():
+                rows = np.asarray(rows, dtype=np.int64)
+                index[key] = np.concatenate((index[key], rows)) if key in index else rows
+        self.size = len(chunks)
+
+    def _source_rows(self, source: str, features) -> np.ndarray:
+        source = _source_key(source)
+        own = features.source_chunks(source)
+        return np.union1d(own, self._source_refs.get(source, _NO_ROWS))
+
+    def _value_rows(self, key: str, value) -> np.ndarray:
+        return self._values.get((key, value), _NO_ROWS)
+
+    def rows(self, filters: Dict[str, Any], features) -> np.ndarray:
+        """
+        Sorted rows matching every filter key (features: the store's LexicalFeatures,
+        which already index sources and headers)
+        """
+        matched = None
+        for key, value in filters.items():
+            if key == 'metadata':
+                conditions = list(value.items())
+            else:
+                conditions = [(key, value)]
+            for name, wanted in conditions:
+                alternatives = _alternatives(wanted)
+                if name == 'source_file' and key != 'metadata':
+                    found = [self._source_rows(source, features) for source in alternatives]
+                elif name == 'header' and key != 'metadata':
+                    found = [features.header_chunks(str(header)) for header in alternatives]
+                else:
+                    found = [self._value_rows(name, v) for v in alternatives]
+                rows = np.unique(np.concatenate(found)).astype(np.int64) if found else _NO_ROWS
+                matched = rows if matched is None else np.intersect1d(matched, rows, assume_unique=True)
+        if matched is None:
+            return np.arange(self.size, dtype=np.int64)
+        return matched[matched < self.size]
@@ -0,0 +1,204 @@
+"""
+Columnar Chunk Store
+Compact, memory-mapped on-disk format for vector store chunks
+
+Layout (all files live next to faiss_index.bin):
+    chunks_text.bin     - UTF-8 chunk texts concatenated into one blob
+    chunks_extra.bin    - JSON-encoded per-chunk fields that have no column (metadata, key, ...)
+    chunks_index.npy    - one fixed-size row per chunk (byte offsets + interned string ids)
+    chunks_strings.json - interned string table for source_file / header / sub_header
+
+Opening a store maps the files read-only, so several server processes share
+the same pages and only the chunks a search returns are turned into dicts.
+"""
+
+import os
+import json
+import mmap
+from collections.abc import Sequence
+from typing import List, Dict, Any
+
+import numpy as np
+
+CHUNK_STORE_VERSION = 1
+
+TEXT_FILE = "chunks_text.bin"
+EXTRA_FILE = "chunks_extra.bin"
+INDEX_FILE = "chunks_index.npy"
+STRINGS_FILE = "chunks_strings.json"
+
+# -1 marks a field that the chunk does not have (e.g. JSON chunks have no header)
+MISSING = -1
+
+ROW_DTYPE = np.dtype([
+    ('text_start', '<i8'),
+    ('text_end', '<i8'),
+    ('extra_start', '<i8'),
+    ('extra_end', '<i8'),
+    ('source_id', '<i4'),
+    ('header_id', '<i4'),
+    ('sub_header_id', '<i4'),
+    ('section_index', '<i4'),
+    ('chunk_index', '<i4'),
+])
+
+# Chunk keys stored as columns; everything else goes to the extra blob
+_STRING_COLUMNS = (('source_file', 'source_id'), ('header', 'header_id'), ('sub_header', 'sub_header_id'))
+_INT_COLUMNS = ('section_index', 'chunk_index')
+_COLUMN_KEYS = {'text', 'metadata'} | {key for key, _ in _STRING_COLUMNS} | set(_INT_COLUMNS)
+
+
+def chunk_store_exists(path: str) -> bool:
+    """Check whether a complete chunk store exists in a directory"""
+    return all(
+        os.path.exists(os.path.join(path, name))
+        for name in (TEXT_FILE, EXTRA_FILE, INDEX_FILE, STRINGS_FILE)
+    )
+
+
+def _map_file(filepath: str):
+    """Memory-map a file read-only (empty files cannot be mapped)"""
+    with open(filepath, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class ChunkStore(Sequence):
+    """Read-only, memory-mapped sequence of chunk dicts"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+        with open(os.path.join(path, STRINGS_FILE), 'r', encoding='utf-8') as f:
+            header = json.load(f)
+        if header.get('version') != CHUNK_STORE_VERSION:
+            raise ValueError(f"Unsupported chunk store version: {header.get('version')}")
+        self.strings: List[str] = header['strings']
+
+        self.rows = np.load(os.path.join(path, INDEX_FILE), mmap_mode='r')
+        self._text = _map_file(os.path.join(path, TEXT_FILE))
+        self._extra = _map_file(os.path.join(path, EXTRA_FILE))
+
+    @staticmethod
+    def write(path: str, chunks: List[Dict[str, Any]]):
+        """Write chunks to the columnar format (files are replaced atomically)"""
+        os.makedirs(path, exist_ok=True)
+
+        rows = np.zeros(len(chunks), dtype=ROW_DTYPE)
+        string_ids: Dict[str, int] = {}
+        strings: List[str] = []
+
+        def intern(value) -> int:
+            if value is None:
+                return MISSING
+            if value not in string_ids:
+                string_ids[value] = len(strings)
+                strings.append(value)
+            return string_ids[value]
+
+        text_tmp = os.path.join(path, TEXT_FILE + '.tmp')
+        extra_tmp = os.path.join(path, EXTRA_FILE + '.tmp')
+        with open(text_tmp, 'wb') as text_f, open(extra_tmp, 'wb') as extra_f:
+            text_pos = 0
+            extra_pos = 0
+            for i, chunk in enumerate(chunks):
+                row = rows[i]
+
+                data = chunk.get('text', '').encode('utf-8')
+                text_f.write(data)
+                row['text_start'] = text_pos
+                text_pos += len(data)
+                row['text_end'] = text_pos
+
+                for key, column in _STRING_COLUMNS:
+                    row[column] = intern(chunk.get(key))
+                for key in _INT_COLUMNS:
+                    row[key] = chunk.get(key, MISSING)
+
+                extra = {k: v for k, v in chunk.items() if k not in _COLUMN_KEYS}
+                if chunk.get('metadata'):
+                    extra['metadata'] = chunk['metadata']
+                data = json.dumps(extra, ensure_ascii=False).encode('utf-8') if extra else b''
+                extra_f.write(data)
+                row['extra_start'] = extra_pos
+                extra_pos += len(data)
+                row['extra_end'] = extra_pos
+
+        index_tmp = os.path.join(path, INDEX_FILE + '.tmp.npy')
+        np.save(index_tmp, rows)
+
+        strings_tmp = os.path.join(path, STRINGS_FILE + '.tmp')
+        with open(strings_tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': CHUNK_STORE_VERSION, 'count': len(chunks), 'strings': strings},
+                      f, ensure_ascii=False)
+
+        # Strings file goes last: its presence marks a complete store
+        os.replace(text_tmp, os.path.join(path, TEXT_FILE))
+        os.replace(extra_tmp, os.path.join(path, EXTRA_FILE))
+        os.replace(index_tmp, os.path.join(path, INDEX_FILE))
+        os.replace(strings_tmp, os.path.join(path, STRINGS_FILE))
+
+    def close(self):
+        """Release the memory maps"""
+        for blob in (self._text, self._extra):
+            if isinstance(blob, mmap.mmap):
+                blob.close()
+        self._text = b''
+        self._extra = b''
+        self.rows = np.zeros(0, dtype=ROW_DTYPE)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return self.materialize(int(i))
+
+    def _string(self, string_id: int) -> str:
+        return self.strings[string_id] if string_id != MISSING else ''
+
+    def text(self, i: int) -> str:
+        """Chunk text without materializing the rest of the chunk"""
+        row = self.rows[i]
+        return self._text[row['text_start']:row['text_end']].decode('utf-8')
+
+    def source_file(self, i: int) -> str:
+        return self._string(int(self.rows[i]['source_id']))
+
+    def header(self, i: int) -> str:
+        return self._string(int(self.rows[i]['header_id']))
+
+    def sub_header(self, i: int) -> str:
+        return self._string(int(self.rows[i]['sub_header_id']))
+
+    def extra(self, i: int) -> Dict[str, Any]:
+        """Fields without a column (metadata, sources, key, ...) without decoding the text"""
+        row = self.rows[i]
+        if row['extra_end'] <= row['extra_start']:
+            return {}
+        return json.loads(self._extra[row['extra_start']:row['extra_end']].decode('utf-8'))
+
+    def materialize(self, i: int) -> Dict[str, Any]:
+        """Build the chunk dict for one row"""
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("chunk index out of range")
+
+        row = self.rows[i]
+        chunk: Dict[str, Any] = {
+            'text': self._text[row['text_start']:row['text_end']].decode('utf-8'),
+        }
+        for key, column in _STRING_COLUMNS:
+            if row[column] != MISSING:
+                chunk[key] = self.strings[row[column]]
+        for key in _INT_COLUMNS:
+            if row[key] != MISSING:
+                chunk[key] = int(row[key])
+
+        chunk['metadata'] = {}
+        if row['extra_end'] > row['extra_start']:
+            chunk.update(json.loads(self._extra[row['extra_start']:row['extra_end']].decode('utf-8')))
+        return chunk
@@ -0,0 +1,421 @@
+"""
+Chunkers
+Turn data files into chunk dicts for the vector store. Module-level functions
+(not VectorStoreManager methods) so index builds can run them in worker processes
+
+Markdown is chunked by iter_markdown_chunks(): one pass over the lines with a
+heading stack, yielding chunks as soon as their section is known to be kept.
+tests/test_chunker.py keeps the previous split-based chunker as the reference
+it must stay equivalent to
+"""
+
+import os
+import re
+import json
+import logging
+from typing import List, Dict, Any, Iterable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# Bump when chunk boundaries or chunk fields change: the index manifest records it,
+# so stores chunked by an older version are not reused by incremental builds
+CHUNKER_VERSION = 2
+
+
+# Section / sub-section header at the start of a block (same rule as the split-based reference chunker)
+_BLOCK_HEADER = re.compile(r'#+\s+.+')
+# Any heading line; levels 1-4 feed the heading stack
+_HEADING_LINE = re.compile(r'(#{1,4})\s+(.*\S)')
+
+# Shortest kept section / sub-section (stripped characters)
+_MIN_SECTION_CHARS = 20
+_MIN_SUB_SECTION_CHARS = 15
+
+
+def _opens_block(line: str, marker: str) -> bool:
+    """True for a line starting with marker followed by whitespace ('## ' opens a section, '### ' a sub-section)"""
+    return line.startswith(marker) and len(line) > len(marker) and line[len(marker)].isspace()
+
+
+def _block_header(text: str) -> str:
+    match = _BLOCK_HEADER.match(text)
+    return match.group(0).lstrip('#').strip() if match else ''
+
+
+class _Block:
+    """Lines of the current sub-section; whitespace is only inspected when the block is finished"""
+
+    def __init__(self, start: int):
+        self.start = start
+        self.lines: List[str] = []
+        self._scanned = 0
+        self._has_content = False
+
+    def has_content(self) -> bool:
+        """Any non-whitespace line so far (lines are scanned once)"""
+        if not self._has_content:
+            self._has_content = any(line.strip() for line in self.lines[self._scanned:])
+            self._scanned = len(self.lines)
+        return self._has_content
+
+    def text(self):
+        """(raw text, content start, content end) with offsets into the file; start is None if blank"""
+        raw = ''.join(self.lines)
+        content = raw.strip()
+        if not content:
+            return raw, None, self.start
+        lead = len(raw) - len(raw.lstrip())
+        return raw, self.start + lead, self.start + lead + len(content)
+
+
+def _sub_section_chunks(text: str, text_start: int, header: str, section_index: int, sub_index: int,
+                        header_path: List[str], source_file: str, chunk_size: int) -> List[Dict[str, Any]]:
+    """Chunks of one sub-section (stripped text at text_start): whole if it fits in chunk_size, else grouped paragraphs"""
+    if len(text) < _MIN_SUB_SECTION_CHARS:
+        return []
+
+    sub_header = _block_header(text)
+    context_prefix = ''
+    if header:
+        context_prefix = f"Topic: {header}"
+        if sub_header and sub_header != header:
+            context_prefix += f" > {sub_header}"
+        context_prefix += "\n"
+
+    def make_chunk(body: str, chunk_index: int, start: int, end: int) -> Dict[str, Any]:
+        return {
+            'text': context_prefix + body,
+            'source_file': source_file,
+            'section_index': section_index,
+            'chunk_index': chunk_index,
+            'header': header,
+            'sub_header': sub_header,
+            'metadata': {},
+            'char_start': start,
+            'char_end': end,
+            'header_path': header_path,
+        }
+
+    if len(text) <= chunk_size:
+        return [make_chunk(text, sub_index, text_start, text_start + len(text))]
+
+    # Group paragraphs ('\n\n'-separated) up to chunk_size, counting a newline after each
+    chunks = []
+    paragraphs: List[str] = []
+    span: List[int] = []  # Offsets (in text) of the pieces holding the first and last paragraph
+    length = len(context_prefix)
+    min_length = length + 10
+    pos = 0
+
+    def emit():
+        first = text.find(paragraphs[0], span[0])
+        last = text.find(paragraphs[-1], span[1])
+        chunks.append(make_chunk('\n'.join(paragraphs), len(chunks),
+                                 text_start + first, text_start + last + len(paragraphs[-1])))
+
+    for piece in text.split('\n\n'):
+        para = piece.strip()
+        if para:
+            if length + len(para) > chunk_size and length > min_length:
+                emit()
+                paragraphs = []
+                length = len(context_prefix)
+            if not paragraphs:
+                span = [pos, pos]
+            paragraphs.append(para)
+            span[1] = pos
+            length += len(para) + 1
+        pos += len(piece) + 2
+
+    if paragraphs and len('\n'.join(paragraphs)) > 10:
+        emit()
+    return chunks
+
+
+def iter_markdown_chunks(lines: Iterable[str], source_file: str,
+                         chunk_size: int = 500) -> Iterator[Dict[str, Any]]:
+    """
+    Single-pass Markdown chunker over lines (with their newlines, e.g. an open file)
+    '## ' lines open sections and '### ' lines sub-sections, exactly where the
+    regex chunker splits; a heading stack (# .. ####) gives each chunk its
+    header_path, and char_start / char_end locate the chunk body in the file text
+    Only the current sub-section's lines are held in memory
+    """
+    section_index = 0
+    section_start: Optional[int] = None  # Content span of the current section so far
+    section_end = 0
+    sub = _Block(0)
+    sub_index = 0
+    header = ''
+    stack: List[tuple] = []  # (level, title) of the enclosing headings
+    sub_header_path: List[str] = []
+    pending: List[Dict[str, Any]] = []  # Chunks waiting for their section to reach the minimum length
+
+    def finish_sub() -> List[Dict[str, Any]]:
+        nonlocal header, section_start, section_end
+        raw, start, end = sub.text()
+        if start is not None:
+            if section_start is None:
+                section_start = start
+            section_end = end
+            if sub_index == 0:
+                header = _block_header(raw[start - sub.start:])
+            pending.extend(_sub_section_chunks(raw[start - sub.start:end - sub.start], start, header,
+                                               section_index, sub_index, sub_header_path,
+                                               source_file, chunk_size))
+        if section_start is not None and section_end - section_start >= _MIN_SECTION_CHARS:
+            ready = pending[:]
+            pending.clear()
+            return ready
+        return []
+
+    append = sub.lines.append
+    for line in lines:
+        if line[:1] == '#':
+            # Headings are the only lines that need work; everything else is just collected
+            if sub.lines or sub.start:
+                offset = sub.start + sum(map(len, sub.lines))
+                if _opens_block(line, '##'):
+                    yield from finish_sub()
+                    pending.clear()  # Section too short to keep
+                    section_index += 1
+                    section_start = None
+                    sub = _Block(offset)
+                    append = sub.lines.append
+                    sub_index = 0
+                    header = ''
+                elif _opens_block(line, '###') and (section_start is not None or sub.has_content()):
+                    yield from finish_sub()
+                    sub = _Block(offset)
+                    append = sub.lines.append
+                    sub_index += 1
+
+            heading = _HEADING_LINE.match(line)
+            if heading:
+                level = len(heading.group(1))
+                while stack and stack[-1][0] >= level:
+                    stack.pop()
+                stack.append((level, heading.group(2).strip()))
+            if not sub.has_content():
+                # First content line of the sub-section: its heading path is the stack as of here
+                sub_header_path = [title for _, title in stack]
+        append(line)
+
+    yield from finish_sub()
+
+
+def chunk_markdown_file(filepath: str, chunk_size: int = 500) -> List[Dict[str, Any]]:
+    """
+    Load and chunk a single Markdown file
+    Returns list of chunks with metadata
+    Uses section-aware chunking to preserve context (see iter_markdown_chunks)
+    """
+    filename = os.path.basename(filepath)
+    logger.info(f"📄 Processing: {filename}")
+
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            chunks = list(iter_markdown_chunks(f, filename.replace('.md', ''), chunk_size))
+        logger.info(f"  ✅ Created {len(chunks)} chunks from {filename}")
+        return chunks
+
+    except Exception as e:
+        logger.error(f"  ❌ Error processing {filename}: {e}")
+        return []
+
+
+_JSON_READ_SIZE = 1 << 16
+_JSON_DECODER = json.JSONDecoder()
+_NUMBER_CHARS = '0123456789.eE+-'
+
+
+class _JsonReader:
+    """Buffered reader that decodes one JSON value at a time from a text stream"""
+
+    def __init__(self, fp):
+        self.fp = fp
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, size: int = _JSON_READ_SIZE) -> bool:
+        """Read another block, dropping the consumed part of the buffer; False at end of file"""
+        if self.eof:
+            return False
+        block = self.fp.read(size)
+        if not block:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + block
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character ('' at end of file)"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self._fill():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, chars: str) -> str:
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(f"Expected one of {chars!r} in JSON, found {char or 'end of file'!r}")
+        self.pos += 1
+        return char
+
+    def value(self) -> Any:
+        """Decode the next complete value, reading more while it is cut off by the buffer end"""
+        self.peek()
+        size = _JSON_READ_SIZE
+        while True:
+            try:
+                value, end = _JSON_DECODER.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # Value cut off by the buffer end; read blocks of doubling size so large items stay linear
+                size *= 2
+                if self._fill(size):
+                    continue
+                raise
+            # A number may continue in the next block: only accept it once a terminator follows
+            if (end == len(self.buffer) or (isinstance(value, (int, float)) and
+                                            not self.buffer[end:].strip(_NUMBER_CHARS))) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_json_items(fp) -> Iterator[tuple]:
+    """
+    Stream the top level of a JSON document without loading it
+    Yields (index, item) for an array or (key, value) for an object; only one
+    item and a read block are held in memory. Any other document yields (None, value)
+    """
+    reader = _JsonReader(fp)
+    opening = reader.peek()
+    if opening not in ('[', '{'):
+        yield None, reader.value()
+        return
+
+    reader.expect(opening)
+    closing = ']' if opening == '[' else '}'
+    if reader.peek() == closing:
+        reader.expect(closing)
+        return
+
+    index = 0
+    while True:
+        if opening == '{':
+            key = reader.value()
+            reader.expect(':')
+            yield key, reader.value()
+        else:
+            yield index, reader.value()
+            index += 1
+        if reader.expect(',' + closing) == closing:
+            return
+
+
+def _item_chunks(text: str, chunk_size: int, source_file: str, position: Dict[str, Any],
+                 metadata: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    pieces = split_text(text, chunk_size) if len(text) > chunk_size else [text]
+    for sub_idx, piece in enumerate(pieces):
+        yield {
+            'text': piece,
+            'source_file': source_file,
+            **position,
+            'chunk_index': sub_idx,
+            'metadata': metadata
+        }
+
+
+def iter_json_chunks(fp, source_file: str, chunk_size: int = 500) -> Iterator[Dict[str, Any]]:
+    """
+    Chunks of a JSON document as it is read (see iter_json_items)
+    Array items become chunks with 'item_index', object entries chunks with 'key';
+    items longer than chunk_size are split
+    """
+    for position, item in iter_json_items(fp):
+        if isinstance(position, str):
+            yield from _item_chunks(extract_text_from_item({position: item}), chunk_size, source_file,
+                                    {'key': position}, {position: item})
+        elif position is not None:
+            yield from _item_chunks(extract_text_from_item(item), chunk_size, source_file,
+                                    {'item_index': position}, item if isinstance(item, dict) else {})
+
+
+def chunk_json_file(filepath: str, chunk_size: int = 500) -> List[Dict[str, Any]]:
+    """
+    Load and chunk a single JSON file
+    Returns list of chunks with metadata
+    The file is parsed incrementally (see iter_json_chunks), one top-level item at a time
+    """
+    filename = os.path.basename(filepath)
+    logger.info(f"📄 Processing: {filename}")
+
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            chunks = list(iter_json_chunks(f, filename, chunk_size))
+        logger.info(f"  ✅ Created {len(chunks)} chunks from {filename}")
+        return chunks
+
+    except Exception as e:
+        logger.error(f"  ❌ Error processing {filename}: {e}")
+        return []
+
+
+def source_name(filepath: str) -> str:
+    """The 'source_file' value chunk_file() gives the chunks of a file"""
+    filename = os.path.basename(filepath)
+    return filename if filename.endswith('.json') else filename.replace('.md', '')
+
+
+def chunk_file(filepath: str, chunk_size: int = 500) -> List[Dict[str, Any]]:
+    """Chunk a Markdown or JSON source by its extension"""
+    if filepath.endswith('.json'):
+        return chunk_json_file(filepath, chunk_size)
+    return chunk_markdown_file(filepath, chunk_size)
+
+
+def extract_text_from_item(item: Any) -> str:
+    """Extract searchable text from JSON item"""
+    if isinstance(item, str):
+        return item
+    elif isinstance(item, dict):
+        text_parts = []
+        for key, value in item.items():
+            if isinstance(value, (str, int, float, bool)):
+                text_parts.append(f"{key}: {value}")
+            elif isinstance(value, list):
+                text_parts.append(f"{key}: {' '.join(str(v) for v in value)}")
+            elif isinstance(value, dict):
+                text_parts.append(extract_text_from_item(value))
+        return " | ".join(text_parts)
+    elif isinstance(item, list):
+        return " | ".join(extract_text_from_item(i) for i in item)
+    else:
+        return str(item)
+
+
+def split_text(text: str, chunk_size: int) -> List[str]:
+    """Split text into chunks of approximately chunk_size characters"""
+    words = text.split()
+    chunks = []
+    current_chunk = []
+    current_length = 0
+
+    for word in words:
+        word_length = len(word) + 1  # +1 for space
+        if current_length + word_length > chunk_size and current_chunk:
+            chunks.append(' '.join(current_chunk))
+            current_chunk = [word]
+            current_length = word_length
+        else:
+            current_chunk.append(word)
+            current_length += word_length
+
+    if current_chunk:
+        chunks.append(' '.join(current_chunk))
+
+    return chunks
@@ -0,0 +1,126 @@
+"""
+Concurrency Helpers
+- ReaderCount: searches reading a resource (an index version) that a swap may
+  retire at any time; the resource is released by whoever finishes last, so
+  neither searches nor swaps ever wait for each other
+- Thread policy: FAISS (OpenMP) and PyTorch use one thread per core for every
+  operation by default. With uvicorn answering requests from its thread pool,
+  concurrent operations multiply that into far more threads than cores, so the
+  policy caps the intra-op threads at cores / (worker processes x concurrent requests)
+"""
+
+import os
+import sys
+import logging
+import threading
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Concurrent requests per worker process the thread policy plans for (REQUEST_THREADS)
+DEFAULT_REQUEST_THREADS = 4
+
+
+class ReaderCount:
+    """
+    Readers of a shared resource and its release: retire() releases it at once when
+    nobody reads it, else the last reader's release() does
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._readers = 0
+        self._retired = False
+        self._on_idle = None
+
+    def acquire(self) -> bool:
+        """Register a reader; False once retired (read the replacement instead)"""
+        with self._lock:
+            if self._retired:
+                return False
+            self._readers += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self._readers -= 1
+            on_idle = None if self._readers else self._on_idle
+            if on_idle is not None:
+                self._on_idle = None
+        if on_idle is not None:
+            on_idle()
+
+    def retire(self, on_idle: Callable[[], None]):
+        """No new readers from now on; on_idle runs once the current ones are done"""
+        with self._lock:
+            self._retired = True
+            if self._readers:
+                self._on_idle = on_idle
+                return
+        on_idle()
+
+
+def _env_int(name: str, default: int) -> int:
+    if not os.getenv(name):
+        return default
+    try:
+        return int(os.getenv(name)) or default
+    except ValueError:
+        logger.warning(f"⚠️ Ignoring {name}={os.getenv(name)!r} (not an integer)")
+        return default
+
+
+def thread_policy(cores: Optional[int] = None, workers: Optional[int] = None,
+                  request_threads: Optional[int] = None) -> Dict[str, int]:
+    """
+    Intra-op threads per request: the cores shared by the worker processes
+    (WEB_CONCURRENCY) and their concurrent requests (REQUEST_THREADS), at least 1
+    THREADS_PER_REQUEST overrides the result
+    """
+    cores = cores or os.cpu_count() or 1
+    workers = workers or _env_int('WEB_CONCURRENCY', 1)
+    request_threads = request_threads or _env_int('REQUEST_THREADS', DEFAULT_REQUEST_THREADS)
+    threads = _env_int('THREADS_PER_REQUEST', max(1, cores // (workers * request_threads)))
+    return {'cores': cores, 'workers': workers, 'request_threads': request_threads, 'threads': threads}
+
+
+_policy_lock = threading.Lock()
+_applied_policy: Optional[Dict[str, int]] = None
+
+
+def apply_thread_policy(threads: Optional[int] = None, **kwargs) -> Dict[str, int]:
+    """
+    Cap the FAISS OpenMP pool and the PyTorch intra-op pool (when torch is loaded) of
+    this process; threads overrides the computed policy. The first call of a process
+    applies the policy, later calls return it unless threads or policy inputs are given
+    OMP/MKL/OpenBLAS variables are also set (if unset) for libraries loaded afterwards
+    """
+    global _applied_policy
+    with _policy_lock:
+        if _applied_policy is not None and threads is None and not kwargs:
+            return _applied_policy
+        policy = thread_policy(**kwargs)
+        if threads:
+            policy['threads'] = threads
+        count = policy['threads']
+
+        for variable in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+            os.environ.setdefault(variable, str(count))
+        try:
+            import faiss
+            faiss.omp_set_num_threads(count)
+        except Exception as e:
+            logger.debug(f"FAISS thread count not set ({e})")
+        torch = sys.modules.get('torch')
+        if torch is not None:
+            torch.set_num_threads(count)
+
+        _applied_policy = policy
+        logger.info(f"🧵 Thread policy: {count} threads per request ({policy['request_threads']} concurrent "
+                    f"requests x {policy['workers']} workers on {policy['cores']} cores)")
+        return policy
+
+
+def applied_thread_policy() -> Optional[Dict[str, int]]:
+    """The policy apply_thread_policy() installed in this process (None: not applied)"""
+    return _applied_policy
@@ -0,0 +1,148 @@
+"""
+Chunk Deduplication
+Build-time folding of repeated chunks before they are embedded:
+- exact duplicates: same text after whitespace normalization (hash lookup)
+- near duplicates: MinHash signatures over word shingles, candidates from
+  LSH banding, folded when the estimated Jaccard similarity reaches the
+  threshold and both chunks state the same numbers (fees, dates, phone
+  numbers must never be merged away)
+The chunk that is kept collects a 'sources' list referencing every chunk folded into it;
+reassign_sources() keeps those references alive when one file is replaced live
+"""
+
+import re
+import zlib
+import hashlib
+import logging
+from typing import Dict, Any, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Chunk fields copied into a source reference
+SOURCE_REF_KEYS = ('source_file', 'header', 'sub_header', 'section_index', 'chunk_index', 'item_index', 'key',
+                   'char_start', 'char_end')
+
+# Prime 2**32 + 15 (the smallest above 2**32, not a Mersenne number) for the MinHash
+# permutations (a * h + b) mod p; hashes are 32-bit, so p must exceed 2**32
+_PRIME_32 = np.uint64(4294967311)
+
+_NUMBER_PATTERN = re.compile(r'\d+(?:[.,]\d+)*')
+
+
+def source_reference(chunk: Dict[str, Any]) -> Dict[str, Any]:
+    """Fields identifying where a chunk came from"""
+    return {key: chunk[key] for key in SOURCE_REF_KEYS if key in chunk}
+
+
+def _normalize(text: str) -> str:
+    return ' '.join(text.split())
+
+
+def reassign_sources(removed: List[Dict[str, Any]], added: List[Dict[str, Any]],
+                     source_file: str) -> List[Tuple[int, Dict[str, Any]]]:
+    """
+    Chunks of source_file are being replaced by added: references other files
+    folded into the removed chunks move onto the identical added chunk, or, if
+    source_file no longer has that text, the chunk is kept under the first other
+    file. Returns (position in removed, chunk) for the chunks to keep
+    """
+    added_by_text = {_normalize(chunk.get('text', '')): chunk for chunk in added}
+    kept = []
+    for position, chunk in enumerate(removed):
+        others = [ref for ref in chunk.get('sources', ()) if ref.get('source_file') != source_file]
+        if not others:
+            continue
+        target = added_by_text.get(_normalize(chunk.get('text', '')))
+        if target is not None:
+            target['sources'] = target.get('sources') or [source_reference(target)]
+            target['sources'].extend(others)
+            continue
+        survivor = {key: value for key, value in chunk.items() if key not in SOURCE_REF_KEYS}
+        survivor.update(others[0])
+        if len(others) > 1:
+            survivor['sources'] = others
+        else:
+            survivor.pop('sources', None)
+        kept.append((position, survivor))
+    return kept
+
+
+class ChunkDeduplicator:
+    """
+    Streaming deduplicator: add() each chunk in build order; returns False
+    when the chunk was folded into an earlier one (which gains a 'sources' entry)
+    """
+
+    def __init__(self, near_threshold: float = 0.9, num_perm: int = 64, bands: int = 16,
+                 shingle_size: int = 3, near_duplicates: bool = True):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.near_threshold = near_threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.near_duplicates = near_duplicates
+
+        rng = np.random.default_rng(1)
+        self._a = rng.integers(1, 2 ** 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 2 ** 32, size=num_perm, dtype=np.uint64)
+
+        self._exact: Dict[bytes, Dict[str, Any]] = {}  # text digest -> kept chunk
+        self._kept: List[Tuple[Dict[str, Any], np.ndarray, frozenset]] = []  # (chunk, signature, numbers)
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(bands)]
+
+        self.exact_removed = 0
+        self.near_removed = 0
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature of the word shingles of a text"""
+        words = text.lower().split()
+        size = self.shingle_size
+        shingles = {' '.join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+        hashes = np.array([zlib.crc32(s.encode('utf-8')) for s in shingles], dtype=np.uint64)
+        permuted = (hashes[:, None] * self._a[None, :] + self._b[None, :]) % _PRIME_32
+        return permuted.min(axis=0)
+
+    def _fold(self, kept: Dict[str, Any], chunk: Dict[str, Any]):
+        if 'sources' not in kept:
+            kept['sources'] = [source_reference(kept)]
+        # A chunk reused from an earlier build brings the references folded into it
+        kept['sources'].extend(chunk.get('sources') or [source_reference(chunk)])
+
+    def add(self, chunk: Dict[str, Any]) -> bool:
+        """Register a chunk; True if it is new and should be kept"""
+        text = _normalize(chunk.get('text', ''))
+        digest = hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+        kept = self._exact.get(digest)
+        if kept is not None:
+            self._fold(kept, chunk)
+            self.exact_removed += 1
+            return False
+        self._exact[digest] = chunk
+
+        if not self.near_duplicates:
+            return True
+
+        signature = self.signature(text)
+        numbers = frozenset(_NUMBER_PATTERN.findall(text))
+        band_keys = [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+        candidates = set()
+        for band, key in enumerate(band_keys):
+            candidates.update(self._buckets[band].get(key, ()))
+        for candidate in sorted(candidates):
+            other, other_signature, other_numbers = self._kept[candidate]
+            if other_numbers == numbers and \
+                    np.mean(other_signature == signature) >= self.near_threshold:
+                self._fold(other, chunk)
+                self.near_removed += 1
+                return False
+
+        position = len(self._kept)
+        self._kept.append((chunk, signature, numbers))
+        for band, key in enumerate(band_keys):
+            self._buckets[band].setdefault(key, []).append(position)
+        return True
@@ -0,0 +1,305 @@
+"""
+Embedding Backends
+Pluggable encoders for the vector store, all producing L2-normalized float32
+vectors of all-MiniLM-L6-v2:
+    sentence_transformers - PyTorch SentenceTransformer (default)
+    onnx                  - ONNX Runtime on an int8 dynamically-quantized export;
+                            needs only onnxruntime + tokenizers at serve time (no torch)
+
+The ONNX model directory is produced once by export_onnx_model.py, which also
+checks cosine agreement against the PyTorch backend with compare_backends()
+
+MultiProcessEncoder fans encoding out over worker processes (index builds),
+sending each worker batches of texts with similar token length
+"""
+
+import os
+import logging
+import multiprocessing
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+EMBEDDING_BACKENDS = ('sentence_transformers', 'onnx')
+
+DEFAULT_ONNX_MODEL_DIR = Path(__file__).resolve().parent.parent / "models" / f"{EMBEDDING_MODEL}-onnx"
+ONNX_MODEL_FILE = "model_int8.onnx"
+ONNX_FLOAT_MODEL_FILE = "model.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+
+# all-MiniLM-L6-v2 truncates inputs at 256 word pieces
+MAX_SEQ_LENGTH = 256
+
+
+class EmbeddingBackend(ABC):
+    """Interface shared by the encoders: SentenceTransformer-compatible encode()"""
+
+    name = 'base'
+    model_name = EMBEDDING_MODEL
+
+    @abstractmethod
+    def encode(self, texts: Sequence[str], batch_size: int = 32,
+               show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        """Normalized float32 embeddings, one row per text"""
+
+    @abstractmethod
+    def get_sentence_embedding_dimension(self) -> int:
+        """Length of one embedding"""
+
+    def token_lengths(self, texts: Sequence[str]) -> np.ndarray:
+        """Input length per text, used to batch texts of similar length (characters unless overridden)"""
+        return np.array([len(text) for text in texts], dtype=np.int64)
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """PyTorch SentenceTransformer model"""
+
+    name = 'sentence_transformers'
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL, threads: Optional[int] = None):
+        # Suppress TensorFlow warnings
+        os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+        os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
+
+        import warnings
+        warnings.filterwarnings('ignore')
+
+        from sentence_transformers import SentenceTransformer
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name)
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False, **kwargs):
+        embeddings = self.model.encode(list(texts), batch_size=batch_size,
+                                       show_progress_bar=show_progress_bar, **kwargs)
+        return np.asarray(embeddings, dtype='float32')
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def token_lengths(self, texts):
+        encoded = self.model.tokenizer(list(texts), truncation=True, max_length=self.model.max_seq_length)
+        return np.array([len(ids) for ids in encoded['input_ids']], dtype=np.int64)
+
+
+class OnnxEmbeddingBackend(EmbeddingBackend):
+    """
+    ONNX Runtime encoder: word-piece tokenization with the exported tokenizer.json,
+    transformer forward pass in ORT, then mean pooling + L2 normalization exactly
+    as the SentenceTransformer pipeline of all-MiniLM-L6-v2 does
+    """
+
+    name = 'onnx'
+
+    def __init__(self, model_dir: str = str(DEFAULT_ONNX_MODEL_DIR), threads: Optional[int] = None,
+                 quantized: bool = True):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_file = os.path.join(model_dir, ONNX_MODEL_FILE if quantized else ONNX_FLOAT_MODEL_FILE)
+        if not os.path.exists(model_file):
+            raise FileNotFoundError(f"{model_file} not found. Run: python export_onnx_model.py")
+
+        # Padding is done per batch in _encode_batch, after texts are sorted by length
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.no_padding()
+        self.pad_id = self.tokenizer.token_to_id('[PAD]') or 0
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_file, sess_options=options,
+                                            providers=['CPUExecutionProvider'])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.model_file = model_file
+        self.dimension = int(self.session.get_outputs()[0].shape[-1])
+
+    def _encode_batch(self, encodings) -> np.ndarray:
+        max_length = max(len(e.ids) for e in encodings)
+        input_ids = np.full((len(encodings), max_length), self.pad_id, dtype=np.int64)
+        attention_mask = np.zeros((len(encodings), max_length), dtype=np.int64)
+        token_type_ids = np.zeros((len(encodings), max_length), dtype=np.int64)
+        for row, e in enumerate(encodings):
+            input_ids[row, :len(e.ids)] = e.ids
+            attention_mask[row, :len(e.ids)] = 1
+            token_type_ids[row, :len(e.ids)] = e.type_ids
+        feeds = {'input_ids': input_ids, 'attention_mask': attention_mask}
+        if 'token_type_ids' in self.input_names:
+            feeds['token_type_ids'] = token_type_ids
+
+        token_embeddings = self.session.run(None, feeds)[0]
+
+        # Mean over real (non-padding) tokens, then unit length
+        mask = attention_mask[:, :, None].astype(np.float32)
+        summed = (token_embeddings * mask).sum(axis=1)
+        pooled = summed / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False, **kwargs):
+        """Batches texts longest-first so each batch pads to a similar length; rows keep input order"""
+        texts = list(texts)
+        embeddings = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        if not texts:
+            return embeddings
+        encodings = self.tokenizer.encode_batch(texts)
+        order = np.argsort([-len(e.ids) for e in encodings], kind='stable')
+        for start in range(0, len(texts), batch_size):
+            rows = order[start:start + batch_size]
+            embeddings[rows] = self._encode_batch([encodings[i] for i in rows])
+        return embeddings
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def token_lengths(self, texts):
+        return np.array([len(e.ids) for e in self.tokenizer.encode_batch(list(texts))], dtype=np.int64)
+
+
+def create_embedding_backend(name: str = 'sentence_transformers', **options) -> EmbeddingBackend:
+    """Instantiate a backend by name ('sentence_transformers' or 'onnx')"""
+    if name == 'sentence_transformers':
+        return SentenceTransformerBackend(**options)
+    if name == 'onnx':
+        return OnnxEmbeddingBackend(**options)
+    raise ValueError(f"Unknown embedding backend '{name}' (expected one of {', '.join(EMBEDDING_BACKENDS)})")
+
+
+# Backend of an encode worker process, created once by the pool initializer
+_worker_backend: Optional[EmbeddingBackend] = None
+
+
+def _init_encode_worker(name: str, options: Dict[str, Any]):
+    global _worker_backend
+    _worker_backend = create_embedding_backend(name, **options)
+
+
+def _worker_token_lengths(texts: List[str]) -> np.ndarray:
+    return _worker_backend.token_lengths(texts)
+
+
+def _worker_encode(texts: List[str], batch_size: int) -> np.ndarray:
+    return np.asarray(_worker_backend.encode(texts, batch_size=batch_size), dtype=np.float32)
+
+
+class MultiProcessEncoder:
+    """
+    Encoding spread over worker processes, each holding its own model copy
+    encode() sorts texts by token length, sends every worker whole batches of
+    similar-length texts (minimal padding) and returns rows in input order
+    """
+
+    def __init__(self, backend: str = 'sentence_transformers', workers: Optional[int] = None,
+                 threads_per_worker: Optional[int] = None, **options):
+        self.workers = workers or os.cpu_count() or 1
+        threads = threads_per_worker or max(1, (os.cpu_count() or 1) // self.workers)
+        # Spawned, not forked: the parent may already run torch / OpenMP thread pools, and a
+        # forked copy of those can deadlock; workers build their own backend anyway
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_encode_worker,
+            initargs=(backend, dict(options, threads=threads))
+        )
+        logger.info(f"🔧 Started {self.workers} encode workers ({backend} backend, {threads} threads each)")
+
+    def token_lengths(self, texts: Sequence[str]) -> np.ndarray:
+        texts = list(texts)
+        if not texts:
+            return np.zeros(0, dtype=np.int64)
+        shard = -(-len(texts) // self.workers)
+        parts = self.executor.map(_worker_token_lengths,
+                                  [texts[start:start + shard] for start in range(0, len(texts), shard)])
+        return np.concatenate(list(parts))
+
+    def encode(self, texts: Sequence[str], batch_size: int = 32, **kwargs) -> np.ndarray:
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        order = np.argsort(-self.token_lengths(texts), kind='stable')
+        batches = [order[start:start + batch_size] for start in range(0, len(texts), batch_size)]
+        futures = [self.executor.submit(_worker_encode, [texts[i] for i in rows], batch_size)
+                   for rows in batches]
+
+        embeddings = None
+        for rows, future in zip(batches, futures):
+            vectors = future.result()
+            if embeddings is None:
+                embeddings = np.zeros((len(texts), vectors.shape[1]), dtype=np.float32)
+            embeddings[rows] = vectors
+        return embeddings
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def export_onnx_model(output_dir: str = str(DEFAULT_ONNX_MODEL_DIR), model_name: str = EMBEDDING_MODEL,
+                      opset: int = 14) -> str:
+    """
+    Export the transformer of a SentenceTransformer model to ONNX and quantize
+    its weights to int8 (dynamic quantization); needs torch, transformers and onnx
+    Returns the path of the quantized model
+    """
+    import torch
+    from transformers import AutoTokenizer, AutoModel
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    hub_name = model_name if '/' in model_name else f"sentence-transformers/{model_name}"
+    os.makedirs(output_dir, exist_ok=True)
+
+    tokenizer = AutoTokenizer.from_pretrained(hub_name)
+    model = AutoModel.from_pretrained(hub_name)
+    model.eval()
+    tokenizer.save_pretrained(output_dir)
+
+    sample = tokenizer(["export sample"], return_tensors='pt')
+    input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in sample]
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names}
+    dynamic_axes['last_hidden_state'] = {0: 'batch', 1: 'sequence'}
+
+    float_path = os.path.join(output_dir, ONNX_FLOAT_MODEL_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            model, tuple(sample[name] for name in input_names), float_path,
+            input_names=input_names, output_names=['last_hidden_state'],
+            dynamic_axes=dynamic_axes, opset_version=opset, do_constant_folding=True,
+        )
+    logger.info(f"✅ Exported {hub_name} to {float_path}")
+
+    quantized_path = os.path.join(output_dir, ONNX_MODEL_FILE)
+    quantize_dynamic(float_path, quantized_path, weight_type=QuantType.QInt8)
+    logger.info(f"✅ Quantized (int8) model saved to {quantized_path}")
+    return quantized_path
+
+
+def compare_backends(reference: EmbeddingBackend, candidate: EmbeddingBackend,
+                     texts: Sequence[str], batch_size: int = 32) -> Dict[str, Any]:
+    """Per-text cosine similarity between two backends' embeddings of the same texts"""
+    expected = reference.encode(texts, batch_size=batch_size)
+    actual = candidate.encode(texts, batch_size=batch_size)
+    cosines = (expected * actual).sum(axis=1) / np.clip(
+        np.linalg.norm(expected, axis=1) * np.linalg.norm(actual, axis=1), 1e-12, None)
+    worst = int(np.argmin(cosines)) if len(cosines) else None
+    return {
+        'num_texts': len(cosines),
+        'mean_cosine': float(cosines.mean()) if len(cosines) else 0.0,
+        'min_cosine': float(cosines.min()) if len(cosines) else 0.0,
+        'p01_cosine': float(np.percentile(cosines, 1)) if len(cosines) else 0.0,
+        'worst_text': texts[worst] if worst is not None else None,
+    }
@@ -0,0 +1,331 @@
+"""
+Embedding Caches
+- QueryEmbeddingCache: bounded LRU cache (with optional TTL) for query
+  embeddings, so popular questions skip the SentenceTransformer encode on
+  repeat requests
+- ChunkEmbeddingCache: content-addressed on-disk cache of chunk embeddings
+  (hash of model + chunk text -> vector), so index builds only encode texts
+  they have not seen before
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, Iterable, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def normalize_query(query: str) -> str:
+    """
+    Cache key for a query: lowercased with whitespace collapsed
+    all-MiniLM-L6-v2 uses an uncased tokenizer, so this does not change the embedding
+    """
+    return ' '.join(query.lower().split())
+
+
+class QueryEmbeddingCache:
+    """Thread-safe LRU cache of query embeddings with size-based eviction and optional TTL"""
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (vector, stored_at)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, query: str) -> Optional[np.ndarray]:
+        """Return the cached embedding for a query, or None on a miss"""
+        key = normalize_query(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            vector, stored_at = entry
+            if self.ttl_seconds is not None and time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, query: str, vector: np.ndarray):
+        """Store an embedding, evicting the least recently used entries when full"""
+        if self.max_size <= 0:
+            return
+
+        vector = np.array(vector, dtype='float32')
+        vector.setflags(write=False)
+        key = normalize_query(query)
+        with self._lock:
+            self._entries[key] = (vector, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop all entries (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+CHUNK_CACHE_VERSION = 1
+
+# Digest bytes per cache key (blake2b); 128 bits keeps collisions out of reach
+_KEY_BYTES = 16
+_KEY_DTYPE = f'S{_KEY_BYTES}'
+
+
+@contextmanager
+def _file_lock(lock_path: str):
+    """Exclusive lock on lock_path across processes (held for the with block)"""
+    with open(lock_path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class ChunkEmbeddingCache:
+    """
+    On-disk chunk embedding cache
+    Layout (in one directory):
+        keys.npy    - sorted blake2b digests of (model key, chunk text), memory-mapped
+        vectors.npy - float32 vectors in key order, memory-mapped
+        cache.json  - version, dimension, entry count
+        cache.lock  - taken by commit(), so processes sharing the directory
+                      (the server's live updates, rebuild_index.py) merge in turn
+    Lookups are a binary search over the sorted keys. New vectors are appended
+    to a spill file of this instance (pending-*.bin) until commit() merges them
+    into the entries on disk and garbage-collects those the current chunk set no longer uses
+    """
+
+    KEYS_FILE = "keys.npy"
+    VECTORS_FILE = "vectors.npy"
+    META_FILE = "cache.json"
+    LOCK_FILE = "cache.lock"
+
+    def __init__(self, path: str, model_key: str):
+        self.path = path
+        self.model_key = model_key
+        os.makedirs(path, exist_ok=True)
+
+        self.keys = np.zeros(0, dtype=_KEY_DTYPE)
+        self.vectors = None
+        self.dimension = None
+        self._load()
+
+        # Entries added since the last commit: key -> row in the pending spill file
+        self._pending_rows: Dict[bytes, int] = {}
+        self._pending_file = None
+
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self):
+        """Map the committed entries (as another process may have rewritten them)"""
+        try:
+            with open(os.path.join(self.path, self.META_FILE), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('version') == CHUNK_CACHE_VERSION and meta.get('count'):
+                self.keys = np.load(os.path.join(self.path, self.KEYS_FILE), mmap_mode='r')
+                self.vectors = np.load(os.path.join(self.path, self.VECTORS_FILE), mmap_mode='r')
+                self.dimension = meta['dimension']
+        except (OSError, ValueError, KeyError):
+            pass  # Missing or unreadable cache: start empty
+
+    def __len__(self) -> int:
+        return len(self.keys) + len(self._pending_rows)
+
+    @property
+    def pending_count(self) -> int:
+        """Entries added since the last commit"""
+        return len(self._pending_rows)
+
+    def key(self, text: str) -> bytes:
+        digest = hashlib.blake2b(digest_size=_KEY_BYTES)
+        digest.update(self.model_key.encode('utf-8'))
+        digest.update(b'\x00')
+        digest.update(text.encode('utf-8'))
+        return digest.digest()
+
+    def keys_for(self, texts: Iterable[str]) -> np.ndarray:
+        return np.array([self.key(text) for text in texts], dtype=_KEY_DTYPE)
+
+    def get(self, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Cached vectors for keys: (vectors, found mask)
+        Rows of keys that are not cached are zero
+        """
+        found = np.zeros(len(keys), dtype=bool)
+        vectors = np.zeros((len(keys), self.dimension or 0), dtype=np.float32)
+        if len(self.keys) and len(keys):
+            pos = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+            found = self.keys[pos] == keys
+            if found.any():
+                vectors[found] = self.vectors[pos[found]]
+        for i in np.flatnonzero(~found):
+            row = self._pending_rows.get(bytes(keys[i]))
+            if row is not None:
+                vectors[i] = self._read_pending(row)
+                found[i] = True
+
+        self.hits += int(found.sum())
+        self.misses += int(len(keys) - found.sum())
+        return vectors, found
+
+    def put(self, keys: np.ndarray, vectors: np.ndarray):
+        """Add new entries (held in the spill file until commit)"""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.dimension != vectors.shape[1]:
+            # New model / dimension: nothing cached so far can be reused
+            self.keys, self.vectors = np.zeros(0, dtype=_KEY_DTYPE), None
+            self.dimension = vectors.shape[1]
+        if self._pending_file is None:
+            fd, pending_path = tempfile.mkstemp(prefix='pending-', suffix='.bin', dir=self.path)
+            os.close(fd)
+            self._pending_file = open(pending_path, 'w+b')
+        self._pending_file.seek(0, os.SEEK_END)
+        for key, vector in zip(keys, vectors):
+            key = bytes(key)
+            if key not in self._pending_rows:
+                self._pending_rows[key] = len(self._pending_rows)
+                self._pending_file.write(vector.tobytes())
+
+    def _read_pending(self, row: int) -> np.ndarray:
+        row_bytes = self.dimension * 4
+        self._pending_file.flush()
+        self._pending_file.seek(row * row_bytes)
+        return np.frombuffer(self._pending_file.read(row_bytes), dtype=np.float32)
+
+    def commit(self, keep_keys: Optional[Iterable[bytes]] = None, batch_size: int = 65_536) -> Dict[str, int]:
+        """
+        Merge pending entries into the on-disk matrix; with keep_keys, drop every
+        entry not in it (garbage collection against the current chunk set)
+        Runs under the directory's lock on the entries as committed now (including
+        other processes' commits); files are replaced atomically. Returns entry counts
+        """
+        with _file_lock(os.path.join(self.path, self.LOCK_FILE)):
+            return self._commit(keep_keys, batch_size)
+
+    def _commit(self, keep_keys: Optional[Iterable[bytes]], batch_size: int) -> Dict[str, int]:
+        dimension = self.dimension
+        self.keys, self.vectors = np.zeros(0, dtype=_KEY_DTYPE), None
+        self._load()
+        if self._pending_rows and self.dimension != dimension:
+            # Pending vectors of another model / dimension replace what is on disk
+            self.keys, self.vectors, self.dimension = np.zeros(0, dtype=_KEY_DTYPE), None, dimension
+        old_count = len(self.keys)
+        pending_keys = np.array(list(self._pending_rows), dtype=_KEY_DTYPE)
+        pending = None
+        if self._pending_file is not None:
+            self._pending_file.flush()
+            if len(pending_keys):
+                pending = np.memmap(self._pending_file.name, dtype=np.float32, mode='r',
+                                    shape=(len(pending_keys), self.dimension))
+
+        # Sources of the merged entries: old rows (>= 0) and pending rows (encoded as -1 - row)
+        sources = np.concatenate([np.arange(old_count), -1 - np.arange(len(pending_keys))]).astype(np.int64)
+        keys = np.concatenate([np.asarray(self.keys), pending_keys]) if old_count else pending_keys
+        if keep_keys is not None:
+            keep = np.isin(keys, np.array(list(keep_keys), dtype=_KEY_DTYPE))
+            keys, sources = keys[keep], sources[keep]
+        order = np.argsort(keys, kind='stable')
+        keys, sources = keys[order], sources[order]
+        if len(keys):  # A key another process committed meanwhile is kept once
+            first = np.concatenate(([True], keys[1:] != keys[:-1]))
+            keys, sources = keys[first], sources[first]
+
+        if len(keys) and self.dimension:
+            vectors_tmp = os.path.join(self.path, self.VECTORS_FILE + '.tmp.npy')
+            out = np.lib.format.open_memmap(vectors_tmp, mode='w+', dtype=np.float32,
+                                            shape=(len(keys), self.dimension))
+            for start in range(0, len(keys), batch_size):
+                src = sources[start:start + batch_size]
+                block = np.empty((len(src), self.dimension), dtype=np.float32)
+                from_old = src >= 0
+                if from_old.any():
+                    block[from_old] = self.vectors[src[from_old]]
+                if (~from_old).any():
+                    block[~from_old] = pending[-1 - src[~from_old]]
+                out[start:start + batch_size] = block
+            out.flush()
+            del out
+
+            keys_tmp = os.path.join(self.path, self.KEYS_FILE + '.tmp.npy')
+            np.save(keys_tmp, keys)
+            meta_tmp = os.path.join(self.path, self.META_FILE + '.tmp')
+            with open(meta_tmp, 'w', encoding='utf-8') as f:
+                json.dump({'version': CHUNK_CACHE_VERSION, 'dimension': self.dimension, 'count': len(keys)}, f)
+
+            self.keys = self.vectors = pending = None
+            os.replace(vectors_tmp, os.path.join(self.path, self.VECTORS_FILE))
+            os.replace(keys_tmp, os.path.join(self.path, self.KEYS_FILE))
+            os.replace(meta_tmp, os.path.join(self.path, self.META_FILE))
+            self.keys = np.load(os.path.join(self.path, self.KEYS_FILE), mmap_mode='r')
+            self.vectors = np.load(os.path.join(self.path, self.VECTORS_FILE), mmap_mode='r')
+        else:
+            self.keys, self.vectors = np.zeros(0, dtype=_KEY_DTYPE), None
+            for name in (self.KEYS_FILE, self.VECTORS_FILE, self.META_FILE):
+                if os.path.exists(os.path.join(self.path, name)):
+                    os.remove(os.path.join(self.path, name))
+
+        added = len(pending_keys)
+        self.discard_pending()
+        return {'entries': len(self.keys), 'added': added, 'removed': old_count + added - len(self.keys)}
+
+    def discard_pending(self):
+        """Forget entries added since the last commit"""
+        if self._pending_file is not None:
+            self._pending_file.close()
+            os.remove(self._pending_file.name)
+            self._pending_file = None
+        self._pending_rows = {}
@@ -0,0 +1,138 @@
+"""
+Versioned Index Directories
+Every build (and compaction) writes a complete store into faiss_index/v{n}/ and
+then points faiss_index/CURRENT at it. CURRENT is replaced with a rename, so a
+reader sees either the old or the new version, never a half-written one.
+Older versions stay on disk for rollback until pruned.
+A store written before versioning (files directly in faiss_index/) has no
+CURRENT file and is served as the legacy version (None)
+"""
+
+import os
+import re
+import shutil
+import logging
+import threading
+from typing import List, Optional, Callable, Any
+
+logger = logging.getLogger(__name__)
+
+CURRENT_FILE = "CURRENT"
+
+_VERSION_PATTERN = re.compile(r'^v(\d+)$')
+
+
+def version_number(version: Optional[str]) -> int:
+    """Number of a 'v{n}' version (0 for the legacy layout)"""
+    match = _VERSION_PATTERN.match(version or '')
+    return int(match.group(1)) if match else 0
+
+
+def list_versions(path: str) -> List[str]:
+    """Version directories under path, oldest first"""
+    try:
+        names = os.listdir(path)
+    except OSError:
+        return []
+    versions = [name for name in names if _VERSION_PATTERN.match(name) and os.path.isdir(os.path.join(path, name))]
+    return sorted(versions, key=version_number)
+
+
+def current_version(path: str) -> Optional[str]:
+    """Version CURRENT points at (None: legacy layout or no pointer yet)"""
+    try:
+        with open(os.path.join(path, CURRENT_FILE), 'r', encoding='utf-8') as f:
+            version = f.read().strip()
+    except OSError:
+        return None
+    if not (_VERSION_PATTERN.match(version) and os.path.isdir(os.path.join(path, version))):
+        logger.warning(f"⚠️ {CURRENT_FILE} points at missing version {version!r}, using the legacy layout")
+        return None
+    return version
+
+
+def version_dir(path: str, version: Optional[str]) -> str:
+    """Directory holding a version's files (the root itself for the legacy layout)"""
+    return os.path.join(path, version) if version else path
+
+
+def next_version(path: str) -> str:
+    """Name for a new version directory (never reuses a number still on disk)"""
+    versions = list_versions(path)
+    return f"v{version_number(versions[-1]) + 1 if versions else 1}"
+
+
+def previous_version(path: str, version: Optional[str]) -> Optional[str]:
+    """Newest version on disk older than version (None: none left but the legacy layout)"""
+    older = [v for v in list_versions(path) if version_number(v) < version_number(version)]
+    return older[-1] if older else None
+
+
+def set_current(path: str, version: Optional[str]):
+    """Point CURRENT at version atomically (None: back to the legacy layout)"""
+    pointer = os.path.join(path, CURRENT_FILE)
+    if version is None:
+        if os.path.exists(pointer):
+            os.remove(pointer)
+        return
+    tmp = pointer + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(version + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, pointer)
+
+
+def prune_versions(path: str, keep: int, protect: tuple = ()) -> List[str]:
+    """
+    Delete all but the newest keep versions (protected ones always stay)
+    A version whose files are still open elsewhere (Windows) is left for a later prune
+    """
+    versions = list_versions(path)
+    removed = []
+    for version in versions[:max(0, len(versions) - keep)]:
+        if version in protect:
+            continue
+        try:
+            shutil.rmtree(os.path.join(path, version))
+            removed.append(version)
+        except OSError as e:
+            logger.warning(f"⚠️ Could not remove old index version {version} ({e})")
+    return removed
+
+
+class CurrentPointerWatcher:
+    """Polls CURRENT and reports the new version when another process moves it"""
+
+    def __init__(self, path: str, on_change: Callable[[Optional[str]], Any], interval: float = 5.0):
+        self.path = path
+        self.on_change = on_change
+        self.interval = interval
+        self.version = current_version(path)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def poll(self):
+        version = current_version(self.path)
+        if version != self.version:
+            self.version = version
+            try:
+                self.on_change(version)
+            except Exception as e:
+                logger.error(f"❌ Reloading index version {version} failed: {e}")
+
+    def start(self) -> threading.Thread:
+        def run():
+            while not self._stop.wait(self.interval):
+                self.poll()
+
+        self._thread = threading.Thread(target=run, name="index-version-watcher", daemon=True)
+        self._thread.start()
+        logger.info(f"👀 Watching {os.path.join(self.path, CURRENT_FILE)} for new index versions "
+                    f"(every {self.interval:g}s)")
+        return self._thread
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
@@ -0,0 +1,352 @@
+"""
+Lexical Indexes
+- LexicalFeatures: per-chunk lowercase text, headers and source ids precomputed
+  once at load time, so keyword / header / source boosts need no per-search
+  string building
+- BM25Index: inverted index over chunk texts for exact-term retrieval, fused
+  with FAISS results in VectorStoreManager.search
+Both are copy-on-write for chunks added live (LexicalFeatures.append,
+BM25Index.update return new objects), so searches on the served store keep
+reading structures that match its chunk arrays
+"""
+
+import os
+import re
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import List, Dict, Iterable, Optional, Sequence
+
+import numpy as np
+
+# Separates chunks in the packed strings; keywords never contain it, so matches cannot span chunks
+_SEPARATOR = '\x00'
+
+
+def _chunk_fields(chunks: Sequence, i: int):
+    """(text, header, sub_header, source_file) of chunk i from a ChunkStore or list of dicts"""
+    if hasattr(chunks, 'text') and hasattr(chunks, 'source_file'):
+        return chunks.text(i), chunks.header(i), chunks.sub_header(i), chunks.source_file(i)
+    chunk = chunks[i]
+    return (chunk.get('text', ''), chunk.get('header', ''),
+            chunk.get('sub_header', ''), chunk.get('source_file', ''))
+
+
+class _PackedField:
+    """Lowercased per-chunk strings packed into one string with start/end offsets"""
+
+    def __init__(self, values: List[str]):
+        self.starts: List[int] = []
+        self.ends: List[int] = []
+        self.blob = ''
+        self._add(values)
+
+    def append(self, values: List[str]) -> "_PackedField":
+        """New field with values after the existing strings (self is left unchanged)"""
+        extended = _PackedField([])
+        extended.starts = list(self.starts)
+        extended.ends = list(self.ends)
+        extended.blob = self.blob
+        extended._add(values)
+        return extended
+
+    def _add(self, values: List[str]):
+        if not values:
+            return
+        existing = len(self.starts)
+        pos = len(self.blob) + len(_SEPARATOR) if existing else 0
+        for value in values:
+            self.starts.append(pos)
+            self.ends.append(pos + len(value))
+            pos += len(value) + len(_SEPARATOR)
+        joined = _SEPARATOR.join(values)
+        self.blob = self.blob + _SEPARATOR + joined if existing else joined
+
+    def chunks_containing(self, keyword: str) -> np.ndarray:
+        """Sorted ids of chunks whose string contains keyword (one find per matching chunk)"""
+        if not keyword:
+            return np.arange(len(self.starts), dtype=np.int32)
+        ids = []
+        find = self.blob.find
+        pos = find(keyword)
+        while pos != -1:
+            chunk_id = bisect_right(self.starts, pos) - 1
+            ids.append(chunk_id)
+            pos = find(keyword, self.ends[chunk_id])
+        return np.array(ids, dtype=np.int32)
+
+
+class LexicalFeatures:
+    """
+    Lowercased chunk text and headers packed into one string each, with offsets
+    Keyword lookups scan the packed string once per keyword and cache the
+    matching chunk ids, so re-ranking reduces to array membership tests
+    """
+
+    def __init__(self, chunks: Sequence, keyword_cache_size: int = 4096):
+        self.source_names: List[str] = []  # Lowercased, one entry per distinct source
+        self._source_index: Dict[str, int] = {}
+        self.text = _PackedField([])
+        self.headers = _PackedField([])
+        self.source_ids = np.zeros(0, dtype=np.int32)
+
+        # (field name, keyword) -> sorted matching chunk ids
+        self.keyword_cache_size = keyword_cache_size
+        self._keyword_cache: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._add(chunks)
+
+    def append(self, chunks: Sequence) -> "LexicalFeatures":
+        """
+        New features with chunks after the existing ones (their ids continue from
+        len(self)); self is left unchanged, with its keyword cache still valid
+        """
+        extended = LexicalFeatures([], self.keyword_cache_size)
+        extended.source_names = list(self.source_names)
+        extended._source_index = dict(self._source_index)
+        extended.text = self.text
+        extended.headers = self.headers
+        extended.source_ids = self.source_ids
+        extended._add(chunks)
+        return extended
+
+    def _add(self, chunks: Sequence):
+        texts: List[str] = []
+        headers: List[str] = []
+        ids: List[int] = []
+
+        for i in range(len(chunks)):
+            text, header, sub_header, source_file = _chunk_fields(chunks, i)
+            texts.append(text.lower())
+            # Keywords never contain whitespace, so the newline cannot create false matches
+            headers.append(f"{header.lower()}\n{sub_header.lower()}")
+
+            source = source_file.lower()
+            if source not in self._source_index:
+                self._source_index[source] = len(self.source_names)
+                self.source_names.append(source)
+            ids.append(self._source_index[source])
+
+        if not ids:
+            return
+        self.text = self.text.append(texts)
+        self.headers = self.headers.append(headers)
+        self.source_ids = np.concatenate((self.source_ids, np.array(ids, dtype=np.int32)))
+
+    def __len__(self) -> int:
+        return len(self.source_ids)
+
+    def _matching_chunks(self, field_name: str, keyword: str) -> np.ndarray:
+        key = (field_name, keyword)
+        with self._lock:
+            hits = self._keyword_cache.get(key)
+            if hits is not None:
+                self._keyword_cache.move_to_end(key)
+                return hits
+
+        hits = getattr(self, field_name).chunks_containing(keyword)
+
+        with self._lock:
+            self._keyword_cache[key] = hits
+            while len(self._keyword_cache) > self.keyword_cache_size:
+                self._keyword_cache.popitem(last=False)
+        return hits
+
+    def _match_counts(self, field_name: str, keywords: Iterable[str], ids: np.ndarray) -> np.ndarray:
+        counts = np.zeros(len(ids), dtype=np.int32)
+        for keyword in keywords:
+            hits = self._matching_chunks(field_name, keyword)
+            if len(hits):
+                pos = np.minimum(np.searchsorted(hits, ids), len(hits) - 1)
+                counts += hits[pos] == ids
+        return counts
+
+    def keyword_counts(self, keywords: Iterable[str], ids: np.ndarray) -> np.ndarray:
+        """Per candidate: number of keywords that occur in the chunk text"""
+        return self._match_counts('text', keywords, ids)
+
+    def header_counts(self, keywords: Iterable[str], ids: np.ndarray) -> np.ndarray:
+        """Per candidate: number of keywords that occur in the chunk header or sub-header"""
+        return self._match_counts('headers', keywords, ids)
+
+    def keyword_chunks(self, keyword: str) -> np.ndarray:
+        """Ids of the chunks whose text contains keyword (lowercased)"""
+        return self._matching_chunks('text', keyword)
+
+    def header_chunks(self, text: str) -> np.ndarray:
+        """Ids of the chunks whose header or sub-header contains text (case-insensitive)"""
+        return self._matching_chunks('headers', text.lower())
+
+    def source_chunks(self, source_file: str) -> np.ndarray:
+        """Ids of the chunks whose source_file is source_file (case-insensitive)"""
+        source_id = self._source_index.get(source_file.lower())
+        if source_id is None:
+            return np.zeros(0, dtype=np.int64)
+        return np.flatnonzero(self.source_ids == source_id)
+
+    def matching_sources(self, source_hints: Iterable[str]) -> np.ndarray:
+        """Boolean mask over distinct sources whose name contains any hint"""
+        hints = list(source_hints)
+        return np.array(
+            [any(hint in name for hint in hints) for name in self.source_names],
+            dtype=bool
+        )
+
+
+_TOKEN_PATTERN = re.compile(r'\w+')
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens for the BM25 index"""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Okapi BM25 inverted index over chunk texts
+    Postings are stored CSR-style: term t owns doc_ids/term_freqs[offsets[t]:offsets[t + 1]]
+    live marks documents not removed by update(); removed ids have no postings
+    """
+
+    def __init__(self, terms: List[str], offsets: np.ndarray, doc_ids: np.ndarray,
+                 term_freqs: np.ndarray, doc_lengths: np.ndarray, k1: float = 1.5, b: float = 0.75,
+                 live: Optional[np.ndarray] = None):
+        self.terms = terms
+        self.vocab = {term: i for i, term in enumerate(terms)}
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.term_freqs = term_freqs
+        self.doc_lengths = doc_lengths
+        self.live = np.ones(len(doc_lengths), dtype=bool) if live is None else live
+        self.k1 = k1
+        self.b = b
+
+        num_docs = int(self.live.sum())
+        self.avg_doc_length = float(doc_lengths[self.live].mean()) if num_docs else 0.0
+        doc_freqs = np.diff(offsets).astype(np.float64)
+        self.idf = np.log(1.0 + (num_docs - doc_freqs + 0.5) / (doc_freqs + 0.5)).astype(np.float32)
+
+    @staticmethod
+    def _postings(texts: Iterable[str], first_doc_id: int = 0):
+        """term -> [(doc id, term frequency)] and document lengths of texts"""
+        postings: Dict[str, List[tuple]] = {}
+        doc_lengths = []
+        for doc_id, text in enumerate(texts, first_doc_id):
+            tokens = tokenize(text)
+            doc_lengths.append(len(tokens))
+            counts: Dict[str, int] = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                postings.setdefault(token, []).append((doc_id, count))
+        return postings, doc_lengths
+
+    @classmethod
+    def build(cls, texts: Iterable[str], **kwargs) -> "BM25Index":
+        """Index texts; document ids are positions in the iterable"""
+        postings, doc_lengths = cls._postings(texts)
+
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        for i, term in enumerate(terms):
+            offsets[i + 1] = offsets[i] + len(postings[term])
+        doc_ids = np.empty(offsets[-1], dtype=np.int32)
+        term_freqs = np.empty(offsets[-1], dtype=np.float32)
+        for i, term in enumerate(terms):
+            entries = postings[term]
+            doc_ids[offsets[i]:offsets[i + 1]] = [doc_id for doc_id, _ in entries]
+            term_freqs[offsets[i]:offsets[i + 1]] = [count for _, count in entries]
+
+        return cls(terms, offsets, doc_ids, term_freqs, np.array(doc_lengths, dtype=np.float32), **kwargs)
+
+    def update(self, add_texts: Sequence[str] = (), remove_docs: Iterable[int] = ()) -> "BM25Index":
+        """
+        New index with add_texts appended (ids continue from len(self)) and the
+        remove_docs postings dropped; the merge is vectorized over the CSR arrays
+        """
+        removed = np.zeros(len(self.doc_lengths), dtype=bool)
+        removed[np.fromiter(remove_docs, dtype=np.int64)] = True
+
+        postings, new_lengths = self._postings(add_texts, len(self.doc_lengths))
+        terms = list(self.terms)
+        vocab = dict(self.vocab)
+        new_terms, new_docs, new_freqs = [], [], []
+        for term, entries in postings.items():
+            term_id = vocab.get(term)
+            if term_id is None:
+                term_id = vocab[term] = len(terms)
+                terms.append(term)
+            new_terms.extend([term_id] * len(entries))
+            new_docs.extend(doc_id for doc_id, _ in entries)
+            new_freqs.extend(count for _, count in entries)
+
+        old_terms = np.repeat(np.arange(len(self.terms), dtype=np.int64), np.diff(self.offsets))
+        keep = ~removed[self.doc_ids]
+        all_terms = np.concatenate((old_terms[keep], np.array(new_terms, dtype=np.int64)))
+        doc_ids = np.concatenate((self.doc_ids[keep], np.array(new_docs, dtype=np.int32)))
+        term_freqs = np.concatenate((self.term_freqs[keep], np.array(new_freqs, dtype=np.float32)))
+        order = np.lexsort((doc_ids, all_terms))
+
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(all_terms, minlength=len(terms)))
+        doc_lengths = np.concatenate((self.doc_lengths, np.array(new_lengths, dtype=np.float32)))
+        live = np.concatenate((self.live & ~removed, np.ones(len(new_lengths), dtype=bool)))
+        return BM25Index(terms, offsets, doc_ids[order], term_freqs[order], doc_lengths,
+                         k1=self.k1, b=self.b, live=live)
+
+    def save(self, filepath: str):
+        """Persist as a .npz of plain arrays (loaded without pickle)"""
+        tmp_path = filepath + '.tmp.npz'
+        np.savez(
+            tmp_path,
+            terms=np.array('\n'.join(self.terms)),
+            offsets=self.offsets,
+            doc_ids=self.doc_ids,
+            term_freqs=self.term_freqs,
+            doc_lengths=self.doc_lengths,
+            live=self.live,
+            params=np.array([self.k1, self.b], dtype=np.float64),
+        )
+        os.replace(tmp_path, filepath)
+
+    @classmethod
+    def load(cls, filepath: str) -> "BM25Index":
+        with np.load(filepath, allow_pickle=False) as data:
+            joined = str(data['terms'])
+            k1, b = data['params']
+            return cls(
+                joined.split('\n') if joined else [],
+                data['offsets'], data['doc_ids'], data['term_freqs'], data['doc_lengths'],
+                k1=float(k1), b=float(b), live=data['live'] if 'live' in data.files else None
+            )
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def scores(self, query_terms: Iterable[str]) -> np.ndarray:
+        """BM25 score of every document for the query terms"""
+        scores = np.zeros(len(self.doc_lengths), dtype=np.float32)
+        length_norm = None
+        for term in set(query_terms):
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                continue
+            if length_norm is None:
+                length_norm = self.k1 * (1.0 - self.b + self.b * self.doc_lengths / max(self.avg_doc_length, 1e-9))
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            docs = self.doc_ids[start:end]
+            tf = self.term_freqs[start:end]
+            scores[docs] += self.idf[term_id] * tf * (self.k1 + 1.0) / (tf + length_norm[docs])
+        return scores
+
+    def search(self, query_terms: Iterable[str], k: int):
+        """Top-k (doc ids, scores) by BM25, best first; documents without any term are skipped"""
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        scores = self.scores(query_terms)
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        order = np.lexsort((matched, -scores[matched]))
+        return matched[order], scores[matched[order]]
@@ -0,0 +1,283 @@
+"""
+Live Index Updates
+Pieces that let VectorStoreManager add and remove chunks without a rebuild:
+- GrowingChunks / GrowingMatrix: the loaded (memory-mapped) chunks and float
+  vectors with rows appended after them, so new chunks get the next positions
+  and nothing already mapped is copied
+- MutationLog: append-only log of additions and removals next to the index;
+  replayed on load and emptied when the store is compacted
+- DataDirWatcher: polls the data directory and reports changed / deleted files
+- ProcessRoleLock: lets one process of a multi-worker server take the watcher
+  role, since the mutation log has a single writer
+"""
+
+import os
+import json
+import logging
+import threading
+from typing import List, Dict, Any, Callable, Iterator, Optional, Sequence
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+LOG_FILE = "mutations.log"
+LOG_VECTORS_FILE = "mutations.vec"
+WATCHER_LOCK_FILE = "watcher.lock"
+
+
+class GrowingChunks(Sequence):
+    """Read-only chunk sequence (list or ChunkStore) followed by appended chunk dicts"""
+
+    def __init__(self, base: Sequence, added: Optional[List[Dict[str, Any]]] = None):
+        self.base = base
+        self.added = added or []
+
+    def append(self, chunks: List[Dict[str, Any]]) -> "GrowingChunks":
+        """New sequence with chunks after the existing ones (self is left unchanged)"""
+        return GrowingChunks(self.base, self.added + list(chunks))
+
+    def __len__(self) -> int:
+        return len(self.base) + len(self.added)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if i < len(self.base):
+            return self.base[i]
+        return self.added[i - len(self.base)]
+
+    def close(self):
+        if hasattr(self.base, 'close'):
+            self.base.close()
+
+
+class GrowingMatrix:
+    """Float matrix (typically a memory-mapped embeddings.npy) with rows appended after it"""
+
+    def __init__(self, base: np.ndarray, added: Optional[np.ndarray] = None):
+        self.base = base
+        self.added = added if added is not None else np.zeros((0, base.shape[1]), dtype='float32')
+        self.shape = (len(base) + len(self.added), base.shape[1])
+        self.dtype = np.dtype('float32')
+
+    def append(self, rows: np.ndarray) -> "GrowingMatrix":
+        """New matrix with rows after the existing ones (self is left unchanged)"""
+        rows = np.asarray(rows, dtype='float32').reshape(-1, self.shape[1])
+        return GrowingMatrix(self.base, np.concatenate((self.added, rows)))
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __getitem__(self, rows):
+        if isinstance(rows, (int, np.integer)):
+            rows = int(rows) + (len(self) if rows < 0 else 0)
+            return self.base[rows] if rows < len(self.base) else self.added[rows - len(self.base)]
+        if isinstance(rows, slice):
+            rows = np.arange(*rows.indices(len(self)))
+        rows = np.asarray(rows, dtype=np.int64)
+        out = np.empty((len(rows), self.shape[1]), dtype='float32')
+        in_base = rows < len(self.base)
+        out[in_base] = self.base[rows[in_base]]
+        out[~in_base] = self.added[rows[~in_base] - len(self.base)]
+        return out
+
+    def __array__(self, dtype=None, copy=None):
+        matrix = np.concatenate((np.asarray(self.base, dtype='float32'), self.added))
+        return matrix if dtype is None else matrix.astype(dtype)
+
+
+class MutationLog:
+    """
+    Append-only record of live chunk additions and removals
+    Each line of mutations.log is one JSON record with a sequence number; the
+    vectors of additions are appended to mutations.vec (raw float32) and the
+    record holds their offset (in floats). The manifest stores the last sequence number
+    already folded into the saved store, so replay skips older records
+    Single writer: seq and the lock only live in this process, so one process at a time
+    may update a store (see ProcessRoleLock)
+    """
+
+    def __init__(self, path: str):
+        self.log_file = os.path.join(path, LOG_FILE)
+        self.vectors_file = os.path.join(path, LOG_VECTORS_FILE)
+        self.seq = 0
+        self.records = 0  # Records written since the last compaction
+        self._lock = threading.Lock()
+
+    def _vector_floats(self) -> int:
+        return os.path.getsize(self.vectors_file) // 4 if os.path.exists(self.vectors_file) else 0
+
+    def append(self, record: Dict[str, Any], vectors: Optional[np.ndarray] = None) -> int:
+        """Write one record (and its vectors) durably; returns its sequence number"""
+        with self._lock:
+            if vectors is not None and len(vectors):
+                vectors = np.ascontiguousarray(vectors, dtype='float32')
+                record = dict(record, vector_offset=self._vector_floats(), dimension=vectors.shape[1])
+                with open(self.vectors_file, 'ab') as f:
+                    f.write(vectors.tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+            self.seq += 1
+            record = dict(record, seq=self.seq)
+            with open(self.log_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self.records += 1
+            return self.seq
+
+    def replay(self, after_seq: int) -> Iterator[tuple]:
+        """
+        Yield (record, vectors or None) for records newer than after_seq, in order
+        A torn last line (crash while writing) ends the replay
+        """
+        self.seq = after_seq
+        self.records = 0
+        if not os.path.exists(self.log_file):
+            return
+        vectors = None
+        if os.path.exists(self.vectors_file) and os.path.getsize(self.vectors_file):
+            vectors = np.memmap(self.vectors_file, dtype='float32', mode='r')
+        with open(self.log_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logger.warning("⚠️ Ignoring incomplete last record of the mutation log")
+                    break
+                self.seq = max(self.seq, record['seq'])
+                if record['seq'] <= after_seq:
+                    continue
+                self.records += 1
+                rows = None
+                if 'vector_offset' in record:
+                    start, dimension = record['vector_offset'], record['dimension']
+                    rows = np.array(vectors[start:start + len(record['ids']) * dimension]).reshape(-1, dimension)
+                yield record, rows
+
+    def clear(self):
+        """Drop all records (after they were folded into a saved store); seq keeps counting"""
+        with self._lock:
+            for filepath in (self.log_file, self.vectors_file):
+                if os.path.exists(filepath):
+                    os.remove(filepath)
+            self.records = 0
+
+
+class DataDirWatcher:
+    """
+    Polls a directory for .md / .json files that changed, appeared or disappeared
+    A change is reported once the file's (mtime, size) has stayed the same for one
+    poll, so half-written files are not indexed
+    """
+
+    def __init__(self, directory: str, on_change: Callable[[str], Any], on_delete: Callable[[str], Any],
+                 interval: float = 2.0, extensions: tuple = ('.md', '.json')):
+        self.directory = directory
+        self.on_change = on_change
+        self.on_delete = on_delete
+        self.interval = interval
+        self.extensions = extensions
+        self._seen = self._scan()  # Signatures already handled
+        self._pending: Dict[str, tuple] = {}  # Changed files waiting to settle
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _scan(self) -> Dict[str, tuple]:
+        signatures = {}
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return signatures
+        for name in names:
+            if name.endswith(self.extensions):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue
+                signatures[name] = (stat.st_mtime_ns, stat.st_size)
+        return signatures
+
+    def poll(self):
+        """One scan: report settled changes and deletions"""
+        current = self._scan()
+        for name in sorted(set(self._seen) - set(current)):
+            del self._seen[name]
+            self._pending.pop(name, None)
+            self._notify(self.on_delete, name)
+        for name, signature in sorted(current.items()):
+            if self._seen.get(name) == signature:
+                self._pending.pop(name, None)
+            elif self._pending.get(name) == signature:
+                del self._pending[name]
+                self._seen[name] = signature
+                self._notify(self.on_change, name)
+            else:
+                self._pending[name] = signature
+
+    def _notify(self, callback: Callable[[str], Any], name: str):
+        try:
+            callback(os.path.join(self.directory, name))
+        except Exception as e:
+            logger.error(f"❌ Live update for {name} failed: {e}")
+
+    def start(self) -> threading.Thread:
+        def run():
+            while not self._stop.wait(self.interval):
+                self.poll()
+
+        self._thread = threading.Thread(target=run, name="data-dir-watcher", daemon=True)
+        self._thread.start()
+        logger.info(f"👀 Watching {self.directory} for changes (every {self.interval:g}s)")
+        return self._thread
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+class ProcessRoleLock:
+    """
+    Exclusive lock file held from acquire() until release() (or process exit); acquire()
+    does not wait, so of several processes starting together exactly one gets the role
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def acquire(self) -> bool:
+        """True when this process now holds the lock"""
+        f = open(self.path, 'a+b')
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            f.close()
+            return False
+        self._file = f
+        return True
+
+    def release(self):
+        if self._file is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        else:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        self._file.close()
+        self._file = None
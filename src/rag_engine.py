@@ -7,6 +7,7 @@ Supports: English, Hindi, Telugu, Tamil, Kannada, Malayalam
 
 import re
 import logging
+import threading
 from pathlib import Path
 from typing import Optional, List, Dict
 import sys
@@ -248,13 +249,14 @@ class RAGResponseGenerator:
             return self._get_no_info_response(query, language)
         
         # Step 2: Filter by relevance threshold
+        # (results come in fused rank order, not sorted by similarity_score)
         relevant_chunks = [
             c for c in context_chunks
             if c.get('similarity_score', 0) >= RELEVANCE_THRESHOLD
         ]
         
         if not relevant_chunks:
-            best_score = context_chunks[0].get('similarity_score', 0)
+            best_score = max(c.get('similarity_score', 0) for c in context_chunks)
             logger.warning(
                 f"⚠️ No chunks above threshold {RELEVANCE_THRESHOLD}. "
                 f"Best score: {best_score:.3f} for query: '{query}'"
@@ -263,7 +265,7 @@ class RAGResponseGenerator:
         
         logger.info(
             f"📚 {len(relevant_chunks)}/{len(context_chunks)} chunks above threshold "
-            f"(best: {relevant_chunks[0].get('similarity_score', 0):.3f})"
+            f"(best: {max(c.get('similarity_score', 0) for c in relevant_chunks):.3f})"
         )
         
         # Step 3: Format context
@@ -556,6 +558,9 @@ class RAGResponseGenerator:
         context_parts = []
         for idx, chunk in enumerate(chunks, 1):
             source = chunk.get('source_file', 'unknown')
+            if chunk.get('sources'):
+                # Deduplicated chunk: the same text appears in several files
+                source = ', '.join(dict.fromkeys(ref.get('source_file', source) for ref in chunk['sources']))
             text = chunk.get('text', '')
             score = chunk.get('similarity_score', 0)
             context_parts.append(f"[Source {idx}: {source} (relevance: {score:.2f})]\n{text}\n")
@@ -1106,6 +1111,9 @@ class RAGResponseGenerator:
         return {
             "vector_store_loaded": self.vector_store.index is not None,
             "total_chunks": len(self.vector_store.chunks) if self.vector_store.chunks else 0,
+            "index_version": self.vector_store.index_version,
+            "query_cache": self.vector_store.cache_stats(),
+            "candidate_pool": self.vector_store.pool_stats(),
             "llm_available": self.llm_available,
             "llm_model": self.llm.get_model_info() if self.llm else None,
         }
@@ -1113,6 +1121,7 @@ class RAGResponseGenerator:
 
 # Global instance
 _rag_generator = None
+_rag_generator_lock = threading.Lock()  # Concurrent first requests create it once
 
 def get_rag_generator(
     model_path: Optional[str] = None,
@@ -1123,11 +1132,13 @@ def get_rag_generator(
     global _rag_generator
     
     if _rag_generator is None:
-        _rag_generator = RAGResponseGenerator(
-            model_path=model_path,
-            use_llm=use_llm,
-            **kwargs
-        )
+        with _rag_generator_lock:
+            if _rag_generator is None:
+                _rag_generator = RAGResponseGenerator(
+                    model_path=model_path,
+                    use_llm=use_llm,
+                    **kwargs
+                )
     
     return _rag_generator
 
@@ -0,0 +1,199 @@
+"""
+Per-Source Index Shards
+ShardedIndex keeps one FAISS index per source file (hostels, fees, transport, ...),
+each an IndexIDMap2 over the store's chunk ids, and answers search() like a single
+index: the shards are searched in parallel threads (FAISS releases the GIL) and
+their sorted results are merged into the global top k. search() can be limited
+to some shards, which is how confident source hints and source filters skip the
+rest of the corpus, and to the ids an IDSelector accepts; a live edit of one file only rebuilds that file's shard on compaction
+
+A sharded store is saved in faiss_index.bin as an .npz archive of serialized
+shards; read_index() / write_index() handle both layouts
+"""
+
+import os
+import zipfile
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Iterable, Tuple
+
+import numpy as np
+
+try:
+    from src.ann_index import build_index, selector_parameters
+except ImportError:
+    from ann_index import build_index, selector_parameters
+
+logger = logging.getLogger(__name__)
+
+# Shards smaller than this are exact flat indexes whatever the configured type:
+# too few vectors to train IVF / PQ, and scanning them takes microseconds
+MIN_ANN_SHARD = 1024
+
+# Distance FAISS reports for empty result slots
+_MISSING_DISTANCE = np.finfo(np.float32).max
+
+_pool_lock = threading.Lock()
+_pool: Optional[ThreadPoolExecutor] = None
+
+
+def _import_faiss():
+    try:
+        import faiss
+    except Exception:
+        import faiss_cpu as faiss
+    return faiss
+
+
+def _search_pool() -> ThreadPoolExecutor:
+    """Threads shared by all sharded searches (one per core)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="shard-search")
+        return _pool
+
+
+def merge_results(results: List[Tuple[np.ndarray, np.ndarray]], k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Merge per-shard (distances, ids) results, each sorted per query, into the k
+    nearest per query; missing slots get id -1 and the largest float distance
+    """
+    distances = np.concatenate([d for d, _ in results], axis=1)
+    ids = np.concatenate([i for _, i in results], axis=1)
+    distances = np.where(ids >= 0, distances, _MISSING_DISTANCE)
+    if distances.shape[1] < k:
+        padding = ((0, 0), (0, k - distances.shape[1]))
+        distances = np.pad(distances, padding, constant_values=_MISSING_DISTANCE)
+        ids = np.pad(ids, padding, constant_values=-1)
+    order = np.argsort(distances, axis=1, kind='stable')[:, :k]
+    return np.take_along_axis(distances, order, axis=1), np.take_along_axis(ids, order, axis=1)
+
+
+def build_shard(vectors: np.ndarray, ids: np.ndarray, index_type: str = 'auto',
+                params: Optional[Dict[str, Any]] = None, quantization: Optional[str] = None):
+    """
+    Index one source's vectors under their chunk ids ('auto' picks the type from the
+    shard size; small shards are always flat). Returns (index, description)
+    """
+    shard_type = 'flat' if len(vectors) < MIN_ANN_SHARD else index_type
+    if shard_type == 'flat' and index_type == 'ivf_pq':
+        quantization = None
+    index, description = build_index(vectors, shard_type, params, quantization, ids=ids)
+    return index, dict(description, vectors=len(vectors))
+
+
+def build_sharded_index(vectors: np.ndarray, groups: Dict[str, np.ndarray], ids: np.ndarray,
+                        index_type: str = 'auto', params: Optional[Dict[str, Any]] = None,
+                        quantization: Optional[str] = None):
+    """
+    One shard per group (shard name -> row positions in vectors); rows keep ids[positions]
+    The description is the largest shard's, plus per-shard types / sizes and the
+    configured type and params (needed to rebuild single shards later)
+    Returns (ShardedIndex, description)
+    """
+    shards, descriptions = {}, {}
+    for name, positions in groups.items():
+        positions = np.asarray(positions, dtype=np.int64)
+        shards[name], descriptions[name] = build_shard(vectors[positions], ids[positions],
+                                                       index_type, params, quantization)
+    largest = max(descriptions.values(), key=lambda description: description['vectors'])
+    description = {
+        'type': largest['type'],
+        'dimension': vectors.shape[1],
+        'params': largest['params'],
+        'quantization': largest['quantization'],
+        'shard_index_type': index_type,
+        'shard_params': params,
+        'shards': {name: {'type': d['type'], 'vectors': d['vectors']} for name, d in descriptions.items()},
+    }
+    return ShardedIndex(shards, vectors.shape[1]), description
+
+
+class ShardedIndex:
+    """
+    Named FAISS indexes over disjoint chunk ids, used like one index
+    (search, remove_ids, d, ntotal); shards are never modified once searched,
+    compaction builds a new ShardedIndex with the changed shards replaced
+    """
+
+    def __init__(self, shards: Dict[str, Any], dimension: int):
+        self.shards = dict(shards)
+        self.d = dimension
+
+    @property
+    def ntotal(self) -> int:
+        return sum(shard.ntotal for shard in self.shards.values())
+
+    def shard_sizes(self) -> Dict[str, int]:
+        return {name: shard.ntotal for name, shard in self.shards.items()}
+
+    def search(self, queries: np.ndarray, k: int, names: Optional[Iterable[str]] = None,
+               selector=None, selectivity: float = 1.0):
+        """
+        k nearest (distances, ids) per query over all shards, or only the named ones,
+        optionally among the ids a FAISS IDSelector accepts (selectivity: the accepted
+        fraction of the searched vectors). Shards are searched in parallel and k-way merged
+        """
+        queries = np.ascontiguousarray(queries, dtype='float32')
+        names = self.shards if names is None else names
+        shards = [self.shards[name] for name in names if name in self.shards and self.shards[name].ntotal]
+        if not shards:
+            return (np.full((len(queries), k), _MISSING_DISTANCE, dtype=np.float32),
+                    np.full((len(queries), k), -1, dtype=np.int64))
+
+        def search_shard(shard):
+            if selector is None:
+                return shard.search(queries, min(k, shard.ntotal))
+            params = selector_parameters(shard, selector, selectivity)
+            return shard.search(queries, min(k, shard.ntotal), params=params)
+
+        if len(shards) == 1 or (os.cpu_count() or 1) == 1:
+            results = [search_shard(shard) for shard in shards]
+        else:
+            results = list(_search_pool().map(search_shard, shards))
+        return merge_results(results, k)
+
+    def remove_ids(self, ids: np.ndarray) -> int:
+        ids = np.asarray(ids, dtype=np.int64)
+        return sum(shard.remove_ids(ids) for shard in self.shards.values() if shard.ntotal)
+
+    def replace_shards(self, shards: Dict[str, Any]) -> "ShardedIndex":
+        """New index with some shards replaced (None: dropped); self is left unchanged"""
+        merged = dict(self.shards)
+        for name, shard in shards.items():
+            if shard is None:
+                merged.pop(name, None)
+            else:
+                merged[name] = shard
+        return ShardedIndex(merged, self.d)
+
+    def write(self, path: str):
+        faiss = _import_faiss()
+        names = list(self.shards)
+        arrays = {f"shard_{i}": faiss.serialize_index(self.shards[name]) for i, name in enumerate(names)}
+        with open(path, 'wb') as f:
+            np.savez(f, names=np.array(names, dtype=str), dimension=np.array(self.d), **arrays)
+
+    @classmethod
+    def read(cls, path: str) -> "ShardedIndex":
+        faiss = _import_faiss()
+        with np.load(path, allow_pickle=False) as archive:
+            names = [str(name) for name in archive['names']]
+            shards = {name: faiss.deserialize_index(archive[f"shard_{i}"]) for i, name in enumerate(names)}
+            return cls(shards, int(archive['dimension']))
+
+
+def read_index(path: str):
+    """Load faiss_index.bin: a ShardedIndex archive or a plain FAISS index"""
+    if zipfile.is_zipfile(path):
+        return ShardedIndex.read(path)
+    return _import_faiss().read_index(path)
+
+
+def write_index(index, path: str):
+    if isinstance(index, ShardedIndex):
+        index.write(path)
+    else:
+        _import_faiss().write_index(index, path)
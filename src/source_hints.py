@@ -0,0 +1,104 @@
+"""
+Source Hint Matcher
+Maps a query to the source files it most likely concerns (hostels, fees, ...)
+using Aho-Corasick automatons compiled once from source_hints.json
+
+Config format:
+    keyword_hints  - {stem: [sources]}; a stem matches when it occurs inside any query keyword
+    query_triggers - {source: [words]}; a source is added when a word occurs anywhere in the query
+"""
+
+import json
+import logging
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Iterable, FrozenSet
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOURCE_HINTS_FILE = Path(__file__).resolve().parent.parent / "source_hints.json"
+
+
+class AhoCorasick:
+    """Multi-pattern substring matcher: one pass over the text finds every pattern it contains"""
+
+    def __init__(self, patterns: Dict[str, Iterable[str]]):
+        # Trie over patterns; each node collects the labels of patterns ending there
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[FrozenSet[str]] = [frozenset()]
+
+        for pattern, labels in patterns.items():
+            if not pattern:
+                continue
+            node = 0
+            for ch in pattern:
+                next_node = self._goto[node].get(ch)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][ch] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(frozenset())
+                node = next_node
+            self._out[node] = self._out[node] | frozenset(labels)
+
+        # Failure links (breadth-first), inheriting outputs of the failure target
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                self._out[child] = self._out[child] | self._out[self._fail[child]]
+                queue.append(child)
+
+    def match(self, text: str) -> FrozenSet[str]:
+        """Labels of all patterns occurring in text"""
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set()
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                found.update(out[node])
+        return frozenset(found)
+
+
+class SourceHintMatcher:
+    """Compiled keyword-stem and query-trigger matchers for source boosting"""
+
+    def __init__(self, keyword_hints: Dict[str, List[str]], query_triggers: Dict[str, List[str]] = None):
+        self.keyword_hints = keyword_hints
+        self.query_triggers = query_triggers or {}
+
+        self._keyword_matcher = AhoCorasick(keyword_hints)
+        self._trigger_matcher = AhoCorasick({
+            word: [source]
+            for source, words in self.query_triggers.items()
+            for word in words
+        })
+
+    @classmethod
+    def from_file(cls, path=DEFAULT_SOURCE_HINTS_FILE) -> "SourceHintMatcher":
+        """Load hints from a JSON config (no hints if the file is missing or invalid)"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+            matcher = cls(config.get('keyword_hints', {}), config.get('query_triggers', {}))
+            logger.info(f"✅ Loaded {len(matcher.keyword_hints)} source hints from {path}")
+            return matcher
+        except Exception as e:
+            logger.error(f"❌ Failed to load source hints from {path}: {e}")
+            return cls({})
+
+    def match(self, query_lower: str, keywords: Iterable[str]) -> List[str]:
+        """Sources hinted by the query keywords (stem inside a keyword) or by query triggers"""
+        # Keywords never contain spaces, so joining them keeps matches within one keyword
+        sources = self._keyword_matcher.match(' '.join(keywords))
+        sources |= self._trigger_matcher.match(query_lower)
+        return sorted(sources)
@@ -4,341 +4,948 @@ Loads Markdown files, chunks them, embeds them, and stores in FAISS
 """
 
 import os
+import copy
 import json
+import shutil
+import hashlib
 import logging
 import pickle
-import re
-from typing import List, Dict, Any, Tuple
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Tuple, Optional, Iterator, Iterable, Callable, Sequence
 from pathlib import Path
 import numpy as np
 
+try:
+    from src.chunk_store import ChunkStore, chunk_store_exists
+    from src.embedding_cache import QueryEmbeddingCache, ChunkEmbeddingCache
+    from src.lexical_index import LexicalFeatures, BM25Index, tokenize
+    from src.source_hints import SourceHintMatcher, DEFAULT_SOURCE_HINTS_FILE
+    from src.ann_index import (
+        StreamingIndexBuilder, build_index, recall_report, perturbed_queries, set_search_params, rescore_exact,
+        approximate_distances, supports_removal, add_id_map, selector_parameters
+    )
+    from src.chunk_filters import ChunkFilterIndex
+    from src.concurrency import ReaderCount, applied_thread_policy
+    from src.chunker import chunk_markdown_file, chunk_json_file, chunk_file, source_name, CHUNKER_VERSION
+    from src.dedup import ChunkDeduplicator, reassign_sources
+    from src.sharded_index import ShardedIndex, build_sharded_index, build_shard, read_index, write_index
+    from src.live_index import (
+        GrowingChunks, GrowingMatrix, MutationLog, DataDirWatcher, ProcessRoleLock, WATCHER_LOCK_FILE
+    )
+    from src.index_versions import (
+        current_version, version_dir, next_version, previous_version, set_current, prune_versions,
+        CurrentPointerWatcher
+    )
+    from src.embedding_backend import create_embedding_backend, MultiProcessEncoder, EMBEDDING_MODEL
+except ImportError:
+    from chunk_store import ChunkStore, chunk_store_exists
+    from embedding_cache import QueryEmbeddingCache, ChunkEmbeddingCache
+    from lexical_index import LexicalFeatures, BM25Index, tokenize
+    from source_hints import SourceHintMatcher, DEFAULT_SOURCE_HINTS_FILE
+    from ann_index import (
+        StreamingIndexBuilder, build_index, recall_report, perturbed_queries, set_search_params, rescore_exact,
+        approximate_distances, supports_removal, add_id_map, selector_parameters
+    )
+    from chunk_filters import ChunkFilterIndex
+    from concurrency import ReaderCount, applied_thread_policy
+    from chunker import chunk_markdown_file, chunk_json_file, chunk_file, source_name, CHUNKER_VERSION
+    from dedup import ChunkDeduplicator, reassign_sources
+    from sharded_index import ShardedIndex, build_sharded_index, build_shard, read_index, write_index
+    from live_index import (
+        GrowingChunks, GrowingMatrix, MutationLog, DataDirWatcher, ProcessRoleLock, WATCHER_LOCK_FILE
+    )
+    from index_versions import (
+        current_version, version_dir, next_version, previous_version, set_current, prune_versions,
+        CurrentPointerWatcher
+    )
+    from embedding_backend import create_embedding_backend, MultiProcessEncoder, EMBEDDING_MODEL
+
 logger = logging.getLogger(__name__)
 
+
+# Typical questions run once at startup to allocate encoder / FAISS buffers
+_WARMUP_QUERIES = (
+    "What is the hostel fee?",
+    "bus routes and transport",
+    "admission process and eligibility",
+    "placement statistics and companies",
+)
+
+# Texts per model forward pass during index builds
+_ENCODE_BATCH_SIZE = 64
+
+# Filtered searches matching at most this many chunks compute their distances exactly
+# from the float matrix; larger sets are searched in FAISS through an IDSelector
+_FILTER_SCAN_MAX = 4096
+
+# New chunk vectors of live updates stay in the embedding cache's spill file until a
+# compaction commits them, or until this many have accumulated
+_LIVE_CACHE_COMMIT_EVERY = 512
+
+# Held-out (perturbed) query vectors the build's recall report is measured on
+_RECALL_QUERIES = 200
+
+# Files of one index version (see index_versions)
+INDEX_FILE = "faiss_index.bin"
+METADATA_FILE = "metadata.pkl"  # Legacy chunk format, read-only
+EMBEDDINGS_FILE = "embeddings.npy"
+BUILDING_EMBEDDINGS_FILE = "embeddings.building.npy"
+SPILL_FILE = "embeddings.spill"
+MANIFEST_FILE = "manifest.json"
+INDEX_REPORT_FILE = "index_report.json"
+BM25_FILE = "bm25_index.npz"
+CHUNK_IDS_FILE = "chunk_ids.npy"
+
+# Manifest fingerprint fields: a different model / dimension makes the vectors unusable
+# (load is refused); different chunking settings only make the chunks outdated
+_MODEL_FINGERPRINT = ('embedding_model', 'dimension')
+_CHUNKING_FINGERPRINT = ('chunk_size', 'chunker_version', 'dedup', 'near_duplicate_threshold')
+
+# Words ignored when matching query keywords against chunks
+_STOP_WORDS = frozenset({
+    'what', 'is', 'the', 'for', 'a', 'an', 'of', 'in', 'to', 'and',
+    'how', 'where', 'when', 'which', 'who', 'can', 'do', 'does', 'are',
+    'was', 'were', 'be', 'been', 'about', 'with', 'from', 'at', 'by',
+    'this', 'that', 'i', 'me', 'my', 'tell', 'give', 'show', 'please',
+    'want', 'know', 'need', 'like', 'get', 'will', 'would', 'could',
+    'should', 'have', 'has', 'had', 'there', 'their', 'they', 'its'
+})
+
+
+def _query_keywords(query: str) -> Tuple[str, set]:
+    """Lowercased query and its keywords (punctuation-split words minus stop words)"""
+    query_lower = query.lower()
+    query_words = set(query_lower.replace('?', ' ').replace('!', ' ').replace(',', ' ').split())
+    return query_lower, query_words - _STOP_WORDS
+
+
+def _top_k_positions(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k highest scores, best first, without a full sort; ties keep input order"""
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    if len(scores) > k:
+        cutoff = scores[np.argpartition(-scores, k - 1)[k - 1]]
+        above = np.flatnonzero(scores > cutoff)
+        tied = np.flatnonzero(scores == cutoff)[:k - len(above)]
+        selected = np.concatenate((above, tied))
+    else:
+        selected = np.arange(len(scores))
+    return selected[np.lexsort((selected, -scores[selected]))]
+
+
+def _merge_candidates(distances: np.ndarray, positions: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Per query: the k nearest distinct valid positions of several result lists (-1 padded)"""
+    merged_distances = np.full((len(positions), k), np.inf, dtype=np.float32)
+    merged_positions = np.full((len(positions), k), -1, dtype=np.int64)
+    for row in range(len(positions)):
+        valid = positions[row] >= 0
+        row_positions, row_distances = positions[row][valid], distances[row][valid]
+        order = np.argsort(row_distances, kind='stable')
+        row_positions, row_distances = row_positions[order], row_distances[order]
+        first = np.sort(np.unique(row_positions, return_index=True)[1])[:k]
+        merged_positions[row, :len(first)] = row_positions[first]
+        merged_distances[row, :len(first)] = row_distances[first]
+    return merged_distances, merged_positions
+
+
+def _boosts(features: LexicalFeatures, keywords: set, hinted_sources: np.ndarray,
+            ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Keyword, source and header boosts of chunks (hinted_sources: mask over features.source_names)"""
+    # Keyword boost: add up to 0.20 for keyword matches
+    keyword_boost = np.minimum(0.20, features.keyword_counts(keywords, ids) * 0.04)
+    # Source file boost: strong boost if chunk comes from expected source, penalize the rest
+    source_boost = np.where(hinted_sources[features.source_ids[ids]], 0.25, -0.05)
+    # Header match bonus: if chunk header contains query keywords
+    header_boost = np.minimum(0.15, features.header_counts(keywords, ids) * 0.05)
+    return keyword_boost, source_boost, header_boost
+
+
+def _source_groups(features: LexicalFeatures, positions: np.ndarray) -> Dict[str, np.ndarray]:
+    """Row positions grouped by (lowercased) source name, the shard key"""
+    sources = features.source_ids[positions]
+    groups = {}
+    for source_id in np.unique(sources):
+        groups[features.source_names[source_id]] = positions[sources == source_id]
+    return groups
+
+
+def _without_sources(chunk: Dict[str, Any], sources: set) -> Dict[str, Any]:
+    """Copy of a chunk without the 'sources' references to the given source names"""
+    chunk = dict(chunk)
+    refs = [ref for ref in chunk.get('sources') or () if ref.get('source_file') not in sources]
+    if len(refs) > 1:
+        chunk['sources'] = refs
+    else:
+        chunk.pop('sources', None)
+    return chunk
+
+
+class _LegacyMetadataUnpickler(pickle.Unpickler):
+    """Unpickler for old metadata.pkl files that only allows plain containers"""
+    
+    def find_class(self, module, name):
+        raise pickle.UnpicklingError(f"Refusing to load {module}.{name} from legacy metadata")
+
+
+def _import_faiss():
+    """Import FAISS, falling back to the faiss_cpu module name"""
+    try:
+        import faiss
+    except Exception as e:
+        logger.error(f"Failed to import FAISS: {e}. Trying alternate import...")
+        import faiss_cpu as faiss
+    return faiss
+
+
+class _BatchEmbedder:
+    """
+    Build stage between chunking and the index: queues chunk texts (to encode) and
+    reused vectors in chunk order, and hands them to add() in order, encoding
+    batch_size texts per encode() call so only one batch of vectors is in memory
+    """
+    
+    def __init__(self, encode: Callable[[List[str]], np.ndarray], add: Callable[[np.ndarray], None],
+                 batch_size: int):
+        self.encode = encode
+        self.add = add
+        self.batch_size = batch_size
+        self.queue = []  # str (text to encode) or np.ndarray (reused vector row)
+        self.queued_texts = 0
+        self.encoded = 0
+        self.encode_seconds = 0.0
+    
+    def put_texts(self, texts: List[str]):
+        self.queue.extend(texts)
+        self.queued_texts += len(texts)
+        self._drain(final=False)
+    
+    def put_vectors(self, vectors: np.ndarray):
+        self.queue.extend(vectors)
+        self._drain(final=False)
+    
+    def close(self):
+        self._drain(final=True)
+    
+    def _drain(self, final: bool):
+        # Reused rows alone never wait long: flush them once they fill a few batches
+        while self.queue and (final or self.queued_texts >= self.batch_size
+                              or len(self.queue) >= 4 * self.batch_size):
+            end = texts = 0
+            while end < len(self.queue) and texts < self.batch_size:
+                texts += isinstance(self.queue[end], str)
+                end += 1
+            items, self.queue = self.queue[:end], self.queue[end:]
+            self.queued_texts -= texts
+            
+            if texts:
+                start = time.perf_counter()
+                encoded = iter(np.asarray(self.encode([item for item in items if isinstance(item, str)]),
+                                          dtype='float32'))
+                self.encode_seconds += time.perf_counter() - start
+                self.encoded += texts
+                items = [next(encoded) if isinstance(item, str) else item for item in items]
+                logger.info(f"🔄 Embedded {self.encoded} chunks")
+            self.add(np.vstack(items))
+
+
+class _PoolStats:
+    """Thread-safe counters of adaptive candidate pool decisions (see VectorStoreManager.pool_stats)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.searches = 0
+        self.widened = 0  # Searches that widened their pool at least once
+        self.capped = 0  # Searches that ended at the largest pool
+        self.candidates = 0  # Sum of final pool sizes
+        self.reasons: Dict[str, int] = {}
+        self.pool_sizes: Dict[int, int] = {}
+
+    def record_widening(self, reason: str):
+        with self._lock:
+            self.reasons[reason] = self.reasons.get(reason, 0) + 1
+
+    def record_search(self, pool: int, widenings: int, capped: bool):
+        with self._lock:
+            self.searches += 1
+            self.widened += widenings > 0
+            self.capped += capped
+            self.candidates += pool
+            self.pool_sizes[pool] = self.pool_sizes.get(pool, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'searches': self.searches,
+                'widened': self.widened,
+                'widen_rate': self.widened / self.searches if self.searches else 0.0,
+                'capped': self.capped,
+                'widen_reasons': dict(self.reasons),
+                'pool_sizes': dict(sorted(self.pool_sizes.items())),
+                'mean_pool': self.candidates / self.searches if self.searches else 0.0,
+            }
+
+
+class _StoreState:
+    """
+    Everything searches read for one loaded index version. A search takes the
+    current state once; reloads, rollbacks and live updates build a new state and
+    swap it in with one assignment, so queries in flight finish on the old one
+    """
+
+    def __init__(self, store_dir: str, version: Optional[str] = None):
+        self.store_dir = store_dir
+        self.version = version  # 'v{n}', None for the legacy flat layout
+        self.index = None
+        self.chunks = []  # Store all chunks with metadata
+        self.float_vectors = None  # Memory-mapped embeddings.npy (exact distances)
+        self.bm25_index = None
+        self.lexical_features = None  # Lowercased text/headers/source ids for re-ranking
+        self.chunk_filter = None  # Metadata -> rows for search filters, built on the first filtered search
+        self.index_info = {'type': 'flat', 'params': {}}  # What the index was built with
+        self.file_hashes = {}  # Per-file content hashes of the build
+        # Fingerprint (model, dimension, chunking settings), build timings and creation time
+        # as saved in the manifest; outdated lists chunking settings differing from the manager's
+        self.manifest = {}
+        self.outdated = []
+
+        # Stable chunk ids: the FAISS index returns ids, mapped to row positions here.
+        # Live updates append rows and ids; removed ids map to -1
+        self.chunk_ids = np.zeros(0, dtype=np.int64)  # Position -> id
+        self.id_positions = np.zeros(0, dtype=np.int64)  # Id -> position (-1: removed)
+        self.next_chunk_id = 0
+        # Live additions go to a small flat index (replaced copy-on-write); removals from
+        # the main index are filtered out until compaction folds both into a new version
+        self.delta_index = None
+        self.index_tombstones = 0
+        self.mutation_log = MutationLog(store_dir)
+        # Searches reading this version's memory-mapped files, shared by the copies live
+        # updates make; a retired version is closed once its last search is done
+        self.readers = ReaderCount()
+
+    def copy(self) -> "_StoreState":
+        return copy.copy(self)
+    
+    def close(self):
+        """Release the memory-mapped chunks and vectors (see readers: only once no search reads them)"""
+        if hasattr(self.chunks, 'close'):
+            self.chunks.close()
+        self.float_vectors = None
+
+    def set_chunk_ids(self, chunk_ids: np.ndarray, next_chunk_id: int = 0):
+        """Install the position -> id array and its inverse id -> position map"""
+        chunk_ids = np.asarray(chunk_ids, dtype=np.int64)
+        next_chunk_id = max(int(next_chunk_id), int(chunk_ids.max()) + 1 if len(chunk_ids) else 0)
+        id_positions = np.full(next_chunk_id, -1, dtype=np.int64)
+        id_positions[chunk_ids] = np.arange(len(chunk_ids))
+        self.chunk_ids = chunk_ids
+        self.id_positions = id_positions
+        self.next_chunk_id = next_chunk_id
+
+    def live_positions(self) -> np.ndarray:
+        """Row positions of the chunks that were not removed, in row order"""
+        return np.sort(self.id_positions[self.id_positions >= 0])
+
+    def positions_of(self, ids: np.ndarray) -> np.ndarray:
+        """Row positions of chunk ids (-1 for FAISS padding and removed chunks)"""
+        id_positions = self.id_positions
+        valid = (ids >= 0) & (ids < len(id_positions))
+        if not valid.any():
+            return np.full(ids.shape, -1, dtype=np.int64)
+        return np.where(valid, id_positions[np.where(valid, ids, 0)], -1)
+
+
+def _state_attribute(name: str) -> property:
+    """Manager attribute that reads / writes the current _StoreState"""
+    return property(lambda self: getattr(self._state, name),
+                    lambda self, value: setattr(self._state, name, value))
+
+
+def _store_file(filename: str) -> property:
+    """Path of a file in the current version's directory"""
+    return property(lambda self: os.path.join(self._state.store_dir, filename))
+
+
 class VectorStoreManager:
     """Manage FAISS vector store with markdown file chunking and embedding"""
-    
-    def __init__(self, data_dir: str = "data_md", vector_store_path: str = "faiss_index"):
+
+    # Search state lives in self._state (see _StoreState); these keep the old attribute names
+    index = _state_attribute('index')
+    chunks = _state_attribute('chunks')
+    float_vectors = _state_attribute('float_vectors')
+    embeddings = _state_attribute('float_vectors')
+    bm25_index = _state_attribute('bm25_index')
+    lexical_features = _state_attribute('lexical_features')
+    index_info = _state_attribute('index_info')
+    file_hashes = _state_attribute('file_hashes')
+    chunk_ids = _state_attribute('chunk_ids')
+    id_positions = _state_attribute('id_positions')
+    next_chunk_id = _state_attribute('next_chunk_id')
+    delta_index = _state_attribute('delta_index')
+    index_tombstones = _state_attribute('index_tombstones')
+    mutation_log = _state_attribute('mutation_log')
+
+    vector_store_file = _store_file(INDEX_FILE)
+    metadata_file = _store_file(METADATA_FILE)  # Legacy format, read-only
+    embeddings_file = _store_file(EMBEDDINGS_FILE)
+    manifest_file = _store_file(MANIFEST_FILE)
+    index_report_file = _store_file(INDEX_REPORT_FILE)
+    bm25_file = _store_file(BM25_FILE)
+    chunk_ids_file = _store_file(CHUNK_IDS_FILE)
+
+    def __init__(
+        self,
+        data_dir: str = "data_md",
+        vector_store_path: str = "faiss_index",
+        query_cache_size: int = 1024,
+        query_cache_ttl: Optional[float] = None,
+        candidate_multiplier: int = 8,
+        source_hints_file: str = str(DEFAULT_SOURCE_HINTS_FILE),
+        index_type: str = "auto",
+        index_params: Optional[Dict[str, Any]] = None,
+        quantization: Optional[str] = None,
+        rescore: bool = True,
+        use_bm25: bool = True,
+        rrf_k: int = 60,
+        embedding_backend: Optional[str] = None,
+        embedding_threads: Optional[int] = None,
+        build_workers: Optional[int] = None,
+        embed_batch_size: int = 1024,
+        encode_workers: Optional[int] = None,
+        embedding_cache: bool = True,
+        dedup: bool = True,
+        near_duplicate_threshold: float = 0.9,
+        json_sources: Optional[List[str]] = None,
+        compact_every: int = 1000,
+        keep_versions: int = 3,
+        chunk_size: int = 500,
+        on_mismatch: Optional[str] = None,
+        shard_by_source: bool = True,
+        max_routed_shards: int = 3,
+        adaptive_pool: bool = True,
+        min_candidate_multiplier: int = 2,
+        flat_score_margin: float = 0.02
+    ):
         self.data_dir = data_dir
+        # Sources are the .md and .json files in data_dir plus these extra JSON files
+        self.json_sources = list(json_sources or [])
+        # Each build writes vector_store_path/v{n}/ and moves the CURRENT pointer to it;
+        # the embedding cache is shared by all versions
         self.vector_store_path = vector_store_path
-        self.vector_store_file = os.path.join(vector_store_path, "faiss_index.bin")
-        self.metadata_file = os.path.join(vector_store_path, "metadata.pkl")
+        self.embedding_cache_dir = os.path.join(vector_store_path, "embedding_cache")
+        self.keep_versions = keep_versions  # Version directories kept on disk (rollback targets)
+        version = current_version(vector_store_path)
+        self._state = _StoreState(version_dir(vector_store_path, version), version)
+        self._previous_state = None  # Version served before the last swap (instant rollback)
+        self.version_watcher = None
         
-        self.index = None
-        self.chunks = []  # Store all chunks with metadata
-        self.embeddings = []
         self.embedding_model = None
+        # Encoder implementation: 'sentence_transformers' (PyTorch) or 'onnx' (int8 ONNX Runtime);
+        # defaults come from EMBEDDING_BACKEND / EMBEDDING_THREADS so the server is configured via .env
+        self.embedding_backend = embedding_backend or os.getenv("EMBEDDING_BACKEND", "sentence_transformers")
+        if embedding_threads is None and os.getenv("EMBEDDING_THREADS"):
+            embedding_threads = int(os.getenv("EMBEDDING_THREADS"))
+        self.embedding_threads = embedding_threads
+        self.build_workers = build_workers or os.cpu_count() or 1  # Chunking processes during builds
+        self.embed_batch_size = embed_batch_size  # Chunks per encode() / index.add() during builds
+        # Encode processes during builds; the pool is only started for corpora over one embed batch
+        self.encode_workers = encode_workers or os.cpu_count() or 1
+        # On-disk cache of chunk vectors keyed by model + text hash; builds only encode misses
+        self.use_embedding_cache = embedding_cache
+        self._live_cache = None  # Cache instance of live updates (see _embed_texts)
+        # Fold exact / near-duplicate chunks into one vector carrying a 'sources' list
+        self.dedup = dedup
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.chunk_size = chunk_size  # Characters per chunk (recorded in the manifest fingerprint)
+        # Loading a store whose manifest does not match these settings: 'error' refuses an
+        # index built for another model (and serves outdated chunking with a warning);
+        # 'rebuild' additionally starts a background rebuild that is swapped in when done
+        self.on_mismatch = on_mismatch or os.getenv("INDEX_MISMATCH", "error")
+        self.index_mismatch = []  # Fingerprint problems found by the last load
+        self._rebuild_thread = None
+        self.build_stats = None  # Per-stage throughput of the last build
+        self.candidate_multiplier = candidate_multiplier  # FAISS candidates fetched per result for re-ranking
+        # Adaptive pool: start with min_candidate_multiplier candidates per result and double
+        # (up to candidate_multiplier) only while re-ranking could still change the top_k
+        self.adaptive_pool = adaptive_pool
+        self.min_candidate_multiplier = min_candidate_multiplier
+        self.flat_score_margin = flat_score_margin
+        self.candidate_pool_stats = _PoolStats()
+        
+        # FAISS index type ('auto', 'flat', 'hnsw', 'ivf_flat', 'ivf_pq') and build parameters
+        self.index_type = index_type
+        self.index_params = index_params
+        self.index_report = None  # Recall/latency report of the last build
+        
+        # One index shard per source file, searched in parallel; queries whose source hints
+        # name at most max_routed_shards sources only search those shards (0: never route)
+        self.shard_by_source = shard_by_source
+        self.max_routed_shards = max_routed_shards
+        
+        # Vector compression ('sq8' / 'fp16'); with rescore, candidate distances of these and
+        # of IVF-PQ indexes are recomputed exactly from the memory-mapped float matrix
+        # (embeddings.npy). Without it their similarity scores are approximate and do not
+        # compare reliably against the fixed relevance thresholds
+        self.quantization = quantization
+        self.rescore = rescore
+        
+        # BM25 inverted index, fused with FAISS results by reciprocal rank fusion
+        self.use_bm25 = use_bm25
+        self.rrf_k = rrf_k
+        
+        # Live updates: writers (updates, compaction, builds, reloads) serialize on this
+        # lock to build the next state; searches never take it
+        self.compact_every = compact_every  # Log records that trigger a compaction
+        self._mutation_lock = threading.RLock()
+        self.watcher = None
+        self._watcher_lock = None  # Held while this process is the store's watcher (one per store)
+        
+        # Embedding model is loaded once: by the warmup thread or the first search,
+        # whichever comes first; everyone else waits on the lock instead of loading again
+        self._model_lock = threading.Lock()
+        self._ready = threading.Event()
+        self._warmup_thread = None
+        self.warmup_error = None
+        
+        # Query keyword -> likely source files, compiled once from source_hints.json
+        self.source_hint_matcher = SourceHintMatcher.from_file(source_hints_file)
+        
+        # Query embeddings of recent/popular questions (skips encode on repeats)
+        self.query_cache = QueryEmbeddingCache(max_size=query_cache_size, ttl_seconds=query_cache_ttl)
         
         # Create vector store directory
         os.makedirs(vector_store_path, exist_ok=True)
         
     def initialize_embedding_model(self):
-        """Initialize sentence transformer for embeddings"""
-        try:
-            # Suppress TensorFlow warnings
-            import os
-            os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
-            os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
-            
-            import warnings
-            warnings.filterwarnings('ignore')
-            
-            from sentence_transformers import SentenceTransformer
-            logger.info("[LOAD] Loading embedding model: all-MiniLM-L6-v2")
-            self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-            logger.info("[OK] Embedding model loaded successfully")
-            return True
-        except ImportError:
-            logger.error("[ERROR] sentence-transformers not installed. Install: pip install sentence-transformers")
-            return False
-        except Exception as e:
-            logger.error(f"[ERROR] Failed to load embedding model: {e}")
-            return False
+        """Initialize the configured embedding backend (falls back to SentenceTransformer)"""
+        backends = [self.embedding_backend]
+        if self.embedding_backend != 'sentence_transformers':
+            backends.append('sentence_transformers')
+        
+        # Unless configured, encoder threads follow the process thread policy (see concurrency)
+        threads = self.embedding_threads
+        if threads is None and applied_thread_policy() is not None:
+            threads = applied_thread_policy()['threads']
+        
+        for name in backends:
+            try:
+                logger.info(f"[LOAD] Loading embedding model: {EMBEDDING_MODEL} ({name} backend)")
+                self.embedding_model = create_embedding_backend(name, threads=threads)
+                self.embedding_backend = name
+                logger.info("[OK] Embedding model loaded successfully")
+                return True
+            except ImportError as e:
+                logger.error(f"[ERROR] {name} backend unavailable ({e}). Install: pip install "
+                             f"{'onnxruntime tokenizers' if name == 'onnx' else 'sentence-transformers'}")
+            except Exception as e:
+                logger.error(f"[ERROR] Failed to load embedding model ({name} backend): {e}")
+        return False
     
     def chunk_markdown_file(self, filepath: str, chunk_size: int = 500) -> List[Dict[str, Any]]:
+        """Load and chunk a single Markdown file (see chunker.chunk_markdown_file)"""
+        return chunk_markdown_file(filepath, chunk_size)
+    
+    def chunk_json_file(self, filepath: str, chunk_size: int = 500) -> List[Dict[str, Any]]:
+        """Load and chunk a single JSON file (see chunker.chunk_json_file)"""
+        return chunk_json_file(filepath, chunk_size)
+    
+    def _hash_file(self, filepath: str) -> str:
+        """Return the SHA-256 hex digest of a file's contents"""
+        digest = hashlib.sha256()
+        with open(filepath, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 16), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    def _load_previous_build(self) -> Dict[str, Any]:
         """
-        Load and chunk a single Markdown file
-        Returns list of chunks with metadata  
-        Uses section-aware chunking to preserve context
+        Load the manifest, chunks and vectors of the last build for incremental reuse
+        Returns None when there is no usable previous build
         """
-        filename = os.path.basename(filepath)
-        logger.info(f"📄 Processing: {filename}")
+        version = current_version(self.vector_store_path)
+        store_dir = version_dir(self.vector_store_path, version)
+        if not (os.path.exists(os.path.join(store_dir, MANIFEST_FILE))
+                and os.path.exists(os.path.join(store_dir, INDEX_FILE))):
+            return None
         
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                content = f.read()
+            state = self._load_state(version)
+            if state is None:
+                return None
+            if state.outdated:
+                logger.warning("⚠️ Previous build used other chunking settings, doing full rebuild")
+                return None
             
-            chunks = []
+            # Prefer the saved float matrix (plus live additions); fall back to the flat index
+            vectors = state.float_vectors
+            if vectors is None:
+                vectors = state.index.reconstruct_n(0, state.index.ntotal)
             
-            # Split by sections (## headers) for better context
-            sections = re.split(r'\n(?=##\s)', content)
+            if len(vectors) != len(state.chunks):
+                logger.warning("⚠️ Previous build is inconsistent (vectors != chunks), doing full rebuild")
+                return None
             
-            for idx, section in enumerate(sections):
-                section = section.strip()
-                if not section or len(section) < 20:
-                    continue
-                
-                # Extract section header for context
-                header = ''
-                header_match = re.match(r'^(#+\s+.+)', section)
-                if header_match:
-                    header = header_match.group(1).lstrip('#').strip()
-                
-                # Further split large sections into sub-sections (### headers)
-                sub_sections = re.split(r'\n(?=###\s)', section)
-                
-                for sub_idx, sub_section in enumerate(sub_sections):
-                    sub_section = sub_section.strip()
-                    if not sub_section or len(sub_section) < 15:
-                        continue
-                    
-                    # Extract sub-header
-                    sub_header = ''
-                    sub_header_match = re.match(r'^(#+\s+.+)', sub_section)
-                    if sub_header_match:
-                        sub_header = sub_header_match.group(1).lstrip('#').strip()
-                    
-                    # Add context prefix from headers
-                    context_prefix = ''
-                    if header:
-                        context_prefix = f"Topic: {header}"
-                        if sub_header and sub_header != header:
-                            context_prefix += f" > {sub_header}"
-                        context_prefix += "\n"
-                    
-                    # If sub-section is small enough, keep as one chunk
-                    if len(sub_section) <= chunk_size:
-                        chunk_text = context_prefix + sub_section
-                        chunks.append({
-                            'text': chunk_text,
-                            'source_file': filename.replace('.md', ''),
-                            'section_index': idx,
-                            'chunk_index': sub_idx,
-                            'header': header,
-                            'sub_header': sub_header,
-                            'metadata': {}
-                        })
-                    else:
-                        # Split large sub-sections by paragraphs
-                        paragraphs = sub_section.split('\n\n')
-                        current_chunk = context_prefix
-                        chunk_count = 0
-                        
-                        for para in paragraphs:
-                            para = para.strip()
-                            if not para:
-                                continue
-                            
-                            if len(current_chunk) + len(para) > chunk_size and len(current_chunk) > len(context_prefix) + 10:
-                                chunks.append({
-                                    'text': current_chunk.strip(),
-                                    'source_file': filename.replace('.md', ''),
-                                    'section_index': idx,
-                                    'chunk_index': chunk_count,
-                                    'header': header,
-                                    'sub_header': sub_header,
-                                    'metadata': {}
-                                })
-                                chunk_count += 1
-                                current_chunk = context_prefix + para + '\n'
-                            else:
-                                current_chunk += para + '\n'
-                        
-                        # Don't forget the last chunk
-                        if len(current_chunk.strip()) > len(context_prefix) + 10:
-                            chunks.append({
-                                'text': current_chunk.strip(),
-                                'source_file': filename.replace('.md', ''),
-                                'section_index': idx,
-                                'chunk_index': chunk_count,
-                                'header': header,
-                                'sub_header': sub_header,
-                                'metadata': {}
-                            })
-            
-            logger.info(f"  ✅ Created {len(chunks)} chunks from {filename}")
-            return chunks
+            # Group previous (not removed) chunk positions by the file that produced them
+            positions = {}
+            for pos in state.live_positions():
+                positions.setdefault(state.chunks[int(pos)].get('source_file', ''), []).append(int(pos))
             
+            return {
+                'files': state.file_hashes,
+                'chunks': state.chunks,
+                'vectors': vectors if isinstance(vectors, GrowingMatrix) else np.asarray(vectors, dtype='float32'),
+                'positions': positions,
+            }
         except Exception as e:
-            logger.error(f"  ❌ Error processing {filename}: {e}")
-            return []
+            logger.warning(f"⚠️ Could not reuse previous build ({e}), doing full rebuild")
+            return None
     
-    def chunk_json_file(self, filepath: str, chunk_size: int = 500) -> List[Dict[str, Any]]:
+    def _surviving_references(self, previous: Dict[str, Any], source: str, added: List[Dict[str, Any]],
+                              stale_sources: set) -> Tuple[List[Dict[str, Any]], np.ndarray]:
         """
-        Load and chunk a single JSON file
-        Returns list of chunks with metadata
+        Previous chunks of a re-chunked or deleted source that other (unchanged) files
+        were folded into: their references move onto an identical added chunk, else
+        the chunk is kept for those files with its previous vector (see reassign_sources)
         """
-        filename = os.path.basename(filepath)
-        logger.info(f"📄 Processing: {filename}")
-        
-        try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            chunks = []
-            
-            # Handle different JSON structures
-            if isinstance(data, list):
-                # List of items - chunk each item
-                for idx, item in enumerate(data):
-                    text = self._extract_text_from_item(item)
-                    if len(text) > chunk_size:
-                        # Split large items into smaller chunks
-                        sub_chunks = self._split_text(text, chunk_size)
-                        for sub_idx, sub_chunk in enumerate(sub_chunks):
-                            chunks.append({
-                                'text': sub_chunk,
-                                'source_file': filename,
-                                'item_index': idx,
-                                'chunk_index': sub_idx,
-                                'metadata': item if isinstance(item, dict) else {}
-                            })
-                    else:
-                        chunks.append({
-                            'text': text,
-                            'source_file': filename,
-                            'item_index': idx,
-                            'chunk_index': 0,
-                            'metadata': item if isinstance(item, dict) else {}
-                        })
-            
-            elif isinstance(data, dict):
-                # Single object - extract key sections
-                for key, value in data.items():
-                    text = self._extract_text_from_item({key: value})
-                    if len(text) > chunk_size:
-                        sub_chunks = self._split_text(text, chunk_size)
-                        for sub_idx, sub_chunk in enumerate(sub_chunks):
-                            chunks.append({
-                                'text': sub_chunk,
-                                'source_file': filename,
-                                'key': key,
-                                'chunk_index': sub_idx,
-                                'metadata': {key: value}
-                            })
-                    else:
-                        chunks.append({
-                            'text': text,
-                            'source_file': filename,
-                            'key': key,
-                            'chunk_index': 0,
-                            'metadata': {key: value}
-                        })
-            
-            logger.info(f"  ✅ Created {len(chunks)} chunks from {filename}")
-            return chunks
+        positions = previous['positions'].get(source, [])
+        removed = [_without_sources(previous['chunks'][pos], stale_sources - {source}) for pos in positions]
+        kept = reassign_sources(removed, added, source)
+        vectors = previous['vectors'][[positions[i] for i, _ in kept]] if kept else np.zeros((0, 0), dtype='float32')
+        return [chunk for _, chunk in kept], vectors
+    
+    def _source_files(self) -> List[tuple]:
+        """(name, path) of every source to index; the name keys the manifest"""
+        names = sorted(f for f in os.listdir(self.data_dir) if f.endswith(('.md', '.json')))
+        files = [(name, os.path.join(self.data_dir, name)) for name in names]
+        files += [(path, path) for path in self.json_sources]
+        return files
+    
+    def _plan_files(self, files: List[tuple], previous: Optional[Dict[str, Any]]) -> List[tuple]:
+        """
+        (name, path, file_hash, previous chunk positions or None) per source file;
+        positions are set for files unchanged since the previous build (incremental reuse)
+        """
+        jobs = []
+        for name, filepath in files:
+            file_hash = self._hash_file(filepath)
             
-        except Exception as e:
-            logger.error(f"  ❌ Error processing {filename}: {e}")
-            return []
+            previous_entry = previous['files'].get(name) if previous else None
+            previous_positions = previous['positions'].get(source_name(filepath)) if previous else None
+            if not (previous_entry and previous_entry.get('sha256') == file_hash and previous_positions):
+                previous_positions = None
+            jobs.append((name, filepath, file_hash, previous_positions))
+        return jobs
     
-    def _extract_text_from_item(self, item: Any) -> str:
-        """Extract searchable text from JSON item"""
-        if isinstance(item, str):
-            return item
-        elif isinstance(item, dict):
-            text_parts = []
-            for key, value in item.items():
-                if isinstance(value, (str, int, float, bool)):
-                    text_parts.append(f"{key}: {value}")
-                elif isinstance(value, list):
-                    text_parts.append(f"{key}: {' '.join(str(v) for v in value)}")
-                elif isinstance(value, dict):
-                    text_parts.append(self._extract_text_from_item(value))
-            return " | ".join(text_parts)
-        elif isinstance(item, list):
-            return " | ".join(self._extract_text_from_item(i) for i in item)
-        else:
-            return str(item)
-    
-    def _split_text(self, text: str, chunk_size: int) -> List[str]:
-        """Split text into chunks of approximately chunk_size characters"""
-        words = text.split()
-        chunks = []
-        current_chunk = []
-        current_length = 0
-        
-        for word in words:
-            word_length = len(word) + 1  # +1 for space
-            if current_length + word_length > chunk_size and current_chunk:
-                chunks.append(' '.join(current_chunk))
-                current_chunk = [word]
-                current_length = word_length
-            else:
-                current_chunk.append(word)
-                current_length += word_length
+    def _iter_file_chunks(self, jobs: List[tuple], previous: Optional[Dict[str, Any]]) -> Iterator[tuple]:
+        """
+        Yield (name, file_hash, chunks, reused vectors or None) in file order (jobs: _plan_files)
+        Changed files are chunked in a process pool a few files ahead of the consumer;
+        unchanged files (incremental builds) reuse the previous chunks and vectors
+        """
+        paths = iter([filepath for _, filepath, _, positions in jobs if positions is None])
+        workers = min(self.build_workers, sum(positions is None for *_, positions in jobs))
+        executor = None
+        if workers > 1:
+            try:
+                executor = ProcessPoolExecutor(max_workers=workers)
+            except Exception as e:
+                logger.warning(f"⚠️ Process pool unavailable ({e}), chunking in this process")
         
-        if current_chunk:
-            chunks.append(' '.join(current_chunk))
+        # Bounded look-ahead: at most 2 files per worker are chunked but not yet consumed
+        in_flight = deque()
         
-        return chunks
+        def submit():
+            path = next(paths, None)
+            if path is not None:
+                in_flight.append(executor.submit(chunk_file, path, self.chunk_size))
+        
+        try:
+            if executor:
+                for _ in range(2 * workers):
+                    submit()
+            
+            for name, _, file_hash, positions in jobs:
+                if positions is not None:
+                    logger.info(f"♻️  Unchanged: {name} ({len(positions)} chunks reused)")
+                    yield name, file_hash, [previous['chunks'][pos] for pos in positions], previous['vectors'][positions]
+                elif executor:
+                    chunks = in_flight.popleft().result()
+                    submit()
+                    yield name, file_hash, chunks, None
+                else:
+                    yield name, file_hash, chunk_file(next(paths), self.chunk_size), None
+        finally:
+            if executor:
+                executor.shutdown(wait=True, cancel_futures=True)
     
-    def build_vector_store(self, force_rebuild: bool = False):
-        """Build FAISS vector store from all JSON files in data directory"""
+    def build_vector_store(self, force_rebuild: bool = False, incremental: bool = False):
+        """
+        Build FAISS vector store from all Markdown and JSON files in data directory (plus json_sources)
+        Pipelined: files are chunked in a process pool while earlier chunks are
+        embedded in fixed-size batches and added to the index, with the float
+        matrix spilled to disk, so memory stays bounded by a few batches
+        With incremental=True, only files whose content hash changed since the
+        last build are re-chunked and re-embedded; other vectors are carried over
+        (with dedup, the new chunks are deduplicated against the carried-over ones)
+        The store is written as a new version directory; CURRENT moves to it and
+        it is swapped in only once complete, so the served version is never touched
+        """
         
         # Check if vector store already exists
-        if not force_rebuild and os.path.exists(self.vector_store_file):
+        if not force_rebuild and not incremental and os.path.exists(self.vector_store_file):
             logger.info("📦 Loading existing vector store...")
             return self.load_vector_store()
         
         logger.info("="*80)
-        logger.info("🔨 BUILDING FAISS VECTOR STORE")
+        logger.info("🔨 BUILDING FAISS VECTOR STORE" + (" (incremental)" if incremental else ""))
         logger.info("="*80)
         
-        # Initialize embedding model
-        if not self.initialize_embedding_model():
-            logger.error("❌ Cannot build vector store without embedding model")
-            return False
+        previous = self._load_previous_build() if incremental else None
+        dedup = ChunkDeduplicator(self.near_duplicate_threshold) if self.dedup else None
         
-        # Process all Markdown files
-        all_chunks = []
-        md_files = [f for f in os.listdir(self.data_dir) if f.endswith('.md')]
+        version = next_version(self.vector_store_path)
+        store_dir = version_dir(self.vector_store_path, version)
+        os.makedirs(store_dir, exist_ok=True)
+        spill_file = os.path.join(store_dir, SPILL_FILE)
+        published = False
         
-        logger.info(f"📁 Found {len(md_files)} Markdown files to process")
+        source_files = self._source_files()
+        num_json = sum(name.endswith('.json') for name, _ in source_files)
+        logger.info(f"📁 Found {len(source_files) - num_json} Markdown and {num_json} JSON files to process")
         print()
+        jobs = self._plan_files(source_files, previous)
         
-        for md_file in sorted(md_files):
-            filepath = os.path.join(self.data_dir, md_file)
-            file_chunks = self.chunk_markdown_file(filepath)
-            all_chunks.extend(file_chunks)
+        # With dedup, reused chunks drop references to re-chunked or deleted sources (their
+        # new chunks are deduplicated again); references other files hold stay
+        stale_sources = set()
+        if previous is not None and dedup is not None:
+            stale_sources = {source_name(path) for _, path, _, positions in jobs if positions is None}
+            current_names = {name for name, _ in source_files}
+            stale_sources |= {source_name(name) for name in previous['files'] if name not in current_names}
         
-        if not all_chunks:
-            logger.error("❌ No chunks created from Markdown files")
-            return False
+        all_chunks = []
+        file_hashes = {}
+        builders = []  # Created on the first batch, once the embedding dimension is known
+        encode_pools = []  # Multi-process encoder, started by the first full embed batch
+        
+        # Content-addressed chunk vector cache: only texts never embedded before reach the model
+        cache = None
+        if self.use_embedding_cache:
+            cache = ChunkEmbeddingCache(self.embedding_cache_dir, self._embedding_cache_model())
+        used_keys = []  # Cache keys of the current chunk set, for garbage collection
+        model_stats = {'vectors': 0, 'seconds': 0.0}  # Texts that reached the model (not cache hits)
+        
+        def encode(texts: List[str]) -> np.ndarray:
+            if cache is None:
+                return encode_texts(texts)
+            keys = cache.keys_for(texts)
+            used_keys.append(keys)
+            vectors, found = cache.get(keys)
+            missing = np.flatnonzero(~found)
+            if not len(missing):
+                return vectors
+            
+            # Identical texts within the batch are encoded once
+            unique_keys, first, inverse = np.unique(keys[missing], return_index=True, return_inverse=True)
+            encoded = np.asarray(encode_texts([texts[missing[i]] for i in first]), dtype='float32')
+            cache.put(unique_keys, encoded)
+            if vectors.shape[1] != encoded.shape[1]:
+                vectors = np.zeros((len(texts), encoded.shape[1]), dtype='float32')
+            vectors[missing] = encoded[inverse.ravel()]
+            return vectors
+        
+        def encode_texts(texts: List[str]) -> np.ndarray:
+            start = time.perf_counter()
+            if self.encode_workers > 1 and (encode_pools or len(texts) >= self.embed_batch_size):
+                if not encode_pools:
+                    encode_pools.append(MultiProcessEncoder(self.embedding_backend, self.encode_workers))
+                vectors = encode_pools[0].encode(texts, batch_size=_ENCODE_BATCH_SIZE)
+            else:
+                if not self._ensure_embedding_model():
+                    raise RuntimeError("Cannot build vector store without embedding model")
+                vectors = self.embedding_model.encode(texts, batch_size=_ENCODE_BATCH_SIZE,
+                                                      show_progress_bar=False)
+            model_stats['vectors'] += len(texts)
+            model_stats['seconds'] += time.perf_counter() - start
+            return vectors
+        
+        def add(vectors: np.ndarray):
+            if not builders:
+                # Sharded builds only stream the float matrix; shards are built from it at the end
+                builders.append(StreamingIndexBuilder(
+                    vectors.shape[1], spill_file, None if self.shard_by_source else self.index_type,
+                    self.index_params, self.quantization, with_ids=True
+                ))
+            builders[0].add(vectors)
         
-        logger.info(f"\n📊 Total chunks created: {len(all_chunks)}")
-        logger.info("🔄 Generating embeddings...")
+        embedder = _BatchEmbedder(encode, add, self.embed_batch_size)
         
-        # Generate embeddings for all chunks
         try:
-            texts = [chunk['text'] for chunk in all_chunks]
-            embeddings = self.embedding_model.encode(texts, show_progress_bar=True)
-            logger.info(f"✅ Generated {len(embeddings)} embeddings")
+            start_time = time.perf_counter()
+            files_chunked = chunks_created = 0
             
-            # Build FAISS index
-            try:
-                import faiss
-            except Exception as e:
-                logger.error(f"Failed to import FAISS: {e}. Trying alternate import...")
-                import faiss_cpu as faiss
+            def put_reused(chunks: List[Dict[str, Any]], vectors: np.ndarray):
+                if dedup is not None:
+                    keep = np.array([dedup.add(chunk) for chunk in chunks], dtype=bool)
+                    chunks, vectors = [chunk for chunk, k in zip(chunks, keep) if k], vectors[np.flatnonzero(keep)]
+                all_chunks.extend(chunks)
+                if cache is not None:
+                    used_keys.append(cache.keys_for(chunk['text'] for chunk in chunks))
+                if len(chunks):
+                    embedder.put_vectors(vectors)
+                return chunks
+            
+            # Stages 1+2: chunk files (process pool) -> embed batches -> add to index
+            for name, file_hash, file_chunks, reused in self._iter_file_chunks(jobs, previous):
+                if reused is not None:
+                    if stale_sources:
+                        file_chunks = [_without_sources(chunk, stale_sources) for chunk in file_chunks]
+                    file_chunks = put_reused(file_chunks, reused)
+                else:
+                    files_chunked += 1
+                    chunks_created += len(file_chunks)
+                    if dedup is not None:
+                        file_chunks = [chunk for chunk in file_chunks if dedup.add(chunk)]
+                    all_chunks.extend(file_chunks)
+                    embedder.put_texts([chunk['text'] for chunk in file_chunks])
+                    if stale_sources:
+                        put_reused(*self._surviving_references(previous, source_name(name), file_chunks, stale_sources))
+                file_hashes[name] = {'sha256': file_hash, 'chunks': len(file_chunks)}
+            for name in previous['files'] if stale_sources else ():
+                if name not in file_hashes:  # Deleted since the previous build
+                    put_reused(*self._surviving_references(previous, source_name(name), [], stale_sources))
+            chunk_seconds = time.perf_counter() - start_time
+            embedder.close()
+            while encode_pools:
+                encode_pools.pop().close()
+            
+            if not all_chunks:
+                logger.error("❌ No chunks created from source files")
+                return False
+            
+            logger.info(f"\n📊 Total chunks: {len(all_chunks)} ({model_stats['vectors']} embedded, "
+                        f"{embedder.encoded - model_stats['vectors']} from the embedding cache, "
+                        f"{len(all_chunks) - embedder.encoded} reused)")
+            if dedup is not None:
+                logger.info(f"🧹 Dedup: folded {dedup.exact_removed} exact and "
+                            f"{dedup.near_removed} near-duplicate chunks")
+            
+            # Reused chunks are plain dicts now; the served version keeps its own store
+            previous = None
             
-            dimension = embeddings.shape[1]
-            logger.info(f"🔧 Building FAISS index (dimension: {dimension})")
+            # Stage 3: finish the index (flat / HNSW / IVF, picked from corpus size unless configured)
+            builder = builders[0]
+            logger.info(f"🔧 Building FAISS index (dimension: {builder.dimension}, type: {self.index_type})")
+            state = _StoreState(store_dir, version)
+            building_file = os.path.join(store_dir, BUILDING_EMBEDDINGS_FILE)
+            state.index, state.index_info, embeddings = builder.finish(building_file)
+            state.lexical_features = LexicalFeatures(all_chunks)
+            if self.shard_by_source:
+                shard_start = time.perf_counter()
+                positions = np.arange(len(all_chunks), dtype=np.int64)
+                state.index, state.index_info = build_sharded_index(
+                    embeddings, _source_groups(state.lexical_features, positions), positions,
+                    self.index_type, self.index_params, self.quantization
+                )
+                builder.add_seconds += time.perf_counter() - shard_start
+                logger.info(f"🧩 Split the index into {len(state.index.shards)} per-source shards")
+            index, index_info = state.index, state.index_info
             
-            # Use IndexFlatL2 for exact search (good for small-medium datasets)
-            self.index = faiss.IndexFlatL2(dimension)
-            self.index.add(embeddings.astype('float32'))
+            # Lexical side: BM25 over the same chunk texts
+            state.bm25_index = BM25Index.build(chunk['text'] for chunk in all_chunks)
+            logger.info(f"✅ BM25 index built ({len(state.bm25_index.terms)} terms)")
             
-            logger.info(f"✅ FAISS index built with {self.index.ntotal} vectors")
+            logger.info(f"✅ FAISS {index_info['type']} index built with {index.ntotal} vectors")
             
-            # Store chunks and save
-            self.chunks = all_chunks
-            self.embeddings = embeddings
+            # Approximate / quantized indexes: measure recall vs exact search and pick nprobe / efSearch
+            self.index_report = None
+            if index_info['type'] != 'flat' or index_info.get('quantization'):
+                # Recall is measured over the candidate pool a default top_k=5 search fetches
+                self.index_report = recall_report(
+                    index, index_info, embeddings,
+                    perturbed_queries(embeddings, _RECALL_QUERIES),
+                    k=5 * self.candidate_multiplier
+                )
+                index_info['search_params'] = self.index_report['search_params']
+                logger.info(
+                    f"📈 Recall@{self.index_report['k']} {self.index_report['recall']:.3f} "
+                    f"at {self.index_report['latency_ms']:.3f} ms/query "
+                    f"(exact: {self.index_report['exact_latency_ms']:.3f} ms/query), "
+                    f"search params: {self.index_report['search_params']}"
+                )
+                if approximate_distances(index_info):
+                    logger.info(
+                        f"📉 {index_info.get('quantization') or index_info['type']} vectors: "
+                        f"{self.index_report['vector_bytes'] / 1e6:.2f} MB "
+                        f"(float32: {self.index_report['float32_bytes'] / 1e6:.2f} MB), "
+                        f"recall@{self.index_report['top_k']} "
+                        f"{self.index_report['quantized_recall_at_top_k']:.3f} -> "
+                        f"{self.index_report['rescored_recall_at_top_k']:.3f} with rescoring"
+                    )
+            
+            # The float matrix is already on disk: move it into place and re-map it
+            embeddings.flush()
+            embeddings = None
+            os.replace(building_file, os.path.join(store_dir, EMBEDDINGS_FILE))
+            state.float_vectors = np.load(os.path.join(store_dir, EMBEDDINGS_FILE), mmap_mode='r')
+            
+            # Store chunks; a full build numbers chunks 0..n-1
+            state.chunks = all_chunks
+            state.file_hashes = file_hashes
+            state.set_chunk_ids(np.arange(len(all_chunks), dtype=np.int64))
+            
+            self.build_stats = {
+                'files': len(source_files),
+                'files_chunked': files_chunked,
+                'chunks': len(all_chunks),
+                'duplicates_exact': dedup.exact_removed if dedup else 0,
+                'duplicates_near': dedup.near_removed if dedup else 0,
+                'vectors_encoded': model_stats['vectors'],
+                'vectors_cached': embedder.encoded - model_stats['vectors'],
+                'chunk_seconds': chunk_seconds,
+                'embed_seconds': model_stats['seconds'],
+                'index_seconds': builder.add_seconds,
+                'total_seconds': time.perf_counter() - start_time,
+                'files_per_second': files_chunked / max(chunk_seconds, 1e-9),
+                'chunks_per_second': chunks_created / max(chunk_seconds, 1e-9),
+                'vectors_per_second': model_stats['vectors'] / max(model_stats['seconds'], 1e-9),
+                'index_vectors_per_second': index.ntotal / max(builder.add_seconds, 1e-9),
+            }
+            state.manifest = {
+                'fingerprint': self._fingerprint(index.d),
+                'created_at': datetime.now().isoformat(timespec='seconds'),
+                'build_stats': self.build_stats,
+            }
             
-            # Save vector store
-            self.save_vector_store()
+            # Save the new version, point CURRENT at it and swap it in
+            self._write_store(state)
+            self._switch_to(state)
+            published = True
+            self.index_mismatch = []
+            self._prune_versions()
             
+            if cache is not None:
+                cache_stats = cache.commit(keep_keys=np.concatenate(used_keys) if used_keys else [])
+                self.build_stats.update(cache_hits=cache.hits, cache_misses=cache.misses)
+                logger.info(f"♻️  Embedding cache: {cache.hits} hits, {cache.misses} misses; "
+                            f"{cache_stats['entries']} entries kept, {cache_stats['removed']} removed")
+            
+            stats = self.build_stats
             logger.info("="*80)
             logger.info("✅ VECTOR STORE BUILD COMPLETE")
+            logger.info(f"⏱️ Chunking:  {stats['files_chunked']} files, {chunks_created} chunks in "
+                        f"{stats['chunk_seconds']:.2f}s ({stats['files_per_second']:.1f} files/s, "
+                        f"{stats['chunks_per_second']:.1f} chunks/s)")
+            logger.info(f"⏱️ Embedding: {stats['vectors_encoded']} vectors in {stats['embed_seconds']:.2f}s "
+                        f"({stats['vectors_per_second']:.1f} vectors/s; "
+                        f"{stats['vectors_cached']} more from the embedding cache)")
+            logger.info(f"⏱️ Indexing:  {index.ntotal} vectors in {stats['index_seconds']:.2f}s "
+                        f"({stats['index_vectors_per_second']:.1f} vectors/s)")
+            logger.info(f"⏱️ Total:     {stats['total_seconds']:.2f}s")
             logger.info("="*80)
             return True
             
@@ -350,189 +957,1187 @@ class VectorStoreManager:
             import traceback
             traceback.print_exc()
             return False
+        finally:
+            # Failed build: keep what was encoded, without garbage collection
+            if cache is not None and cache.pending_count:
+                cache.commit()
+            while encode_pools:
+                encode_pools.pop().close()
+            if builders and os.path.exists(spill_file):
+                builders[0].discard()
+            if not published:
+                shutil.rmtree(store_dir, ignore_errors=True)
     
     def save_vector_store(self):
-        """Save FAISS index and metadata to disk"""
+        """Save FAISS index and metadata to disk (live updates are folded in as a new version)"""
         try:
-            try:
-                import faiss
-            except Exception:
-                import faiss_cpu as faiss
-            
-            # Save FAISS index
-            faiss.write_index(self.index, self.vector_store_file)
-            logger.info(f"💾 Saved FAISS index to {self.vector_store_file}")
-            
-            # Save metadata (chunks without embeddings to save space)
-            metadata = {
-                'chunks': self.chunks,
-                'total_vectors': self.index.ntotal
-            }
-            with open(self.metadata_file, 'wb') as f:
-                pickle.dump(metadata, f)
-            logger.info(f"💾 Saved metadata to {self.metadata_file}")
-            
+            state = self._state
+            if state.delta_index is not None or state.index_tombstones or state.mutation_log.records:
+                return self.compact()
+            self._write_store(state)
+            return True
         except Exception as e:
             logger.error(f"❌ Error saving vector store: {e}")
+            return False
+    
+    def _write_store(self, state: _StoreState):
+        """Write a state's index, chunks, ids, BM25, float matrix and manifest into its directory"""
+        path = state.store_dir
+        
+        # Save FAISS index
+        index_file = os.path.join(path, INDEX_FILE)
+        write_index(state.index, index_file + '.tmp')
+        os.replace(index_file + '.tmp', index_file)
+        logger.info(f"💾 Saved FAISS index to {index_file}")
+        
+        # Save chunks in the columnar, memory-mappable format
+        ChunkStore.write(path, state.chunks)
+        np.save(os.path.join(path, CHUNK_IDS_FILE), np.asarray(state.chunk_ids, dtype=np.int64))
+        logger.info(f"💾 Saved {len(state.chunks)} chunks to {path}")
+        if os.path.exists(os.path.join(path, METADATA_FILE)):
+            os.remove(os.path.join(path, METADATA_FILE))
+        
+        if state.bm25_index is not None:
+            state.bm25_index.save(os.path.join(path, BM25_FILE))
+            logger.info(f"💾 Saved BM25 index to {os.path.join(path, BM25_FILE)}")
+        
+        # Save raw vectors (unless they are memory-mapped from that very file) and per-file hashes
+        embeddings_file = os.path.join(path, EMBEDDINGS_FILE)
+        vectors = state.float_vectors
+        if vectors is not None and len(vectors) and not (
+                isinstance(vectors, np.memmap) and os.path.abspath(vectors.filename) == os.path.abspath(embeddings_file)):
+            np.save(embeddings_file + '.tmp.npy', np.asarray(vectors, dtype='float32'))
+            os.replace(embeddings_file + '.tmp.npy', embeddings_file)
+        manifest = {
+            'fingerprint': state.manifest.get('fingerprint'),
+            'created_at': state.manifest.get('created_at'),
+            'stats': {
+                'files': len(state.file_hashes),
+                'chunks': len(state.chunks),
+                'vectors': state.index.ntotal,
+                'dimension': state.index.d,
+            },
+            'build_stats': state.manifest.get('build_stats'),
+            'files': state.file_hashes,
+            'total_vectors': state.index.ntotal,
+            'index': state.index_info,
+            'next_chunk_id': state.next_chunk_id,
+            'log_seq': state.mutation_log.seq,
+        }
+        with open(os.path.join(path, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        logger.info(f"💾 Saved manifest to {os.path.join(path, MANIFEST_FILE)}")
+        
+        # Recall-vs-latency report of the last build (approximate indexes only)
+        if self.index_report:
+            with open(os.path.join(path, INDEX_REPORT_FILE), 'w', encoding='utf-8') as f:
+                json.dump(self.index_report, f, indent=2)
+            logger.info(f"💾 Saved index report to {os.path.join(path, INDEX_REPORT_FILE)}")
+    
+    def load_vector_store(self, version: Optional[str] = None) -> bool:
+        """
+        Load FAISS index and metadata from disk (default: the version CURRENT points at)
+        An index whose manifest names another embedding model or dimension is refused;
+        with on_mismatch='rebuild' any mismatch also starts a background rebuild
+        """
+        state = self._load_state(current_version(self.vector_store_path) if version is None else version)
+        if self.index_mismatch and self.on_mismatch == 'rebuild':
+            self.rebuild_in_background()
+        if state is None:
+            return False
+        with self._mutation_lock:
+            self._publish(state)
+        return True
     
-    def load_vector_store(self):
-        """Load FAISS index and metadata from disk"""
+    def _load_state(self, version: Optional[str]) -> Optional[_StoreState]:
+        """Load one version (None: legacy flat layout) into a new state, without serving it"""
+        state = _StoreState(version_dir(self.vector_store_path, version), version)
+        path = state.store_dir
         try:
-            try:
-                import faiss
-            except Exception:
-                import faiss_cpu as faiss
+            # Load FAISS index (one index, or per-source shards)
+            state.index = read_index(os.path.join(path, INDEX_FILE))
+            logger.info(f"✅ Loaded FAISS index with {state.index.ntotal} vectors"
+                        + (f" in {len(state.index.shards)} shards" if isinstance(state.index, ShardedIndex) else "")
+                        + (f" (version {version})" if version else ""))
+            
+            # Re-apply the search parameters chosen at build time (nprobe / efSearch)
+            manifest = {}
+            if os.path.exists(os.path.join(path, MANIFEST_FILE)):
+                with open(os.path.join(path, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+                state.index_info = manifest.get('index', state.index_info)
+                set_search_params(state.index, state.index_info.get('search_params'))
+            state.file_hashes = manifest.get('files', {})
+            
+            # Vectors from another model are meaningless to this one's queries: refuse them
+            state.manifest = {key: manifest[key] for key in ('fingerprint', 'created_at', 'build_stats')
+                              if manifest.get(key)}
+            incompatible, state.outdated = self._check_fingerprint(state.manifest.get('fingerprint'), state.index)
+            self.index_mismatch = incompatible + state.outdated
+            if incompatible:
+                logger.error(f"❌ Refusing to load index {path}: {'; '.join(incompatible)}. "
+                             f"Rebuild it: python rebuild_index.py")
+                return None
+            if state.outdated:
+                logger.warning(f"⚠️ Index {path} is outdated ({'; '.join(state.outdated)}), "
+                               f"serving it until it is rebuilt")
             
-            # Load FAISS index
-            self.index = faiss.read_index(self.vector_store_file)
-            logger.info(f"✅ Loaded FAISS index with {self.index.ntotal} vectors")
+            # Float matrix for exact distances (quantized rescoring, BM25-only candidates);
+            # memory-mapped so pages are shared across workers and only touched rows are read
+            if os.path.exists(os.path.join(path, EMBEDDINGS_FILE)):
+                state.float_vectors = np.load(os.path.join(path, EMBEDDINGS_FILE), mmap_mode='r')
             
-            # Load metadata
-            with open(self.metadata_file, 'rb') as f:
-                metadata = pickle.load(f)
-            self.chunks = metadata['chunks']
-            logger.info(f"✅ Loaded {len(self.chunks)} chunks metadata")
+            if os.path.exists(os.path.join(path, BM25_FILE)):
+                state.bm25_index = BM25Index.load(os.path.join(path, BM25_FILE))
+            
+            # Load chunks (memory-mapped; dicts are only built for search results)
+            if chunk_store_exists(path):
+                state.chunks = ChunkStore(path)
+            else:
+                state.chunks = self._load_legacy_metadata(os.path.join(path, METADATA_FILE))
+            logger.info(f"✅ Loaded {len(state.chunks)} chunks metadata")
+            
+            state.lexical_features = LexicalFeatures(state.chunks)
+            
+            # Stable ids (stores written before ids existed: id = row) and live updates since the last save
+            chunk_ids_file = os.path.join(path, CHUNK_IDS_FILE)
+            chunk_ids = np.load(chunk_ids_file) if os.path.exists(chunk_ids_file) \
+                else np.arange(len(state.chunks), dtype=np.int64)
+            state.set_chunk_ids(chunk_ids, manifest.get('next_chunk_id', 0))
+            replayed = 0
+            for record, vectors in state.mutation_log.replay(manifest.get('log_seq', 0)):
+                self._apply_update(state, record, vectors)
+                replayed += 1
+            if replayed:
+                logger.info(f"♻️  Replayed {replayed} live updates from {state.mutation_log.log_file}")
             
             # Note: Embedding model will be initialized lazily on first search
             # This avoids blocking app startup with model downloads
             logger.info("⏳ Embedding model will be loaded on first search")
             
-            return True
+            return state
             
         except Exception as e:
             logger.error(f"❌ Error loading vector store: {e}")
+            return None
+    
+    def _fingerprint(self, dimension: int) -> Dict[str, Any]:
+        """What an index's vectors and chunks were produced with (saved in the manifest)"""
+        return {
+            'embedding_model': EMBEDDING_MODEL,
+            'embedding_backend': self.embedding_backend,
+            'dimension': int(dimension),
+            'chunk_size': self.chunk_size,
+            'chunker_version': CHUNKER_VERSION,
+            'dedup': self.dedup,
+            'near_duplicate_threshold': self.near_duplicate_threshold if self.dedup else None,
+        }
+    
+    def _check_fingerprint(self, fingerprint: Optional[Dict[str, Any]], index) -> Tuple[List[str], List[str]]:
+        """
+        Compare a manifest fingerprint with this manager's settings
+        Returns (model / dimension mismatches, chunking settings that differ)
+        """
+        expected = self._fingerprint(index.d)
+        incompatible = []
+        if self.embedding_model is not None:
+            dimension = self.embedding_model.get_sentence_embedding_dimension()
+            if dimension != index.d:
+                incompatible.append(f"index dimension {index.d}, model dimension {dimension}")
+        if not fingerprint:
+            logger.warning("⚠️ Index manifest has no model fingerprint (built by an older version); "
+                           "rebuild to record it")
+            return incompatible, []
+        
+        def differences(keys):
+            return [f"{key} {fingerprint.get(key)!r}, configured {expected[key]!r}"
+                    for key in keys if fingerprint.get(key) != expected[key]]
+        
+        if fingerprint.get('embedding_backend') != expected['embedding_backend']:
+            # Same model weights: ONNX and PyTorch vectors are interchangeable (export_onnx_model.py checks)
+            logger.info(f"ℹ️ Index was embedded with the {fingerprint.get('embedding_backend')} backend, "
+                        f"queries use {expected['embedding_backend']}")
+        return incompatible + differences(_MODEL_FINGERPRINT), differences(_CHUNKING_FINGERPRINT)
+    
+    def rebuild_in_background(self) -> threading.Thread:
+        """Full rebuild with the current settings in a daemon thread; swapped in when complete"""
+        with self._mutation_lock:
+            if self._rebuild_thread is None or not self._rebuild_thread.is_alive():
+                logger.info("🔨 Rebuilding the index in the background")
+                self._rebuild_thread = threading.Thread(target=self.build_vector_store, kwargs={'force_rebuild': True},
+                                                        name="vector-store-rebuild", daemon=True)
+                self._rebuild_thread.start()
+            return self._rebuild_thread
+    
+    def wait_for_rebuild(self, timeout: Optional[float] = None) -> bool:
+        """Block until a background rebuild finishes; True when an index is being served"""
+        if self._rebuild_thread is not None:
+            self._rebuild_thread.join(timeout)
+        return self._state.index is not None
+    
+    @property
+    def index_version(self) -> Optional[str]:
+        """Version being served ('v{n}', None for the legacy flat layout)"""
+        return self._state.version
+    
+    def _publish(self, state: _StoreState):
+        """
+        Serve state from now on (writers call this under the mutation lock). The swap is
+        a plain assignment: searches in flight keep the state they started with and new
+        ones take the new state, nobody waits. The state that drops out of rollback
+        reach is retired, and closed when its last search finishes
+        """
+        current = self._state
+        retired = None
+        if current.index is not None and current.version != state.version:
+            retired, self._previous_state = self._previous_state, current
+        self._state = state
+        if retired is not None and retired.store_dir not in (state.store_dir, current.store_dir):
+            retired.readers.retire(retired.close)
+    
+    @contextmanager
+    def _reading(self) -> Iterator[_StoreState]:
+        """The served state, kept open for the block even if a swap retires it meanwhile"""
+        state = self._state
+        while not state.readers.acquire():  # Retired between the read and acquire: take the new one
+            state = self._state
+        try:
+            yield state
+        finally:
+            state.readers.release()
+    
+    def _switch_to(self, state: _StoreState):
+        """Point CURRENT at a state's version and serve it"""
+        with self._mutation_lock:
+            set_current(self.vector_store_path, state.version)
+            if self.version_watcher is not None:
+                self.version_watcher.version = state.version
+            self._publish(state)
+    
+    def _prune_versions(self):
+        """Drop old version directories, keeping the served and the rollback version"""
+        protect = tuple(s.version for s in (self._state, self._previous_state) if s is not None and s.version)
+        removed = prune_versions(self.vector_store_path, self.keep_versions, protect)
+        if removed:
+            logger.info(f"🧹 Removed old index versions: {', '.join(removed)}")
+    
+    def reload(self, version: Optional[str] = None) -> bool:
+        """
+        Load an index version (default: the one CURRENT points at) next to the served one
+        and swap it in; searches keep running on the old version meanwhile. Naming a
+        version also moves CURRENT to it
+        """
+        target = current_version(self.vector_store_path) if version is None else version
+        state = self._load_state(target)
+        if state is None:
             return False
+        if version is None:
+            with self._mutation_lock:
+                self._publish(state)
+        else:
+            self._switch_to(state)
+        logger.info(f"🔁 Serving index version {target or 'legacy'} ({len(state.chunks)} chunks)")
+        return True
+    
+    def reload_in_background(self, version: Optional[str] = None) -> threading.Thread:
+        """reload() in a daemon thread"""
+        thread = threading.Thread(target=self.reload, args=(version,), name="vector-store-reload", daemon=True)
+        thread.start()
+        return thread
+    
+    def rollback(self) -> bool:
+        """
+        Serve the previous version again and point CURRENT back at it; instant when it
+        is still in memory, else it is loaded from the newest older version on disk
+        """
+        with self._mutation_lock:
+            target = self._previous_state
+            if target is None or (target.version and not os.path.isdir(target.store_dir)):
+                if self._state.version is None:
+                    logger.warning("⚠️ No older index version to roll back to")
+                    return False
+                older = previous_version(self.vector_store_path, self._state.version)
+                if older is None and not os.path.exists(os.path.join(self.vector_store_path, INDEX_FILE)):
+                    logger.warning("⚠️ No older index version to roll back to")
+                    return False
+                target = self._load_state(older)
+                if target is None:
+                    return False
+            rolled_back_from = self._state.version
+            self._switch_to(target)
+        logger.info(f"⏪ Rolled back from index version {rolled_back_from} to {target.version or 'legacy'}")
+        return True
+    
+    def start_version_watcher(self, interval: float = 5.0) -> CurrentPointerWatcher:
+        """Hot-swap to new index versions written by other processes (e.g. rebuild_index.py)"""
+        if self.version_watcher is None:
+            self.version_watcher = CurrentPointerWatcher(self.vector_store_path, lambda _: self.reload(), interval)
+            self.version_watcher.version = self._state.version
+            self.version_watcher.start()
+        return self.version_watcher
+    
+    def stop_version_watcher(self):
+        if self.version_watcher is not None:
+            self.version_watcher.stop()
+            self.version_watcher = None
+    
+    def _apply_update(self, state: _StoreState, record: Dict[str, Any], vectors: Optional[np.ndarray]):
+        """
+        Apply one update record (added chunks + vectors, removed ids) to a state
+        that is not served yet; every structure the served state shares is
+        replaced by an extended copy, never changed in place
+        """
+        faiss = _import_faiss()
+        chunks = record.get('chunks', [])
+        add_ids = np.asarray(record.get('ids', []), dtype=np.int64)
+        remove_ids = np.asarray(record.get('remove', []), dtype=np.int64)
+        remove_positions = state.positions_of(remove_ids)
+        remove_ids = remove_ids[remove_positions >= 0]
+        remove_positions = remove_positions[remove_positions >= 0]
+        start = len(state.chunks)
+        
+        if chunks:
+            vectors = np.ascontiguousarray(vectors, dtype='float32')
+            rows = state.chunks if isinstance(state.chunks, GrowingChunks) else GrowingChunks(state.chunks)
+            state.chunks = rows.append(chunks)
+            if state.float_vectors is not None:
+                matrix = state.float_vectors
+                if not isinstance(matrix, GrowingMatrix):
+                    matrix = GrowingMatrix(matrix)
+                state.float_vectors = matrix.append(vectors)
+            state.lexical_features = state.lexical_features.append(chunks)
+        if state.bm25_index is not None and (chunks or len(remove_positions)):
+            state.bm25_index = state.bm25_index.update([chunk['text'] for chunk in chunks], remove_positions)
+        
+        state.chunk_ids = np.concatenate((state.chunk_ids, add_ids))
+        next_chunk_id = max(state.next_chunk_id, int(add_ids.max()) + 1 if len(add_ids) else 0)
+        id_positions = np.full(next_chunk_id, -1, dtype=np.int64)
+        id_positions[:len(state.id_positions)] = state.id_positions
+        id_positions[add_ids] = start + np.arange(len(add_ids))
+        id_positions[remove_ids] = -1
+        state.id_positions = id_positions
+        state.next_chunk_id = next_chunk_id
+        
+        # Copy-on-write delta index: the served state keeps its own until the swap
+        delta = state.delta_index
+        removed_from_delta = 0
+        if len(add_ids) or (delta is not None and len(remove_ids)):
+            delta = faiss.clone_index(delta) if delta is not None else faiss.IndexIDMap2(faiss.IndexFlatL2(state.index.d))
+            if len(remove_ids) and delta.ntotal:
+                removed_from_delta = delta.remove_ids(remove_ids)
+            if len(add_ids):
+                delta.add_with_ids(vectors, add_ids)
+        state.delta_index = delta
+        state.index_tombstones += len(remove_ids) - removed_from_delta
+        
+        if record.get('file') is not None:
+            state.file_hashes = dict(state.file_hashes)
+            if record.get('file_entry') is None:
+                state.file_hashes.pop(record['file'], None)
+            else:
+                state.file_hashes[record['file']] = record['file_entry']
+    
+    def _update(self, chunks: List[Dict[str, Any]] = (), vectors: Optional[np.ndarray] = None,
+                remove_ids: np.ndarray = (), file: Optional[str] = None,
+                file_entry: Optional[Dict[str, Any]] = None) -> np.ndarray:
+        """Log an update durably, apply it to a copy of the state and swap that in; returns the new ids"""
+        with self._mutation_lock:
+            if self.index is None:
+                raise RuntimeError("Vector store not loaded")
+            chunks = list(chunks)
+            if chunks and vectors is None:
+                vectors = self._embed_texts([chunk['text'] for chunk in chunks])
+            state = self._state.copy()
+            ids = np.arange(state.next_chunk_id, state.next_chunk_id + len(chunks), dtype=np.int64)
+            record = {
+                'op': 'update',
+                'ids': ids.tolist(),
+                'chunks': chunks,
+                'remove': [int(i) for i in remove_ids],
+                'file': file,
+                'file_entry': file_entry,
+            }
+            state.mutation_log.append(record, vectors if chunks else None)
+            self._apply_update(state, record, vectors)
+            self._publish(state)
+            
+            # Stores without embeddings.npy (legacy layout) cannot compact: the log grows until a rebuild
+            if state.float_vectors is None:
+                if state.mutation_log.records % self.compact_every == 0:
+                    logger.warning(f"⚠️ {state.mutation_log.records} live updates logged but this store has no "
+                                   f"{EMBEDDINGS_FILE} to compact them - rebuild it: python rebuild_index.py")
+            elif state.mutation_log.records >= self.compact_every:
+                self.compact()
+            return ids
+    
+    def add_chunks(self, chunks: List[Dict[str, Any]], vectors: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Add chunks to the loaded store without a rebuild (searchable on return)
+        vectors default to embedding the chunk texts; returns the new chunk ids
+        """
+        ids = self._update(chunks, vectors)
+        logger.info(f"➕ Added {len(ids)} chunks live")
+        return ids
+    
+    def remove_chunks(self, ids: Iterable[int]) -> int:
+        """Remove chunks by id without a rebuild; returns how many were still present"""
+        ids = np.asarray(list(ids), dtype=np.int64)
+        with self._mutation_lock:
+            present = ids[self._state.positions_of(ids) >= 0]
+            if len(present):
+                self._update(remove_ids=present)
+        logger.info(f"➖ Removed {len(present)} chunks live")
+        return len(present)
+    
+    def _manifest_name(self, filepath: str) -> str:
+        """Manifest key of a source file (see _source_files)"""
+        return filepath if filepath in self.json_sources else os.path.basename(filepath)
+    
+    def replace_file(self, filepath: str) -> Dict[str, int]:
+        """
+        Re-index one source file live: its chunks are replaced by the file's current
+        chunks (deleted file: removed). Texts already in the embedding cache are not
+        re-encoded; chunks other files were folded into keep serving those files
+        """
+        with self._mutation_lock:
+            state = self._state
+            if state.index is None:
+                raise RuntimeError("Vector store not loaded")
+            name = self._manifest_name(filepath)
+            source = source_name(filepath)
+            exists = os.path.exists(filepath)
+            file_hash = self._hash_file(filepath) if exists else None
+            if exists and state.file_hashes.get(name, {}).get('sha256') == file_hash:
+                return {'added': 0, 'removed': 0, 'kept': 0}
+            
+            positions = state.lexical_features.source_chunks(source)
+            positions = positions[state.id_positions[state.chunk_ids[positions]] == positions]
+            removed = [dict(state.chunks[int(pos)]) for pos in positions]
+            positions = np.array([pos for pos, chunk in zip(positions, removed)
+                                  if chunk.get('source_file') == source], dtype=np.int64)
+            removed = [chunk for chunk in removed if chunk.get('source_file') == source]
+            
+            added = chunk_file(filepath, self.chunk_size) if exists else []
+            if self.dedup:
+                dedup = ChunkDeduplicator(self.near_duplicate_threshold)
+                added = [chunk for chunk in added if dedup.add(chunk)]
+            kept = reassign_sources(removed, added, source)
+            
+            # Kept chunks (only other files' references left) reuse their vectors
+            vectors = self._embed_texts([chunk['text'] for chunk in added])
+            if kept:
+                kept_positions = positions[[pos for pos, _ in kept]]
+                if state.float_vectors is not None:
+                    kept_vectors = np.asarray(state.float_vectors[kept_positions], dtype='float32')
+                else:
+                    kept_vectors = self._embed_texts([chunk['text'] for _, chunk in kept])
+                vectors = np.concatenate((vectors, kept_vectors)) if len(vectors) else kept_vectors
+            
+            file_entry = {'sha256': file_hash, 'chunks': len(added)} if exists else None
+            self._update(added + [chunk for _, chunk in kept], vectors if len(vectors) else None,
+                         remove_ids=state.chunk_ids[positions], file=name, file_entry=file_entry)
+        
+        logger.info(f"🔄 Re-indexed {name}: {len(added)} chunks added, {len(positions)} removed"
+                    + (f", {len(kept)} kept for other files" if kept else ""))
+        return {'added': len(added), 'removed': len(positions), 'kept': len(kept)}
+    
+    def remove_file(self, filepath: str) -> Dict[str, int]:
+        """Remove a deleted source file's chunks live (see replace_file)"""
+        if os.path.exists(filepath):
+            logger.warning(f"⚠️ {filepath} still exists, re-indexing it instead")
+        return self.replace_file(filepath)
+    
+    def _embed_texts(self, texts: List[str]) -> np.ndarray:
+        """
+        Chunk vectors for live updates, through the chunk embedding cache when enabled
+        New vectors are committed in batches (see _commit_live_cache), not per update
+        """
+        if not texts:
+            return np.zeros((0, self.index.d), dtype='float32')
+        cache = None
+        if self.use_embedding_cache:
+            if self._live_cache is None:
+                self._live_cache = ChunkEmbeddingCache(self.embedding_cache_dir, self._embedding_cache_model())
+            cache = self._live_cache
+            keys = cache.keys_for(texts)
+            vectors, found = cache.get(keys)
+            missing = np.flatnonzero(~found)
+            if not len(missing):
+                return vectors
+        else:
+            missing = np.arange(len(texts))
+        
+        if not self._ensure_embedding_model():
+            raise RuntimeError("Cannot embed chunks without embedding model")
+        encoded = np.asarray(self.embedding_model.encode(
+            [texts[i] for i in missing], batch_size=_ENCODE_BATCH_SIZE, show_progress_bar=False
+        ), dtype='float32')
+        if cache is None:
+            return encoded
+        cache.put(keys[missing], encoded)
+        if cache.pending_count >= _LIVE_CACHE_COMMIT_EVERY:
+            self._commit_live_cache()
+        if vectors.shape[1] != encoded.shape[1]:
+            vectors = np.zeros((len(texts), encoded.shape[1]), dtype='float32')
+        vectors[missing] = encoded
+        return vectors
+    
+    def _commit_live_cache(self):
+        """Merge the vectors live updates encoded into the on-disk embedding cache"""
+        if self._live_cache is not None and self._live_cache.pending_count:
+            try:
+                stats = self._live_cache.commit()
+                logger.info(f"♻️  Embedding cache: {stats['added']} live-update vectors committed")
+            except Exception as e:
+                logger.warning(f"⚠️ Could not commit live-update vectors to the embedding cache ({e})")
+    
+    def compact(self) -> bool:
+        """
+        Fold live updates into a new index version written from the live rows
+        (removed chunks dropped) and swap it in; the old version keeps its mutation
+        log, so rolling back to it restores the updates as they were
+        """
+        faiss = _import_faiss()
+        with self._mutation_lock:
+            state = self._state
+            if state.index is None or state.float_vectors is None:
+                logger.warning("⚠️ Compaction needs a loaded store with embeddings.npy - rebuild instead")
+                return False
+            version = next_version(self.vector_store_path)
+            new_state = _StoreState(version_dir(self.vector_store_path, version), version)
+            try:
+                start = time.perf_counter()
+                live = state.live_positions()
+                live_ids = state.chunk_ids[live]
+                
+                index, index_info = state.index, state.index_info
+                if isinstance(index, ShardedIndex):
+                    index, index_info = self._compact_shards(state, live)
+                else:
+                    if not hasattr(index, 'id_map'):  # Saved before chunk ids existed: id = row
+                        index = add_id_map(index, state.float_vectors[np.arange(index.ntotal)])
+                    if supports_removal(index):
+                        if index is state.index:
+                            index = faiss.clone_index(index)
+                        index.remove_ids(np.flatnonzero(state.id_positions < 0).astype(np.int64))
+                        delta = state.delta_index
+                        if delta is not None and delta.ntotal:
+                            delta_ids = faiss.vector_to_array(delta.id_map).astype(np.int64)
+                            delta_ids = delta_ids[state.positions_of(delta_ids) >= 0]
+                            index.add_with_ids(np.asarray(state.float_vectors[state.positions_of(delta_ids)],
+                                                          dtype='float32'), delta_ids)
+                    else:
+                        # HNSW graphs cannot drop vectors: rebuild from the live rows
+                        index, _ = build_index(state.float_vectors[live], index_info['type'],
+                                               index_info.get('params'), index_info.get('quantization'),
+                                               ids=live_ids)
+                        set_search_params(index, index_info.get('search_params'))
+                
+                os.makedirs(new_state.store_dir, exist_ok=True)
+                new_state.index = index
+                new_state.index_info = index_info
+                new_state.file_hashes = state.file_hashes
+                new_state.manifest = state.manifest
+                new_state.chunks = [state.chunks[int(pos)] for pos in live]
+                new_state.float_vectors = np.asarray(state.float_vectors[live], dtype='float32')
+                if state.bm25_index is not None:
+                    new_state.bm25_index = BM25Index.build(chunk['text'] for chunk in new_state.chunks)
+                new_state.set_chunk_ids(live_ids, state.next_chunk_id)
+                self._write_store(new_state)
+                old_report = os.path.join(state.store_dir, INDEX_REPORT_FILE)
+                if os.path.exists(old_report) and not os.path.exists(os.path.join(new_state.store_dir, INDEX_REPORT_FILE)):
+                    shutil.copy(old_report, os.path.join(new_state.store_dir, INDEX_REPORT_FILE))
+                
+                # Serve the version as saved: memory-mapped rows, positions renumbered
+                new_state = self._load_state(version)
+                if new_state is None:
+                    raise RuntimeError(f"could not load compacted version {version}")
+                self._switch_to(new_state)
+                self._prune_versions()
+                self._commit_live_cache()
+                logger.info(f"🗜️ Compacted vector store into version {version} ({len(live)} chunks) "
+                            f"in {time.perf_counter() - start:.2f}s")
+                return True
+            except Exception as e:
+                shutil.rmtree(new_state.store_dir, ignore_errors=True)
+                logger.warning(f"⚠️ Compaction failed ({e}), keeping the mutation log")
+                return False
+    
+    def _compact_shards(self, state: _StoreState, live: np.ndarray) -> Tuple[ShardedIndex, Dict[str, Any]]:
+        """
+        Rebuild only the shards of sources that gained or lost chunks through live
+        updates (a fees edit rebuilds the fees shard); other shards are reused as they are
+        """
+        faiss = _import_faiss()
+        index, index_info, features = state.index, state.index_info, state.lexical_features
+        changed = np.setdiff1d(np.arange(len(state.chunks)), live)
+        if state.delta_index is not None and state.delta_index.ntotal:
+            delta_positions = state.positions_of(faiss.vector_to_array(state.delta_index.id_map).astype(np.int64))
+            changed = np.concatenate((changed, delta_positions[delta_positions >= 0]))
+        changed_sources = {features.source_names[source_id] for source_id in np.unique(features.source_ids[changed])}
+        
+        groups = _source_groups(features, live)
+        shards, descriptions = {}, dict(index_info.get('shards', {}))
+        for name in sorted(changed_sources):
+            positions = groups.get(name)
+            if positions is None:
+                shards[name] = None
+                descriptions.pop(name, None)
+                continue
+            shards[name], description = build_shard(
+                state.float_vectors[positions], state.chunk_ids[positions], index_info.get('shard_index_type', 'auto'),
+                index_info.get('shard_params'), index_info.get('quantization')
+            )
+            set_search_params(shards[name], index_info.get('search_params'))
+            descriptions[name] = {'type': description['type'], 'vectors': description['vectors']}
+        logger.info(f"🧩 Rebuilt {len(changed_sources)} of {len(descriptions)} index shards")
+        return index.replace_shards(shards), dict(index_info, shards=descriptions)
+    
+    def start_watcher(self, interval: float = 2.0) -> Optional[DataDirWatcher]:
+        """
+        Re-index data_dir files live when they are edited, added or deleted
+        Only one process per store watches (the mutation log has a single writer): with
+        several server workers the first to start takes the watcher.lock file and the
+        others return None; they serve the changes once a compaction publishes them
+        as a new version (see start_version_watcher)
+        """
+        if self.watcher is None:
+            lock = ProcessRoleLock(os.path.join(self.vector_store_path, WATCHER_LOCK_FILE))
+            if not lock.acquire():
+                logger.info("👀 Another process watches the data directory; serving its changes "
+                            "once they are compacted into a new index version")
+                return None
+            self._watcher_lock = lock
+            self.watcher = DataDirWatcher(self.data_dir, self.replace_file, self.remove_file, interval)
+            self.watcher.start()
+        return self.watcher
+    
+    def stop_watcher(self):
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+        if self._watcher_lock is not None:
+            self._watcher_lock.release()
+            self._watcher_lock = None
+    
+    def _load_legacy_metadata(self, metadata_file: str) -> List[Dict[str, Any]]:
+        """Read chunks from a metadata.pkl written before the columnar chunk store"""
+        logger.warning("⚠️ Loading legacy metadata.pkl - rebuild the index to switch to the chunk store")
+        with open(metadata_file, 'rb') as f:
+            metadata = _LegacyMetadataUnpickler(f).load()
+        return metadata['chunks']
+    
+    def _embedding_cache_model(self) -> str:
+        """
+        Chunk cache key of the backend actually loaded (initialize_embedding_model records
+        it after any fallback): an onnx configuration that fell
+        back to sentence_transformers must not read or write the onnx vectors
+        """
+        if not self._ensure_embedding_model():
+            raise RuntimeError("Cannot embed chunks without embedding model")
+        return f"{EMBEDDING_MODEL}/{self.embedding_backend}"
+    
+    def _ensure_embedding_model(self) -> bool:
+        """Initialize embedding model on first use (lazy loading), at most once across threads"""
+        if self.embedding_model is not None:
+            return True
+        with self._model_lock:
+            if self.embedding_model is None:
+                logger.info("🔄 Initializing embedding model...")
+                if not self.initialize_embedding_model():
+                    logger.error("❌ Failed to initialize embedding model")
+                    return False
+        return True
+    
+    def start_warmup(self, warmup_queries: Tuple[str, ...] = _WARMUP_QUERIES) -> threading.Thread:
+        """
+        Load the embedding model in a background thread and run a few warm queries
+        Searches arriving meanwhile wait for the same load instead of starting another;
+        is_ready turns True when warmup finishes (successfully or not)
+        """
+        if self._warmup_thread is not None:
+            return self._warmup_thread
+        
+        def warmup():
+            try:
+                start = time.perf_counter()
+                if not self._ensure_embedding_model():
+                    self.warmup_error = "embedding model failed to load"
+                    return
+                if self.index is not None:
+                    self.search_batch(list(warmup_queries))
+                    for query in warmup_queries[:1]:
+                        self.search(query)
+                logger.info(f"🔥 Vector store warm in {time.perf_counter() - start:.1f}s")
+            except Exception as e:
+                self.warmup_error = str(e)
+                logger.error(f"❌ Warmup failed: {e}")
+            finally:
+                self._ready.set()
+        
+        self._warmup_thread = threading.Thread(target=warmup, name="vector-store-warmup", daemon=True)
+        self._warmup_thread.start()
+        return self._warmup_thread
+    
+    @property
+    def is_ready(self) -> bool:
+        """True once the embedding model is loaded (or warmup has finished)"""
+        return self.embedding_model is not None or self._ready.is_set()
+    
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        """Block until warmup finishes; returns immediately when no warmup was started"""
+        if self._warmup_thread is None:
+            return True
+        return self._ready.wait(timeout)
     
-    def search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+    def search(self, query: str, top_k: int = 5, debug: bool = False,
+               filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """
         Search vector store for relevant chunks
         Uses hybrid approach: FAISS vector search + keyword boosting + source file boosting
+        With confident source hints only the hinted sources' shards are searched
+        filters (source_file / header / metadata, see chunk_filters) limit the search to
+        matching chunks, e.g. {'source_file': ['hostels', 'fees']}
+        The candidate pool starts small and is widened only where re-ranking could change
+        the results (see _search_adaptive, pool_stats)
+        Results are in final rank order; with BM25 that is the fused rank, so
+        similarity_score is not necessarily descending (compare with max())
+        Set debug=True to get per-result score components
         """
-        if self.index is None:
+        if self._state.index is None:
             logger.warning("⚠️ Vector store not loaded")
             return []
         
-        # Initialize embedding model on first search (lazy loading)
-        if self.embedding_model is None:
-            logger.info("🔄 Initializing embedding model for first search...")
-            if not self.initialize_embedding_model():
-                logger.error("❌ Failed to initialize embedding model")
+        if not self._ensure_embedding_model():
+            return []
+        
+        # One version for the whole query, even if a swap happens meanwhile
+        with self._reading() as state:
+            try:
+                # Chunks the filters allow (None: all)
+                allowed = self._filter_rows(state, filters) if filters else None
+                if allowed is not None and not len(allowed):
+                    return []
+                
+                # Encode query (served from the embedding cache when seen recently)
+                query_embedding = self._encode_queries([query])
+                
+                # Search FAISS index - retrieve more candidates than results for re-ranking
+                source_hints = self.source_hint_matcher.match(*_query_keywords(query))
+                shards = self._route_shards(state, source_hints, top_k) if allowed is None else None
+                return self._search_adaptive(state, [query], query_embedding, [source_hints], top_k,
+                                             shards=shards, allowed=allowed, debug=debug)[0]
+                
+            except Exception as e:
+                logger.error(f"❌ Error searching vector store: {e}")
                 return []
+    
+    def search_batch(
+        self,
+        queries: List[str],
+        top_k: int = 5,
+        batch_size: int = 64,
+        debug: bool = False,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Search vector store for many queries at once
+        Encodes all queries in one call and runs one FAISS search per group of queries
+        routed to the same shards, then re-ranks per query (queries that widen their
+        candidate pool are searched again together). Returns one result list per query,
+        in order; filters apply to every query (see search)
+        """
+        if not queries:
+            return []
         
-        try:
-            # Encode query
-            query_embedding = self.embedding_model.encode([query])
-            
-            # Search FAISS index - retrieve many more candidates for re-ranking
-            search_k = min(top_k * 8, self.index.ntotal)
-            distances, indices = self.index.search(query_embedding.astype('float32'), search_k)
-            
-            # Extract query keywords for boosting
-            query_lower = query.lower()
-            query_words = set(query_lower.replace('?', ' ').replace('!', ' ').replace(',', ' ').split())
-            # Remove stop words
-            stop_words = {'what', 'is', 'the', 'for', 'a', 'an', 'of', 'in', 'to', 'and',
-                         'how', 'where', 'when', 'which', 'who', 'can', 'do', 'does', 'are',
-                         'was', 'were', 'be', 'been', 'about', 'with', 'from', 'at', 'by',
-                         'this', 'that', 'i', 'me', 'my', 'tell', 'give', 'show', 'please',
-                         'want', 'know', 'need', 'like', 'get', 'will', 'would', 'could',
-                         'should', 'have', 'has', 'had', 'there', 'their', 'they', 'its'}
-            keywords = query_words - stop_words
-            
-            # Special handling: if query asks for website + something, boost websites source heavily
-            asks_for_website = any(w in query_lower for w in ['website', 'url', 'portal', 'link', 'online', 'booking'])
-            
-            # Map query to likely source files for source boosting
-            source_hints = []
-            source_map = {
-                'hostel': ['hostels'], 'room': ['hostels'], 'warden': ['hostels'], 'fresher': ['hostels'],
-                'fee': ['fees', 'hostels', 'scholarships'], 'fees': ['fees', 'hostels'],
-                'cost': ['fees', 'hostels'], 'tuition': ['fees'], 'tariff': ['hostels'],
-                'admission': ['admissions', 'websites'], 'apply': ['admissions', 'websites'], 'eligib': ['admissions'],
-                'entrance': ['admissions'], 'enroll': ['admissions', 'websites'],
-                'placement': ['placements'], 'recruit': ['placements'], 'package': ['placements'],
-                'company': ['placements'], 'salary': ['placements'], 'lpa': ['placements'],
-                'bus': ['transport'], 'transport': ['transport'], 'route': ['transport'],
-                'fare': ['transport'], 'ticket': ['transport'],
-                'mess': ['mess', 'hostels'], 'food': ['mess'], 'canteen': ['mess'],
-                'breakfast': ['mess'], 'lunch': ['mess'], 'dinner': ['mess'],
-                'scholarship': ['scholarships'], 'waiver': ['scholarships'],
-                'loan': ['scholarships'], 'jee': ['scholarships'],
-                'website': ['websites'], 'url': ['websites'], 'portal': ['websites'],
-                'login': ['websites'], 'link': ['websites'], 'online': ['websites'],
-                'booking': ['websites', 'hostels'], 'apply': ['websites', 'admissions'],
-                'contact': ['contact'], 'phone': ['contact'], 'email': ['contact'],
-                'number': ['contact'], 'helpline': ['contact'], 'toll': ['contact'],
-                'address': ['contact'], 'location': ['contact'], 'reach': ['contact'],
-                'department': ['departments'], 'faculty': ['departments'], 'hod': ['departments'],
-                'facility': ['facilities'], 'library': ['facilities'], 'lab': ['facilities'],
-                'sports': ['facilities'], 'gym': ['facilities'], 'medical': ['facilities'],
-                'wifi': ['facilities'], 'swimming': ['facilities'], 'canteen': ['facilities'],
-                'research': ['research'], 'patent': ['research'], 'innovation': ['research'],
-                'incubat': ['research'], 'startup': ['research'], 'journal': ['research'],
-                'program': ['programs'], 'course': ['programs'], 'degree': ['programs'], 'offer': ['programs'],
-                'btech': ['programs', 'fees'], 'mtech': ['programs', 'fees'],
-                'mba': ['programs', 'fees'], 'mca': ['programs', 'fees'],
-                'phd': ['programs', 'research', 'fees'], 'msc': ['programs', 'fees'],
-                'engineering': ['programs', 'departments'], 'management': ['programs'],
-                'club': ['student_life'], 'event': ['student_life'], 'fest': ['student_life'],
-                'ncc': ['student_life'], 'nss': ['student_life'], 'activity': ['student_life'],
-                'block': ['academic_blocks'], 'building': ['academic_blocks'],
-                'classroom': ['academic_blocks'], 'campus': ['academic_blocks'],
-                'naac': ['programs'], 'nba': ['programs'], 'accredit': ['programs'],
-            }
-            for word in keywords:
-                for key, sources in source_map.items():
-                    if key in word:
-                        source_hints.extend(sources)
-            source_hints = list(set(source_hints))
-            
-            # If query asks for website and no specific source hints yet, prioritize websites
-            if asks_for_website and 'websites' not in source_hints:
-                source_hints = ['websites'] + source_hints
-            
-            # Score and rank candidates
+        if self._state.index is None:
+            logger.warning("⚠️ Vector store not loaded")
+            return [[] for _ in queries]
+        
+        if not self._ensure_embedding_model():
+            return [[] for _ in queries]
+        
+        with self._reading() as state:
+            try:
+                allowed = self._filter_rows(state, filters) if filters else None
+                if allowed is not None and not len(allowed):
+                    return [[] for _ in queries]
+                
+                query_embeddings = self._encode_queries(list(queries), batch_size=batch_size)
+                
+                hints = [self.source_hint_matcher.match(*_query_keywords(query)) for query in queries]
+                routes = {}
+                for row, source_hints in enumerate(hints):
+                    shards = self._route_shards(state, source_hints, top_k) if allowed is None else None
+                    routes.setdefault(shards, []).append(row)
+                
+                results = [None] * len(queries)
+                for shards, rows in routes.items():
+                    found = self._search_adaptive(state, [queries[row] for row in rows], query_embeddings[rows],
+                                                  [hints[row] for row in rows], top_k,
+                                                  shards=shards, allowed=allowed, debug=debug)
+                    for row, result in zip(rows, found):
+                        results[row] = result
+                return results
+                
+            except Exception as e:
+                logger.error(f"❌ Error batch searching vector store: {e}")
+                return [[] for _ in queries]
+    
+    def search_lexical(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        """
+        Exact-term lookup through the BM25 index only (no embedding, no vector search)
+        Results carry 'bm25_score'; returns [] when the store has no BM25 index
+        """
+        if self._state.bm25_index is None:
+            logger.warning("⚠️ BM25 index not loaded")
+            return []
+        
+        with self._reading() as state:
+            if state.bm25_index is None:
+                return []
+            _, keywords = _query_keywords(query)
+            doc_ids, scores = state.bm25_index.search(tokenize(' '.join(keywords)), top_k)
             results = []
-            for idx, distance in zip(indices[0], distances[0]):
-                if idx < len(self.chunks):
-                    chunk = self.chunks[idx].copy()
-                    # Convert L2 distance to cosine similarity
-                    cosine_sim = float(max(0.0, 1.0 - distance / 2.0))
-                    
-                    # Keyword boost: add up to 0.20 for keyword matches
-                    chunk_text_lower = chunk.get('text', '').lower()
-                    keyword_matches = sum(1 for kw in keywords if kw in chunk_text_lower)
-                    keyword_boost = min(0.20, keyword_matches * 0.04)
-                    
-                    # Source file boost: strong boost if chunk comes from expected source
-                    source_file = chunk.get('source_file', '').lower()
-                    source_match = any(s in source_file for s in source_hints)
-                    source_boost = 0.25 if source_match else -0.05  # Penalize non-matching sources
-                    
-                    # Header match bonus: if chunk header contains query keywords
-                    chunk_header = chunk.get('header', '').lower()
-                    chunk_sub_header = chunk.get('sub_header', '').lower()
-                    header_keywords = sum(1 for kw in keywords if kw in chunk_header or kw in chunk_sub_header)
-                    header_boost = min(0.15, header_keywords * 0.05)
-                    
-                    # Combined score
-                    final_score = max(0.0, cosine_sim + keyword_boost + source_boost + header_boost)
-                    
-                    chunk['similarity_score'] = final_score
-                    chunk['cosine_score'] = cosine_sim
-                    chunk['keyword_boost'] = keyword_boost
-                    chunk['source_boost'] = source_boost
-                    chunk['header_boost'] = header_boost
-                    chunk['l2_distance'] = float(distance)
-                    results.append(chunk)
-            
-            # Sort by final score descending and return top_k
-            results.sort(key=lambda x: x['similarity_score'], reverse=True)
-            return results[:top_k]
-            
-        except Exception as e:
-            logger.error(f"❌ Error searching vector store: {e}")
+            for doc_id, score in zip(doc_ids, scores):
+                chunk = dict(state.chunks[int(doc_id)])
+                chunk['bm25_score'] = float(score)
+                results.append(chunk)
+            return results
+    
+    def _route_shards(self, state: _StoreState, source_hints: List[str], top_k: int) -> Optional[Tuple[str, ...]]:
+        """
+        Shards worth searching for a query: the hinted sources' shards when the hints are
+        confident (at most max_routed_shards sources, holding enough chunks to fill
+        top_k), else None for all shards. Candidates from other sources would only
+        carry the source penalty, and BM25 hits still come from the whole corpus
+        """
+        index = state.index
+        if not (isinstance(index, ShardedIndex) and source_hints and len(source_hints) <= self.max_routed_shards):
+            return None
+        features = state.lexical_features
+        shards = tuple(name for name, hinted in zip(features.source_names, features.matching_sources(source_hints))
+                       if hinted and name in index.shards)
+        if sum(index.shards[name].ntotal for name in shards) < top_k:
+            return None
+        return shards
+    
+    def _filter_rows(self, state: _StoreState, filters: Dict[str, Any]) -> np.ndarray:
+        """Sorted row positions of the live chunks matching the search filters"""
+        chunk_filter = state.chunk_filter
+        if chunk_filter is None:
+            chunk_filter = ChunkFilterIndex(state.chunks)
+        elif chunk_filter.size < len(state.chunks):  # Rows appended by live updates
+            chunk_filter = chunk_filter.extend(state.chunks)
+        state.chunk_filter = chunk_filter
+        rows = chunk_filter.rows(filters, state.lexical_features)
+        return rows[state.id_positions[state.chunk_ids[rows]] == rows]
+    
+    def _search_rows(self, state: _StoreState, query_embeddings: np.ndarray,
+                     search_k: int, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Nearest of the given live rows only (as _search_index): few rows are scored
+        exactly from the float matrix, more are searched in FAISS with an IDSelector
+        over their chunk ids, so no other vector is scored and nothing is over-fetched
+        """
+        faiss = _import_faiss()
+        query_embeddings = np.ascontiguousarray(query_embeddings, dtype='float32')
+        index, delta = state.index, state.delta_index
+        if query_embeddings.shape[1] != index.d:
+            raise ValueError(f"query dimension {query_embeddings.shape[1]} does not match the index "
+                             f"({index.d}); the index was built with another embedding model")
+        
+        if len(rows) <= _FILTER_SCAN_MAX and state.float_vectors is not None:
+            vectors = np.asarray(state.float_vectors[rows], dtype=np.float32)
+            distances = ((query_embeddings ** 2).sum(axis=1)[:, None] - 2.0 * query_embeddings @ vectors.T
+                         + (vectors ** 2).sum(axis=1)[None, :])
+            order = np.argsort(distances, axis=1, kind='stable')[:, :search_k]
+            return np.take_along_axis(distances, order, axis=1).astype(np.float32), rows[order]
+        
+        ids = np.ascontiguousarray(state.chunk_ids[rows])
+        selector = faiss.IDSelectorBatch(ids)
+        k = max(1, min(search_k, index.ntotal))
+        if isinstance(index, ShardedIndex):
+            features = state.lexical_features
+            names = [features.source_names[source_id] for source_id in np.unique(features.source_ids[rows])]
+            searched = sum(index.shards[name].ntotal for name in names if name in index.shards)
+            if searched == len(rows) and state.index_tombstones == 0 and (delta is None or not delta.ntotal):
+                selector = None  # The rows are exactly these shards
+            distances, found = index.search(query_embeddings, k, names, selector, len(rows) / max(searched, 1))
+        else:
+            params = selector_parameters(index, selector, len(rows) / max(index.ntotal, 1))
+            distances, found = index.search(query_embeddings, k, params=params)
+        if delta is not None and delta.ntotal:
+            delta_distances, delta_ids = delta.search(query_embeddings, min(search_k, delta.ntotal),
+                                                      params=faiss.SearchParameters(sel=faiss.IDSelectorBatch(ids)))
+            distances = np.concatenate((distances, delta_distances), axis=1)
+            found = np.concatenate((found, delta_ids), axis=1)
+        distances, indices = _merge_candidates(distances, state.positions_of(found), search_k)
+        
+        if self.rescore and state.float_vectors is not None and approximate_distances(state.index_info):
+            distances = rescore_exact(state.float_vectors, query_embeddings, distances, indices)
+        return distances, indices
+    
+    def _search_index(self, state: _StoreState, query_embeddings: np.ndarray,
+                      search_k: int, shards: Optional[Tuple[str, ...]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        FAISS search over the main index (all shards, or only the named ones) plus live
+        additions, returning row positions (-1 padded); quantized and IVF-PQ indexes get
+        exact float rescoring of the candidates
+        """
+        query_embeddings = np.ascontiguousarray(query_embeddings, dtype='float32')
+        index, delta, tombstones = state.index, state.delta_index, state.index_tombstones
+        if query_embeddings.shape[1] != index.d:
+            raise ValueError(f"query dimension {query_embeddings.shape[1]} does not match the index "
+                             f"({index.d}); the index was built with another embedding model")
+        
+        # Removed chunks still in the main index are fetched too, then filtered out
+        k = max(1, min(search_k + tombstones, index.ntotal))
+        distances, ids = index.search(query_embeddings, k) if shards is None else index.search(query_embeddings, k, shards)
+        if delta is not None and delta.ntotal:
+            delta_distances, delta_ids = delta.search(query_embeddings, min(search_k, delta.ntotal))
+            distances = np.concatenate((distances, delta_distances), axis=1)
+            ids = np.concatenate((ids, delta_ids), axis=1)
+        indices = state.positions_of(ids)
+        if delta is not None or tombstones:
+            distances, indices = _merge_candidates(distances, indices, search_k)
+        
+        if self.rescore and state.float_vectors is not None and approximate_distances(state.index_info):
+            distances = rescore_exact(state.float_vectors, query_embeddings, distances, indices)
+        return distances, indices
+    
+    def _encode_queries(self, queries: List[str], batch_size: int = 64) -> np.ndarray:
+        """Encode queries, using the query embedding cache and encoding only the misses"""
+        cached = [self.query_cache.get(query) for query in queries]
+        misses = [i for i, vector in enumerate(cached) if vector is None]
+        
+        if misses:
+            encoded = self.embedding_model.encode([queries[i] for i in misses], batch_size=batch_size)
+            for i, vector in zip(misses, encoded):
+                self.query_cache.put(queries[i], vector)
+                cached[i] = vector
+        
+        return np.vstack(cached).astype('float32')
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Query embedding cache counters (hits, misses, evictions, ...)"""
+        return self.query_cache.stats()
+    
+    def pool_stats(self) -> Dict[str, Any]:
+        """Candidate pool counters: searches, widenings and their reasons, final pool sizes"""
+        return self.candidate_pool_stats.stats()
+    
+    def _search_adaptive(
+        self,
+        state: _StoreState,
+        queries: List[str],
+        query_embeddings: np.ndarray,
+        hints: List[List[str]],
+        top_k: int,
+        shards: Optional[Tuple[str, ...]] = None,
+        allowed: Optional[np.ndarray] = None,
+        debug: bool = False
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        FAISS search and re-ranking of queries with an adaptive candidate pool
+        Every query starts with top_k * min_candidate_multiplier candidates; queries
+        whose re-ranked top_k could still change with more candidates (see
+        _widen_reason) are searched again with twice the pool, up to
+        top_k * candidate_multiplier. Searches over the filter's rows when allowed is set
+        """
+        eligible = len(state.chunks) if allowed is None else len(allowed)
+        max_pool = min(top_k * self.candidate_multiplier, eligible)
+        pool = max_pool
+        if self.adaptive_pool:
+            pool = min(max_pool, top_k * max(1, self.min_candidate_multiplier))
+        
+        results = [None] * len(queries)
+        widenings = [0] * len(queries)
+        pending = list(range(len(queries)))
+        while pending:
+            if allowed is None:
+                distances, indices = self._search_index(state, query_embeddings[pending], pool, shards)
+            else:
+                distances, indices = self._search_rows(state, query_embeddings[pending], pool, allowed)
+            widen = []
+            for i, row in enumerate(pending):
+                scored = self._score_candidates(state, queries[row], distances[i], indices[i], top_k,
+                                                query_vector=query_embeddings[row], source_hints=hints[row],
+                                                allowed_rows=allowed)
+                reason = self._widen_reason(state, scored, top_k, pool, allowed) if pool < max_pool else None
+                if reason:
+                    widen.append(row)
+                    widenings[row] += 1
+                    self.candidate_pool_stats.record_widening(reason)
+                    continue
+                results[row] = self._select_results(state, scored, top_k, debug, pool)
+                self.candidate_pool_stats.record_search(pool, widenings[row], capped=pool == max_pool)
+            pending = widen
+            pool = min(max_pool, pool * 2)
+        return results
+    
+    def _widen_reason(self, state: _StoreState, scored: Optional[Dict[str, Any]], top_k: int,
+                      pool: int, allowed: Optional[np.ndarray]) -> Optional[str]:
+        """
+        Why the candidate pool of a query should be widened (None: keep it)
+        'boosts': a chunk outside the pool is no closer than the pool's farthest
+        vector candidate, but with the largest boosts any outside chunk gets it
+        could still beat the hybrid score of a selected result (and so change the
+        results or, with BM25 fusion, their hybrid ranks)
+        'flat': the farthest candidate already scores within flat_score_margin of
+        that score, so the ranking has not tailed off inside the pool (which the
+        bound misses for approximate indexes)
+        """
+        if scored is None or scored['vector_candidates'] < pool:
+            return None  # Every eligible chunk is already a candidate
+        final_scores = scored['final_scores']
+        if len(final_scores) < top_k:
+            return 'flat'
+        kth_score = final_scores[_top_k_positions(scored['ranking'], top_k)].min()
+        
+        vector_distances = scored['l2_distances'][:scored['vector_candidates']]
+        edge = int(np.argmax(vector_distances))
+        edge_cosine = max(0.0, 1.0 - float(vector_distances[edge]) / 2.0)
+        if edge_cosine + self._max_outside_boost(state, scored, allowed) > kth_score:
+            return 'boosts'
+        if final_scores[edge] >= kth_score - self.flat_score_margin:
+            return 'flat'
+        return None
+    
+    def _max_outside_boost(self, state: _StoreState, scored: Dict[str, Any], allowed: Optional[np.ndarray]) -> float:
+        """Largest keyword + source + header boost of any (eligible) chunk that is not a candidate"""
+        features = state.lexical_features
+        keywords, hinted = scored['keywords'], scored['hinted_sources']
+        # Chunks without keyword hits only get the source boost
+        boost = 0.25 if hinted.any() else -0.05
+        hits = [features.keyword_chunks(keyword) for keyword in keywords]
+        hits += [features.header_chunks(keyword) for keyword in keywords]
+        hits = [chunk_ids for chunk_ids in hits if len(chunk_ids)]
+        if hits:
+            others = np.setdiff1d(np.concatenate(hits).astype(np.int64), scored['ids'])
+            if allowed is not None:
+                others = np.intersect1d(others, allowed, assume_unique=True)
+            if len(others):
+                keyword_boost, source_boost, header_boost = _boosts(features, keywords, hinted, others)
+                boost = max(boost, float((keyword_boost + source_boost + header_boost).max()))
+        return boost
+    
+    def _score_candidates(
+        self,
+        state: _StoreState,
+        query: str,
+        distances: np.ndarray,
+        indices: np.ndarray,
+        top_k: int,
+        query_vector: Optional[np.ndarray] = None,
+        source_hints: Optional[List[str]] = None,
+        allowed_rows: Optional[np.ndarray] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Score FAISS candidates of one query with keyword, source and header boosts
+        Boosts are computed as arrays over all candidates (None: no candidates)
+        
+        With a BM25 index, its top hits join the candidate pool and the final order
+        is the reciprocal rank fusion of the hybrid-score ranking and the BM25 ranking;
+        similarity_score stays the hybrid score, so relevance thresholds are unaffected
+        allowed_rows (a filtered search) keeps BM25 hits outside the filter out of the pool
+        """
+        # Extract query keywords for boosting
+        query_lower, keywords = _query_keywords(query)
+        
+        # Map query to likely source files for source boosting
+        if source_hints is None:
+            source_hints = self.source_hint_matcher.match(query_lower, keywords)
+        
+        # Score all candidates at once from the precomputed lexical features
+        valid = (indices >= 0) & (indices < len(state.chunks))
+        ids = indices[valid].astype(np.int64)
+        l2_distances = distances[valid]
+        vector_candidates = len(ids)
+        
+        # Exact-term hits from BM25 that the vector search missed join the pool
+        bm25_ids = None
+        if self.use_bm25 and state.bm25_index is not None and query_vector is not None \
+                and state.float_vectors is not None and len(state.bm25_index) == len(state.chunks):
+            # As many hits as the largest candidate pool, whatever this pool's size
+            bm25_ids, bm25_scores = state.bm25_index.search(tokenize(' '.join(keywords)),
+                                                            top_k * self.candidate_multiplier)
+            if allowed_rows is not None:
+                bm25_ids = bm25_ids[np.isin(bm25_ids, allowed_rows)]
+            missing = bm25_ids[~np.isin(bm25_ids, ids)]
+            if len(missing):
+                missing_rows = np.asarray(state.float_vectors[np.sort(missing)], dtype=np.float32)
+                missing_distances = ((missing_rows - query_vector) ** 2).sum(axis=1)
+                ids = np.concatenate((ids, np.sort(missing)))
+                l2_distances = np.concatenate((l2_distances, missing_distances.astype(l2_distances.dtype)))
+        
+        if not len(ids):
+            return None
+        features = state.lexical_features
+        
+        # Convert L2 distance to cosine similarity
+        cosine_sim = np.maximum(0.0, 1.0 - l2_distances / 2.0).astype(np.float64)
+        
+        # Keyword (up to 0.20), source file (expected source boosted, the rest penalized)
+        # and header (up to 0.15) boosts
+        hinted_sources = features.matching_sources(source_hints)
+        keyword_boost, source_boost, header_boost = _boosts(features, keywords, hinted_sources, ids)
+        
+        # Combined score
+        final_scores = np.maximum(0.0, cosine_sim + keyword_boost + source_boost + header_boost)
+        
+        # Final order: hybrid score, or its reciprocal rank fusion with BM25
+        ranking = final_scores
+        if bm25_ids is not None and len(bm25_ids):
+            hybrid_order = np.lexsort((np.arange(len(ids)), -final_scores))
+            ranking = np.zeros(len(ids), dtype=np.float64)
+            ranking[hybrid_order] = 1.0 / (self.rrf_k + 1 + np.arange(len(ids)))
+            bm25_rank = {int(doc_id): rank for rank, doc_id in enumerate(bm25_ids)}
+            bm25_ranks = np.array([bm25_rank.get(int(i), -1) for i in ids])
+            in_bm25 = bm25_ranks >= 0
+            ranking[in_bm25] += 1.0 / (self.rrf_k + 1 + bm25_ranks[in_bm25])
+        
+        return {
+            'ids': ids,
+            'l2_distances': l2_distances,
+            'vector_candidates': vector_candidates,  # ids[:vector_candidates] came from FAISS
+            'keywords': keywords,
+            'hinted_sources': hinted_sources,
+            'cosine_sim': cosine_sim,
+            'keyword_boost': keyword_boost,
+            'source_boost': source_boost,
+            'header_boost': header_boost,
+            'final_scores': final_scores,
+            'ranking': ranking,
+        }
+    
+    def _select_results(self, state: _StoreState, scored: Optional[Dict[str, Any]], top_k: int,
+                        debug: bool = False, pool: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        The top_k scored candidates as result chunks; with debug=True each result also
+        carries its score components (cosine_score, keyword_boost, ...) and the pool size
+        """
+        if scored is None:
             return []
+        ids, ranking, final_scores = scored['ids'], scored['ranking'], scored['final_scores']
+        selected = _top_k_positions(ranking, top_k)
+        
+        # Only the selected chunks are materialized
+        results = []
+        for pos in selected:
+            chunk = dict(state.chunks[int(ids[pos])])
+            chunk['similarity_score'] = float(final_scores[pos])
+            if debug:
+                chunk['rank_score'] = float(ranking[pos])
+                chunk['cosine_score'] = float(scored['cosine_sim'][pos])
+                chunk['keyword_boost'] = float(scored['keyword_boost'][pos])
+                chunk['source_boost'] = float(scored['source_boost'][pos])
+                chunk['header_boost'] = float(scored['header_boost'][pos])
+                chunk['l2_distance'] = float(scored['l2_distances'][pos])
+                if pool is not None:
+                    chunk['candidate_pool'] = pool
+            results.append(chunk)
+        return results
 
 
 # Global instance
@@ -544,6 +2149,11 @@ def build_vector_store(force_rebuild: bool = False):
     return vector_store_manager.build_vector_store(force_rebuild)
 
 
-def search_vector_store(query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+def search_vector_store(query: str, top_k: int = 5, filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
     """Utility function to search vector store"""
-    return vector_store_manager.search(query, top_k)
+    return vector_store_manager.search(query, top_k, filters=filters)
+
+
+def search_vector_store_batch(queries: List[str], top_k: int = 5) -> List[List[Dict[str, Any]]]:
+    """Utility function to search vector store with many queries"""
+    return vector_store_manager.search_batch(queries, top_k)
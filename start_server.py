@@ -7,7 +7,6 @@ Handles: JSON→MD conversion, Vector store building, Server startup
 import os
 import sys
 import json
-import pickle
 from pathlib import Path
 import subprocess
 from datetime import datetime
@@ -102,30 +101,47 @@ class ChatbotBootstrapper:
             self.log(f"Error converting JSON: {str(e)}", "ERROR")
             return False
     
+    def _current_store_dir(self, vector_store_dir: Path) -> Path:
+        """Version directory named by faiss_index/CURRENT (the directory itself for the legacy layout)"""
+        pointer = vector_store_dir / "CURRENT"
+        if pointer.exists():
+            version_dir = vector_store_dir / pointer.read_text(encoding="utf-8").strip()
+            if version_dir.is_dir():
+                return version_dir
+        return vector_store_dir
+    
+    def _vector_store_exists(self, vector_store_dir: Path) -> bool:
+        """Check for an index plus chunks (columnar store or legacy metadata.pkl)"""
+        vector_store_dir = self._current_store_dir(vector_store_dir)
+        chunk_files = ["chunks_text.bin", "chunks_extra.bin", "chunks_index.npy", "chunks_strings.json"]
+        has_chunks = (
+            all((vector_store_dir / name).exists() for name in chunk_files)
+            or (vector_store_dir / "metadata.pkl").exists()
+        )
+        return (vector_store_dir / "faiss_index.bin").exists() and has_chunks
+    
     def build_vector_store(self):
         """Build or load vector store"""
         self.log("Step 2: Building Vector Store", "INFO")
         
         vector_store_dir = self.root_dir / "faiss_index"
         
-        if vector_store_dir.exists():
-            required_files = [
-                vector_store_dir / "faiss_index.bin",
-                vector_store_dir / "metadata.pkl"
-            ]
+        if self._vector_store_exists(vector_store_dir):
+            self.log("Vector store already exists", "SUCCESS")
             
-            if all(f.exists() for f in required_files):
-                self.log("Vector store already exists", "SUCCESS")
-                
-                # Show stats
-                try:
-                    with open(vector_store_dir / "metadata.pkl", 'rb') as f:
-                        metadata = pickle.load(f)
-                        chunks = metadata.get('chunks', [])
-                        self.log(f"Loaded {len(chunks)} chunks from existing store", "SUCCESS")
-                except:
-                    self.log("Vector store exists (stats unavailable)", "SUCCESS")
-                return True
+            # Show stats
+            try:
+                sys.path.insert(0, str(self.root_dir / "src"))
+                from chunk_store import ChunkStore, chunk_store_exists
+                store_dir = self._current_store_dir(vector_store_dir)
+                if chunk_store_exists(str(store_dir)):
+                    chunks = ChunkStore(str(store_dir))
+                    self.log(f"Loaded {len(chunks)} chunks from existing store", "SUCCESS")
+                else:
+                    self.log("Vector store uses legacy metadata.pkl (rebuild to upgrade)", "WARNING")
+            except:
+                self.log("Vector store exists (stats unavailable)", "SUCCESS")
+            return True
         
         self.log("Building new vector store...", "INFO")
         
@@ -163,10 +179,7 @@ class ChatbotBootstrapper:
         
         checks = {
             "Markdown files": self.data_md_dir.exists() and len(list(self.data_md_dir.glob("*.md"))) > 0,
-            "Vector store": all([
-                (vector_store_dir / "faiss_index.bin").exists(),
-                (vector_store_dir / "metadata.pkl").exists(),
-            ]),
+            "Vector store": self._vector_store_exists(vector_store_dir),
             "App file": (self.root_dir / "src" / "app.py").exists(),
             "Public assets": (self.root_dir / "public").exists(),
         }
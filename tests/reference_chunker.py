@@ -0,0 +1,116 @@
+"""
+Reference Markdown chunker: the split-based implementation the streaming chunker
+(chunker.iter_markdown_chunks) replaced. Used by tests/test_chunker.py to check
+equivalence and by benchmark_chunker.py to compare speed and memory
+"""
+
+import os
+import re
+from typing import List, Dict, Any
+
+# Fields both chunkers produce; the streaming chunker adds char offsets and header_path
+COMPARED_FIELDS = ('text', 'source_file', 'section_index', 'chunk_index', 'header', 'sub_header', 'metadata')
+
+
+def chunk_markdown_file_regex(filepath: str, chunk_size: int = 500) -> List[Dict[str, Any]]:
+    """Previous split-based Markdown chunker (re.split on ## / ### headers), the reference"""
+    filename = os.path.basename(filepath)
+    with open(filepath, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    chunks = []
+
+    # Split by sections (## headers) for better context
+    sections = re.split(r'\n(?=##\s)', content)
+
+    for idx, section in enumerate(sections):
+        section = section.strip()
+        if not section or len(section) < 20:
+            continue
+
+        # Extract section header for context
+        header = ''
+        header_match = re.match(r'^(#+\s+.+)', section)
+        if header_match:
+            header = header_match.group(1).lstrip('#').strip()
+
+        # Further split large sections into sub-sections (### headers)
+        sub_sections = re.split(r'\n(?=###\s)', section)
+
+        for sub_idx, sub_section in enumerate(sub_sections):
+            sub_section = sub_section.strip()
+            if not sub_section or len(sub_section) < 15:
+                continue
+
+            # Extract sub-header
+            sub_header = ''
+            sub_header_match = re.match(r'^(#+\s+.+)', sub_section)
+            if sub_header_match:
+                sub_header = sub_header_match.group(1).lstrip('#').strip()
+
+            # Add context prefix from headers
+            context_prefix = ''
+            if header:
+                context_prefix = f"Topic: {header}"
+                if sub_header and sub_header != header:
+                    context_prefix += f" > {sub_header}"
+                context_prefix += "\n"
+
+            # If sub-section is small enough, keep as one chunk
+            if len(sub_section) <= chunk_size:
+                chunk_text = context_prefix + sub_section
+                chunks.append({
+                    'text': chunk_text,
+                    'source_file': filename.replace('.md', ''),
+                    'section_index': idx,
+                    'chunk_index': sub_idx,
+                    'header': header,
+                    'sub_header': sub_header,
+                    'metadata': {}
+                })
+            else:
+                # Split large sub-sections by paragraphs
+                paragraphs = sub_section.split('\n\n')
+                current_chunk = context_prefix
+                chunk_count = 0
+
+                for para in paragraphs:
+                    para = para.strip()
+                    if not para:
+                        continue
+
+                    if len(current_chunk) + len(para) > chunk_size and len(current_chunk) > len(context_prefix) + 10:
+                        chunks.append({
+                            'text': current_chunk.strip(),
+                            'source_file': filename.replace('.md', ''),
+                            'section_index': idx,
+                            'chunk_index': chunk_count,
+                            'header': header,
+                            'sub_header': sub_header,
+                            'metadata': {}
+                        })
+                        chunk_count += 1
+                        current_chunk = context_prefix + para + '\n'
+                    else:
+                        current_chunk += para + '\n'
+
+                # Don't forget the last chunk
+                if len(current_chunk.strip()) > len(context_prefix) + 10:
+                    chunks.append({
+                        'text': current_chunk.strip(),
+                        'source_file': filename.replace('.md', ''),
+                        'section_index': idx,
+                        'chunk_index': chunk_count,
+                        'header': header,
+                        'sub_header': sub_header,
+                        'metadata': {}
+                    })
+
+    return chunks
+
+
+def same_chunks(expected: List[Dict[str, Any]], actual: List[Dict[str, Any]]) -> bool:
+    return len(expected) == len(actual) and all(
+        all(a.get(field) == b.get(field) for field in COMPARED_FIELDS)
+        for a, b in zip(expected, actual)
+    )
@@ -0,0 +1,47 @@
+"""
+Chunker equivalence
+The streaming Markdown chunker (iter_markdown_chunks) replaced a split-based one
+(reference_chunker.py); it must produce the same chunks for every file in data_md/
+(benchmark_chunker.py times both)
+
+Usage:
+    python -m pytest tests/test_chunker.py
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add src and tests to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from chunker import chunk_markdown_file
+from reference_chunker import chunk_markdown_file_regex, same_chunks
+
+DATA_DIR = Path(__file__).parent.parent / "data_md"
+MARKDOWN_FILES = sorted(p.name for p in DATA_DIR.glob("*.md"))
+
+
+def offsets_match(content: str, chunk) -> bool:
+    """Chunk text ends with its char_start:char_end span (whole sub-section, or paragraphs re-joined)"""
+    span = content[chunk['char_start']:chunk['char_end']]
+    rejoined = '\n'.join(p.strip() for p in span.split('\n\n') if p.strip())
+    return chunk['text'].endswith(span) or chunk['text'].endswith(rejoined)
+
+
+@pytest.mark.parametrize("md_file", MARKDOWN_FILES)
+@pytest.mark.parametrize("chunk_size", [200, 500])
+def test_streaming_chunker_matches_reference(md_file, chunk_size):
+    filepath = str(DATA_DIR / md_file)
+    assert same_chunks(chunk_markdown_file_regex(filepath, chunk_size), chunk_markdown_file(filepath, chunk_size))
+
+
+@pytest.mark.parametrize("md_file", MARKDOWN_FILES)
+def test_offsets_point_at_chunk_text(md_file):
+    filepath = DATA_DIR / md_file
+    content = filepath.read_text(encoding='utf-8')
+    chunks = chunk_markdown_file(str(filepath))
+    assert chunks
+    assert [c for c in chunks if not offsets_match(content, c)] == []
@@ -0,0 +1,50 @@
+"""
+Single watcher per store
+The mutation log has one writer, so of several processes serving the same store
+only the first to call start_watcher() watches the data directory
+
+Usage:
+    python -m pytest tests/test_live_index.py
+"""
+
+import sys
+import subprocess
+from pathlib import Path
+
+# Add src to path
+SRC_DIR = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(SRC_DIR))
+
+from live_index import ProcessRoleLock
+from vector_store import VectorStoreManager
+
+
+def acquire_in_other_process(lock_path: Path) -> bool:
+    script = (f"import sys; sys.path.insert(0, {str(SRC_DIR)!r})\n"
+              f"from live_index import ProcessRoleLock\n"
+              f"sys.exit(0 if ProcessRoleLock({str(lock_path)!r}).acquire() else 1)")
+    return subprocess.run([sys.executable, "-c", script]).returncode == 0
+
+
+def test_role_lock_has_one_holder_across_processes(tmp_path):
+    lock_path = tmp_path / "watcher.lock"
+    lock = ProcessRoleLock(str(lock_path))
+    assert lock.acquire()
+    assert not acquire_in_other_process(lock_path)
+    lock.release()
+    assert acquire_in_other_process(lock_path)
+
+
+def test_second_store_manager_does_not_watch(tmp_path):
+    data_dir = tmp_path / "data_md"
+    data_dir.mkdir()
+    first = VectorStoreManager(data_dir=str(data_dir), vector_store_path=str(tmp_path / "faiss_index"))
+    second = VectorStoreManager(data_dir=str(data_dir), vector_store_path=str(tmp_path / "faiss_index"))
+    try:
+        assert first.start_watcher(interval=60) is not None
+        assert second.start_watcher(interval=60) is None
+        first.stop_watcher()
+        assert second.start_watcher(interval=60) is not None
+    finally:
+        first.stop_watcher()
+        second.stop_watcher()
@@ -0,0 +1,101 @@
+"""
+Index swaps under running searches
+A search keeps the version it started with; swapping in another version (reload,
+live updates, compaction, rollback) never makes new searches wait for it, and a
+retired version is only closed once its last search is done
+
+Usage:
+    python -m pytest tests/test_vector_store_swap.py
+"""
+
+import sys
+import time
+import hashlib
+import threading
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from vector_store import VectorStoreManager
+
+SLOW_QUERY = "slow hostel fee query"
+SLOW_SECONDS = 2.0
+
+DOCUMENTS = {
+    "hostels.md": "# Hostels\n\n## Fees\n\nThe hostel fee is paid every semester.\n\n"
+                  "## Rooms\n\nRooms are shared by two students.\n",
+    "transport.md": "# Transport\n\n## Buses\n\nBuses leave the campus every hour.\n",
+}
+
+
+class HashEmbeddingModel:
+    """Deterministic unit vectors from a hash of each text (no model download)"""
+
+    def encode(self, texts, **kwargs):
+        vectors = [np.random.default_rng(int(hashlib.md5(text.encode()).hexdigest()[:8], 16)).standard_normal(32)
+                   for text in texts]
+        vectors = np.array(vectors, dtype=np.float32).reshape(len(vectors), 32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def get_sentence_embedding_dimension(self):
+        return 32
+
+
+def make_store(data_dir: Path, store_path: Path) -> VectorStoreManager:
+    store = VectorStoreManager(data_dir=str(data_dir), vector_store_path=str(store_path), query_cache_size=0,
+                               build_workers=1, encode_workers=1)
+    store.embedding_model = HashEmbeddingModel()
+    return store
+
+
+@pytest.fixture
+def versions(tmp_path):
+    """Store path holding three index versions of the same documents"""
+    data_dir = tmp_path / "data_md"
+    data_dir.mkdir()
+    for name, text in DOCUMENTS.items():
+        (data_dir / name).write_text(text, encoding='utf-8')
+    builder = make_store(data_dir, tmp_path / "faiss_index")
+    for _ in range(3):
+        assert builder.build_vector_store(force_rebuild=True)
+    return data_dir, tmp_path / "faiss_index"
+
+
+def test_new_search_does_not_wait_for_slow_search_during_swap(versions):
+    store = make_store(*versions)
+    assert store.load_vector_store('v1')
+    search_adaptive = store._search_adaptive
+    slow_started = threading.Event()
+
+    def slow_search_adaptive(state, queries, *args, **kwargs):
+        if queries == [SLOW_QUERY]:
+            slow_started.set()
+            time.sleep(SLOW_SECONDS)
+        return search_adaptive(state, queries, *args, **kwargs)
+
+    store._search_adaptive = slow_search_adaptive
+    slow_results = []
+    slow = threading.Thread(target=lambda: slow_results.append(store.search(SLOW_QUERY, top_k=2)))
+    slow.start()
+    assert slow_started.wait(5)
+    slow_state = store._state
+
+    # Two swaps: v1 becomes the rollback version, then drops out and is retired
+    assert store.reload('v2')
+    assert store.reload('v3')
+    begin = time.perf_counter()
+    results = store.search("bus timings", top_k=2)
+    waited = time.perf_counter() - begin
+
+    assert results
+    assert waited < SLOW_SECONDS / 4
+    assert slow.is_alive()
+    assert slow_state.float_vectors is not None  # Retired, but still read by the slow search
+
+    slow.join()
+    assert slow_results and slow_results[0]
+    assert slow_state.float_vectors is None  # Closed by the slow search finishing